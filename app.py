@@ -1,163 +1,351 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
 from datetime import datetime, timedelta
-import numpy as np
 import time
+import io
 import os
+import re
+import pyarrow as pa
+from occupybed import core, exporter, feed, importer, memo, metrics, schema, surge, synth
+from occupybed.config import DEPARTMENTS, sites as site_wards
+from occupybed.forecast import WINDOWS as FORECAST_WINDOWS
+from occupybed.beds import BedOccupiedError, bed_label
+from occupybed.registry import PatientRegistry
+from occupybed.store import CensusStore
 
 # ---------------------------------------------------------
 # 1. System Config & Design (OccupyBed AI MVP)
 # ---------------------------------------------------------
 st.set_page_config(page_title="OccupyBed AI MVP", layout="wide", page_icon="🏥")
+run_started = time.perf_counter()
 
 # --- GLOBAL TIME FREEZE ---
 # Setting "Now" to Jan 8, 2026 as requested
 CURRENT_DATE = datetime(2026, 1, 8, 12, 0, 0)
 
-st.markdown("""
-<style>
-    /* Global Settings */
-    .stApp { background-color: #0E1117; color: #E6EDF3; font-family: 'Segoe UI', sans-serif; }
-    [data-testid="stSidebar"] { background-color: #010409; border-right: 1px solid #30363D; }
-    
-    /* --- GLOWING LOGO --- */
-    @keyframes glow {
-        from { text-shadow: 0 0 5px #fff, 0 0 10px #58A6FF; }
-        to { text-shadow: 0 0 10px #fff, 0 0 20px #58A6FF; }
-    }
-    .logo-box { text-align: center; margin-bottom: 30px; margin-top: 10px; }
-    .logo-main { 
-        font-size: 28px; 
-        font-weight: 800; 
-        color: #FFFFFF; 
-        animation: glow 2s infinite alternate; 
-        margin: 0; 
-        letter-spacing: 1px;
-    }
-    .logo-slogan { 
-        font-size: 10px; 
-        color: #8B949E; 
-        text-transform: uppercase; 
-        letter-spacing: 2px; 
-        margin-top: 5px; 
-        font-weight: 500;
-    }
-
-    /* KPI Cards */
-    .kpi-card {
-        background-color: #161B22; border: 1px solid #30363D; border-radius: 6px;
-        padding: 20px; text-align: center; height: 100%; box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-    }
-    .kpi-label { font-size: 11px; color: #8B949E; text-transform: uppercase; letter-spacing: 1px; margin-bottom: 5px; }
-    .kpi-val { font-size: 28px; font-weight: 700; color: #FFF; margin: 0; }
-    .kpi-sub { font-size: 11px; color: #58A6FF; margin-top: 5px;}
-    
-    /* Section Headers */
-    .section-header {
-        font-size: 16px; font-weight: 700; color: #E6EDF3; 
-        margin-top: 25px; margin-bottom: 15px; 
-        border-left: 4px solid #58A6FF; padding-left: 10px;
-    }
-
-    /* AI Board */
-    .ai-container {
-        background-color: #161B22; border: 1px solid #30363D; border-left: 5px solid #A371F7;
-        border-radius: 6px; padding: 15px; height: 100%;
-    }
-    .ai-header { font-weight: 700; color: #A371F7; font-size: 14px; margin-bottom: 10px; text-transform: uppercase; }
-    .ai-item { font-size: 13px; color: #E6EDF3; margin-bottom: 6px; border-bottom: 1px solid #21262D; padding-bottom: 4px; }
-
-    /* Department Cards */
-    .dept-card {
-        background-color: #0D1117; border: 1px solid #30363D; border-radius: 6px;
-        padding: 15px; margin-bottom: 12px;
-    }
-    .dept-header { display: flex; justify-content: space-between; align-items: center; margin-bottom: 10px; }
-    .dept-title { font-size: 14px; font-weight: 700; color: #FFF; }
-    
-    /* Status Badges */
-    .badge { padding: 2px 8px; border-radius: 4px; font-size: 10px; font-weight: 700; text-transform: uppercase; }
-    .bg-safe { background: rgba(35, 134, 54, 0.2); color: #3FB950; border: 1px solid #238636; }
-    .bg-warn { background: rgba(210, 153, 34, 0.2); color: #D29922; border: 1px solid #9E6A03; }
-    .bg-crit { background: rgba(218, 54, 51, 0.2); color: #F85149; border: 1px solid #DA3633; }
-
-    /* Inputs */
-    div[data-baseweb="select"] > div, input { background-color: #0D1117 !important; border-color: #30363D !important; color: white !important; }
-    button[kind="primary"] { background-color: #238636 !important; border: none !important; color: white !important; }
-</style>
-""", unsafe_allow_html=True)
+# --- SHARED STORAGE ---
+DB_PATH = os.environ.get("OCCUPYBED_DB", os.path.join("data", "occupybed.db"))
+# Patient master index (CSV or Parquet with PIN, Gender); demo patients if missing
+MPI_PATH = os.environ.get("OCCUPYBED_MPI", os.path.join("data", "patients.parquet"))
+
+# --- STATIC ASSETS (next to app.py) ---
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+STYLE_PATH = os.path.join(APP_DIR, "style.css")
+LOGO_PATH = os.path.join(APP_DIR, "logo.png")
+# Twice the sidebar width, for sharp high-DPI screens
+LOGO_WIDTH = 600
+PIN_PAGE_SIZE = 50
+# Synthetic demo census loaded into an empty store
+DEMO_DAYS = 60
+DEMO_SEED = int(os.environ.get("OCCUPYBED_SEED", 42))
+# Site -> wards (occupybed/config.py; OCCUPYBED_WARDS for a group configuration)
+SITES = site_wards(DEPARTMENTS)
+ALL_SITES = "All Sites"
+# Overview recommendations listed before "... and N more"
+AI_RECS_SHOWN = 10
+# Department card badge class / bar color per core.statuses()
+STATUS_STYLE = {"SAFE": ("bg-safe", "#3FB950"), "WARNING": ("bg-warn", "#D29922"), "CRITICAL": ("bg-crit", "#F85149")}
+EXPORT_FORMATS = {"csv": "CSV", "csv.gz": "CSV (gzip)", "parquet": "Parquet"}
+# ADT feed stand-ins (see occupybed/feed.py): a JSON-lines file to follow and/or a TCP port; off if unset
+FEED_FILE = os.environ.get("OCCUPYBED_FEED_FILE")
+FEED_PORT = int(os.environ.get("OCCUPYBED_FEED_PORT", 0))
+# Overview / Live Admissions check for new data this often and rerun when it changed
+LIVE_REFRESH_SECS = 2
+# Page tables / figures kept across reruns and sessions (see occupybed/memo.py)
+MEMO_ENTRIES = 256
+# Span / gauge export (see occupybed/metrics.py): Prometheus text on a port and/or a file; off if unset
+METRICS_PORT = int(os.environ.get("OCCUPYBED_METRICS_PORT", 0))
+# Loopback by default; set e.g. 0.0.0.0 to let a scraper on another host reach it
+METRICS_HOST = os.environ.get("OCCUPYBED_METRICS_HOST", "127.0.0.1")
+METRICS_FILE = os.environ.get("OCCUPYBED_METRICS_FILE")
+METRICS_FILE_SECS = 10
+
+@st.cache_resource
+def app_style():
+    # style.css read and minified once per process; st.html puts a style-only
+    # block in the event container, so it takes no room on the page
+    with open(STYLE_PATH) as fh:
+        css = re.sub(r"/\*.*?\*/", "", fh.read(), flags=re.S)
+    return "<style>" + re.sub(r"\s*([{};,>])\s*", r"\1", re.sub(r"\s+", " ", css)).strip() + "</style>"
+
+@st.cache_resource
+def logo_png():
+    # Sidebar logo resized to LOGO_WIDTH (the source is 6000 px / 1.7 MB) and
+    # kept next to the database, so only the first process pays for the
+    # resize; None without a logo
+    if not os.path.exists(LOGO_PATH):
+        return None
+    cached = os.path.join(os.path.dirname(DB_PATH) or ".", f"logo-{LOGO_WIDTH}.png")
+    if os.path.exists(cached) and os.path.getmtime(cached) >= os.path.getmtime(LOGO_PATH):
+        with open(cached, "rb") as fh:
+            return fh.read()
+    from PIL import Image
+    with Image.open(LOGO_PATH) as img:
+        img.thumbnail((LOGO_WIDTH, img.height))
+        buf = io.BytesIO()
+        img.save(buf, "PNG", optimize=True)
+    try:
+        os.makedirs(os.path.dirname(cached) or ".", exist_ok=True)
+        tmp = f"{cached}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(buf.getvalue())
+        os.replace(tmp, cached)
+    except OSError:
+        pass
+    return buf.getvalue()
+
+st.html(app_style())
 
 # ---------------------------------------------------------
 # 2. Logic & Data
 # ---------------------------------------------------------
 
-DEPARTMENTS = {
-    "Medical Male": {"cap": 50, "gen": "Male", "overflow": "Surgical Male"},
-    "Medical Female": {"cap": 50, "gen": "Female", "overflow": "Surgical Female"},
-    "Surgical Male": {"cap": 40, "gen": "Male", "overflow": "Medical Male"},
-    "Surgical Female": {"cap": 40, "gen": "Female", "overflow": "Medical Female"},
-    "ICU": {"cap": 16, "gen": "Mixed", "overflow": "HDU"},
-    "Pediatric": {"cap": 30, "gen": "Mixed", "overflow": "None"},
-    "Obstetrics": {"cap": 24, "gen": "Female", "overflow": "Gynae"},
-}
+@st.cache_resource
+def get_registry():
+    return PatientRegistry.load(MPI_PATH)
+
+@st.cache_resource
+def get_store():
+    # One store per server process, shared by every browser session
+    return CensusStore(DB_PATH, DEPARTMENTS)
+
+@st.cache_resource
+def get_feed():
+    # One ingestor per server process, writing into the shared store
+    if not (FEED_FILE or FEED_PORT):
+        return None
+    return feed.start(get_store(), FEED_FILE, FEED_PORT)
+
+@st.cache_resource
+def get_memo():
+    return memo.VersionCache(MEMO_ENTRIES)
+
+@st.cache_resource
+def get_surge_pool():
+    # One simulation worker pool per server process (workers start on the first large run)
+    return surge.make_pool()
 
-PATIENT_DB = {f"PIN-{1000+i}": ("Male" if i % 2 == 0 else "Female") for i in range(3000)}
+@st.cache_resource
+def get_metrics_server():
+    # One /metrics endpoint per server process
+    return metrics.REGISTRY.serve(METRICS_PORT, METRICS_HOST) if METRICS_PORT else None
 
 def init_system():
-    if 'df' not in st.session_state:
-        st.session_state.df = pd.DataFrame(columns=[
-            "PIN", "Gender", "Department", "Bed", 
-            "Admit_Date", "Exp_Discharge", "Actual_Discharge", "Source"
-        ])
-        
-        # --- Generate Data Relative to CURRENT_DATE (Jan 8, 2026) ---
-        data = []
-        for dept, info in DEPARTMENTS.items():
-            count = int(info['cap'] * np.random.uniform(0.4, 0.65))
-            for i in range(count):
-                bed_n = f"{dept[:3].upper()}-{i+1:03d}"
-                
-                # Admit date is between 1 and 10 days BEFORE Current Date
-                days_ago = np.random.randint(1, 10)
-                adm = CURRENT_DATE - timedelta(days=days_ago, hours=np.random.randint(1, 12))
-                
-                # Exp discharge is in future relative to admit
-                exp = adm + timedelta(days=np.random.randint(3, 8))
-                
-                # Determine if active or discharged based on simulation
-                # Some patients admitted 8 days ago might have been discharged 2 days ago
-                actual_dis = pd.NaT
-                if np.random.random() < 0.3 and days_ago > 4:
-                    actual_dis = adm + timedelta(days=np.random.randint(2, 4))
-                
-                data.append({
-                    "PIN": f"PIN-{np.random.randint(2000, 9999)}",
-                    "Gender": "Female" if "Female" in dept else ("Male" if "Male" in dept else np.random.choice(["Male", "Female"])),
-                    "Department": dept,
-                    "Bed": bed_n,
-                    "Admit_Date": adm,
-                    "Exp_Discharge": exp,
-                    "Actual_Discharge": actual_dis,
-                    "Source": "Emergency"
-                })
-        st.session_state.df = pd.DataFrame(data)
-
-init_system()
-df = st.session_state.df
-
-# Enforce Date Types
-for col in ['Admit_Date', 'Exp_Discharge', 'Actual_Discharge']:
-    df[col] = pd.to_datetime(df[col], errors='coerce')
+    store = get_store()
+    if store.is_empty():
+        # --- Demo history ending at CURRENT_DATE (Jan 8, 2026), reproducible via DEMO_SEED ---
+        store.append_typed(synth.generate(DEPARTMENTS, days=DEMO_DAYS, end=CURRENT_DATE, seed=DEMO_SEED))
+    return store
+
+store = init_system()
+registry = get_registry()
+adt_feed = get_feed()
+page_cache = get_memo()
+get_metrics_server()
+# Read once per run: everything below is cached under this version
+data_version = store.version
+
+@st.fragment(run_every=LIVE_REFRESH_SECS)
+def live_refresh(seen_version):
+    # Reruns the page once the census changed (ADT feed, other sessions)
+    if store.version != seen_version:
+        st.rerun()
+
+# --- Page data, cached per data version: called as fn(data_version, *args) ---
+# metrics.timed sits under the cache, so its spans time cache misses only.
+# plotly is imported inside the figure builders: pages without charts never load it
+@page_cache.cached
+@metrics.timed("compute.overview_kpis")
+def overview_tables(fc_hours, site=None):
+    # Card rows (wards of one site, or sites for the group view when there are
+    # several), summary and recommendations for one forecast window. Expected
+    # free beds for every window come from one pass; the window only picks a column.
+    fc_table = store.expected_free(CURRENT_DATE, FORECAST_WINDOWS)
+    occ_table = core.occupancy(store.active(), DEPARTMENTS, fc_table[fc_hours])
+    if site is not None:
+        occ_table = occ_table[occ_table['Site'] == site]
+    elif len(SITES) > 1:
+        site_table = core.site_summary(occ_table)
+        return site_table, core.hospital_summary(occ_table), core.recommendations(site_table)
+    return occ_table, core.hospital_summary(occ_table), core.recommendations(occ_table)
+
+@page_cache.cached
+@metrics.timed("compute.los_forecast")
+def model_forecast(site=None):
+    # LOS-model view (learned from discharged stays) for every hour of the curve, 90% interval
+    model_fc = store.predicted_free(CURRENT_DATE, range(FORECAST_WINDOWS[-1] + 1), site=site)
+    return model_fc[model_fc['Department'] == (site or 'Hospital')].set_index('Hours')
+
+@page_cache.cached
+@metrics.timed("figure.pressure_gauge")
+def pressure_gauge(occ_rate):
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Indicator(
+        mode = "gauge+number", value = occ_rate,
+        title = {'text': "Hospital Pressure"},
+        gauge = {
+            'axis': {'range': [0, 100]},
+            'bar': {'color': "#58A6FF"},
+            'steps': [
+                {'range': [0, 70], 'color': "#161B22"},
+                {'range': [70, 85], 'color': "#451a03"},
+                {'range': [85, 100], 'color': "#450a0a"}],
+        }
+    ))
+    fig.update_layout(height=250, margin=dict(l=10,r=10,t=0,b=0), paper_bgcolor="#0E1117", font={'color': "white"})
+    return fig
+
+@page_cache.cached
+@metrics.timed("figure.forecast")
+def forecast_figure(fc_hours, site=None):
+    # Main line: the hospital / group, or one site; one hidden line per ward (per site in the group view)
+    import plotly.graph_objects as go
+    model_fc = model_forecast(data_version, site)
+    curve = store.discharge_curve(CURRENT_DATE, horizon=FORECAST_WINDOWS[-1])
+    if site is not None:
+        curve = curve[SITES[site]].assign(Hospital=curve[SITES[site]].sum(axis=1))
+    elif len(SITES) > 1:
+        by_site = curve[list(DEPARTMENTS)].T.groupby(pd.Series({d: info['site'] for d, info in DEPARTMENTS.items()})).sum().T
+        curve = by_site[list(SITES)].assign(Hospital=curve['Hospital'])
+    fig_fc = go.Figure()
+    model_x = [CURRENT_DATE + timedelta(hours=int(h)) for h in model_fc.index]
+    fig_fc.add_trace(go.Scatter(x=model_x + model_x[::-1], y=list(model_fc['High']) + list(model_fc['Low'])[::-1],
+                                fill='toself', fillcolor='rgba(88,166,255,0.15)', line=dict(width=0), name='LOS model 90%', hoverinfo='skip'))
+    fig_fc.add_trace(go.Scatter(x=model_x, y=model_fc['Expected'], name='LOS model', line=dict(color='#58A6FF', width=2, dash='dash')))
+    fig_fc.add_trace(go.Scatter(x=curve.index, y=curve['Hospital'], name=f"{site or 'Hospital'} (Exp Discharge)", line=dict(color='#A371F7', width=3)))
+    for dept in curve.columns.drop('Hospital'):
+        fig_fc.add_trace(go.Scatter(x=curve.index, y=curve[dept], name=dept, line=dict(width=1), visible='legendonly'))
+    fig_fc.add_vline(x=CURRENT_DATE + timedelta(hours=fc_hours), line_dash="dot", line_color="#8B949E")
+    fig_fc.update_layout(height=280, paper_bgcolor="#0E1117", plot_bgcolor="#0E1117", font={'color': "white"},
+                         xaxis=dict(showgrid=True, gridcolor='#30363D'), yaxis=dict(showgrid=True, gridcolor='#30363D', title="Expected Free Beds"),
+                         legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1), margin=dict(l=0, r=0, t=20, b=0))
+    return fig_fc
+
+@page_cache.cached
+@metrics.timed("render.department_cards")
+def department_cards(fc_hours, site=None, n_cols=3):
+    # One HTML card per row of overview_tables (ward or site), joined per column
+    table = overview_tables(data_version, fc_hours, site)[0]
+    cols = [[] for _ in range(n_cols)]
+    for i, (dept, row) in enumerate(table.iterrows()):
+        occ, avail, ready, pct, status = row['Occupied'], row['Available'], row['Expected_Free'], row['Pct'], row['Status']
+        cls, bar = STATUS_STYLE[status]
+        wards = (f"<div style='font-size:11px; color:#8B949E; margin-bottom:5px;'>{row['Wards']} wards: "
+                 f"{row['Wards_Critical']} critical, {row['Wards_Warning']} warning</div>" if 'Wards' in row else "")
+        cols[i % n_cols].append(f"""
+            <div class="dept-card">
+                <div class="dept-header">
+                    <span class="dept-title">{dept}</span>
+                    <span class="badge {cls}">{status}</span>
+                </div>{wards}
+                <div style="font-size:12px; color:#8B949E; display:flex; justify-content:space-between; margin-bottom:5px;">
+                    <span>Cap: {row['Capacity']}</span>
+                    <span>Occ: <b style="color:#E6EDF3">{occ}</b></span>
+                    <span>Avail: {avail}</span>
+                </div>
+                <div style="font-size:12px; display:flex; justify-content:space-between;">
+                    <span style="color:#A371F7; font-weight:bold;">Forecast Free ({fc_hours}h): {ready}</span>
+                </div>
+                <div style="background:#21262D; height:5px; border-radius:3px; margin-top:8px;">
+                    <div style="width:{min(pct, 100)}%; background:{bar}; height:100%;"></div>
+                </div>
+            </div>
+            """)
+    return ["".join(c) for c in cols]
+
+@page_cache.cached
+@metrics.timed("compute.active_filter")
+def active_external():
+    return schema.to_external(store.active()).sort_values(by="Admit_Date", ascending=False)
+
+@page_cache.cached
+def trend_figure(start, end):
+    # Daily admissions / discharges line chart; None when there is no data
+    with metrics.span("compute.trend_grouping"):
+        trend = store.daily_flow(start, end)
+    if trend.empty:
+        return None
+    with metrics.span("figure.trend"):
+        return trend_chart(trend)
+
+def trend_chart(trend):
+    import plotly.graph_objects as go
+    # Plotly Line Chart to mimic the reference image
+    fig_trend = go.Figure()
+
+    # Line 1: Admissions (Blue)
+    fig_trend.add_trace(go.Scatter(
+        x=trend['Date'], y=trend['Admissions'],
+        mode='lines+markers',
+        name='Admissions',
+        line=dict(color='#1f77b4', width=2), # Standard Blue
+        marker=dict(size=8)
+    ))
+
+    # Line 2: Discharges (Orange)
+    fig_trend.add_trace(go.Scatter(
+        x=trend['Date'], y=trend['Discharges'],
+        mode='lines+markers',
+        name='Discharges',
+        line=dict(color='#ff7f0e', width=2), # Standard Orange
+        marker=dict(size=8)
+    ))
+
+    fig_trend.update_layout(
+        paper_bgcolor="#0E1117", 
+        plot_bgcolor="#0E1117", 
+        font={'color': "white"},
+        xaxis_title="Date", 
+        yaxis_title="Number of Patients",
+        xaxis=dict(showgrid=True, gridcolor='#30363D'),
+        yaxis=dict(showgrid=True, gridcolor='#30363D'),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        margin=dict(l=0, r=0, t=20, b=0)
+    )
+    return fig_trend
+
+@page_cache.cached
+@metrics.timed("compute.department_kpis")
+def department_performance():
+    table = core.department_table(store.department_kpis(CURRENT_DATE))
+    if len(SITES) > 1:
+        table.insert(0, "Site", table["Department"].map(lambda d: DEPARTMENTS[d]['site']))
+    return table
+
+@page_cache.cached
+@metrics.timed("compute.site_kpis")
+def site_performance():
+    return core.department_table(store.site_kpis(CURRENT_DATE)).rename(columns={"Department": "Site"})
+
+@page_cache.cached
+@metrics.timed("figure.timeline")
+def timeline_view(start, end, dept):
+    # Period stats per ward and the census curve figure for one ward (or the hospital)
+    import plotly.graph_objects as go
+    stats = store.period_stats(start, end).set_index("Department")
+    tl_curve = store.census_curve(start, end)
+    fig_tl = go.Figure()
+    fig_tl.add_trace(go.Scatter(x=tl_curve.index, y=tl_curve[dept], name="Census", line=dict(color='#58A6FF', width=2), fill='tozeroy'))
+    fig_tl.add_hline(y=stats.loc[dept, 'Capacity'], line_dash="dot", line_color="#F85149", annotation_text="Capacity")
+    fig_tl.update_layout(height=300, paper_bgcolor="#0E1117", plot_bgcolor="#0E1117", font={'color': "white"},
+                         xaxis=dict(showgrid=True, gridcolor='#30363D'), yaxis=dict(showgrid=True, gridcolor='#30363D', title="Occupied Beds"),
+                         margin=dict(l=0, r=0, t=20, b=0), showlegend=False)
+    return stats, fig_tl
+
+def site_scope(key, box=st, index=0):
+    # Wards offered by a per-ward widget or chart: one site's wards when the group has several sites
+    if len(SITES) > 1:
+        return SITES[box.selectbox("Site", list(SITES), index=index, key=key)]
+    return list(DEPARTMENTS)
 
 # ---------------------------------------------------------
 # 3. Sidebar (Search & Nav)
 # ---------------------------------------------------------
 with st.sidebar:
     # --- GLOWING LOGO SECTION ---
-    if os.path.exists("logo.png"):
-        st.image("logo.png", use_container_width=True)
+    logo = logo_png()
+    if logo is not None:
+        st.image(logo, use_container_width=True)
     
     st.markdown("""
     <div class="logo-box">
@@ -166,47 +354,65 @@ with st.sidebar:
     </div>
     """, unsafe_allow_html=True)
     
-    # Patient Search
-    st.markdown("### Patient Search")
-    search_q = st.text_input("Enter PIN", placeholder="e.g. PIN-2005")
-    if search_q:
-        res = df[(df['PIN'] == search_q) & (df['Actual_Discharge'].isna())]
-        if not res.empty:
-            r = res.iloc[0]
-            st.success(f"Found: {r['Department']}")
-            st.info(f"Bed: {r['Bed']}")
-        else:
-            st.warning("Not Active / Not Found")
+    # Patient Search (a fragment: typing here reruns only the search, not the page)
+    @st.fragment
+    def patient_search():
+        st.markdown("### Patient Search")
+        search_q = st.text_input("Enter PIN", placeholder="e.g. PIN-2005")
+        if search_q:
+            r = store.find_active(search_q)
+            if r is not None:
+                st.success(f"Found: {r['Department']}")
+                st.info(f"Bed: {bed_label(r['Department'], r['Bed'])}")
+            else:
+                # Typeahead: show a few PINs starting with the query
+                hits = registry.search(search_q, page_size=5)
+                if hits:
+                    for h in hits:
+                        a = store.find_active(h)
+                        st.caption(f"{h}: {a['Department']} / {bed_label(a['Department'], a['Bed'])}" if a is not None else f"{h}: Not Active")
+                else:
+                    st.warning("Not Active / Not Found")
+
+    patient_search()
 
     st.markdown("---")
     menu = st.radio("NAVIGATION", ["Overview", "Live Admissions", "Operational Analytics", "Settings"], label_visibility="collapsed")
     st.markdown("---")
+    live_updates = st.toggle("Live updates", True, help="Refresh Overview and Live Admissions as new data arrives")
     st.caption("System Status: Online")
+    if adt_feed is not None:
+        st.caption(f"ADT Feed: {adt_feed.stats()['applied']:,} messages applied")
 
 # ---------------------------------------------------------
 # 4. OVERVIEW
 # ---------------------------------------------------------
 if menu == "Overview":
+    if live_updates:
+        live_refresh(data_version)
     c1, c2 = st.columns([3, 1])
     with c1: st.title("Hospital Command Center")
     with c2: 
-        fc_hours = st.selectbox("Forecast Window", [6, 12, 24, 48, 72], index=2, format_func=lambda x: f"{x} Hours")
-
-    # Metrics
-    active_df = df[df['Actual_Discharge'].isna()]
-    future_limit = CURRENT_DATE + timedelta(hours=fc_hours)
-    
-    total_cap = sum(d['cap'] for d in DEPARTMENTS.values())
-    occ_count = len(active_df)
-    avail_count = total_cap - occ_count
-    ready_count = len(active_df[active_df['Exp_Discharge'] <= future_limit])
+        fc_hours = st.selectbox("Forecast Window", FORECAST_WINDOWS, index=2, format_func=lambda x: f"{x} Hours")
+    # Group view (one card per site) or one site's wards
+    site = None
+    if len(SITES) > 1:
+        site_pick = st.selectbox("Site", [ALL_SITES] + list(SITES))
+        site = None if site_pick == ALL_SITES else site_pick
+
+    # Metrics (cached per data version; see page_cache)
+    occ_table, summary, recs = overview_tables(data_version, fc_hours, site)
+    model_fc = model_forecast(data_version, site)
+    model_now = model_fc.loc[fc_hours]
+    total_cap, occ_count = summary['Capacity'], summary['Occupied']
+    avail_count, ready_count = summary['Available'], summary['Expected_Free']
 
     # 1. Top Row: KPI Cards
     k1, k2, k3, k4 = st.columns(4)
     with k1: st.markdown(f"""<div class="kpi-card"><div class="kpi-label">Total Licensed Beds</div><div class="kpi-val" style="color:#58A6FF">{total_cap}</div></div>""", unsafe_allow_html=True)
     with k2: st.markdown(f"""<div class="kpi-card"><div class="kpi-label">Occupied Beds</div><div class="kpi-val" style="color:#D29922">{occ_count}</div></div>""", unsafe_allow_html=True)
     with k3: st.markdown(f"""<div class="kpi-card"><div class="kpi-label">Available Now</div><div class="kpi-val" style="color:#3FB950">{avail_count}</div></div>""", unsafe_allow_html=True)
-    with k4: st.markdown(f"""<div class="kpi-card"><div class="kpi-label">Expected Free ({fc_hours}h)</div><div class="kpi-val" style="color:#A371F7">{ready_count}</div></div>""", unsafe_allow_html=True)
+    with k4: st.markdown(f"""<div class="kpi-card"><div class="kpi-label">Expected Free ({fc_hours}h)</div><div class="kpi-val" style="color:#A371F7">{ready_count}</div><div class="kpi-sub">LOS model: {model_now['Expected']:.0f} ({model_now['Low']}-{model_now['High']})</div></div>""", unsafe_allow_html=True)
 
     st.markdown("<br>", unsafe_allow_html=True)
 
@@ -214,184 +420,292 @@ if menu == "Overview":
     g_col, ai_col = st.columns([1, 2])
     with g_col:
         # Gauge Chart
-        occ_rate = (occ_count / total_cap) * 100 if total_cap > 0 else 0
-        fig = go.Figure(go.Indicator(
-            mode = "gauge+number", value = occ_rate,
-            title = {'text': "Hospital Pressure"},
-            gauge = {
-                'axis': {'range': [0, 100]},
-                'bar': {'color': "#58A6FF"},
-                'steps': [
-                    {'range': [0, 70], 'color': "#161B22"},
-                    {'range': [70, 85], 'color': "#451a03"},
-                    {'range': [85, 100], 'color': "#450a0a"}],
-            }
-        ))
-        fig.update_layout(height=250, margin=dict(l=10,r=10,t=0,b=0), paper_bgcolor="#0E1117", font={'color': "white"})
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(pressure_gauge(data_version, summary['Pct']), use_container_width=True)
 
     with ai_col:
         st.markdown(f"""<div class="ai-container"><div class="ai-header">AI Operational Recommendations</div>""", unsafe_allow_html=True)
-        ai_triggered = False
-        for dept, info in DEPARTMENTS.items():
-            d_pats = active_df[active_df['Department'] == dept]
-            pct = (len(d_pats) / info['cap']) * 100
-            
-            if pct >= 85:
-                st.markdown(f"""<div class="ai-item"><span style="color:#F85149"><b>{dept}:</b></span> Critical load ({int(pct)}%). Activate surge protocol.</div>""", unsafe_allow_html=True)
-                ai_triggered = True
-            elif pct >= 70:
-                st.markdown(f"""<div class="ai-item"><span style="color:#D29922"><b>{dept}:</b></span> High Load ({int(pct)}%). Prioritize pending discharges.</div>""", unsafe_allow_html=True)
-                ai_triggered = True
+        # Critical first; the rest are summarized when there are many wards / sites
+        recs = sorted(recs, key=lambda r: r[1] != "critical")
+        for dept, level, msg in recs[:AI_RECS_SHOWN]:
+            color = "#F85149" if level == "critical" else "#D29922"
+            st.markdown(f"""<div class="ai-item"><span style="color:{color}"><b>{dept}:</b></span> {msg}</div>""", unsafe_allow_html=True)
                 
-        if not ai_triggered:
+        if len(recs) > AI_RECS_SHOWN:
+            st.markdown(f"""<div class="ai-item" style="color:#8B949E">... and {len(recs) - AI_RECS_SHOWN} more above {core.WARN_PCT}% load.</div>""", unsafe_allow_html=True)
+        if not recs:
             st.markdown("""<div class="ai-item" style="color:#3FB950">Hospital capacity is optimal. No bottlenecks detected.</div>""", unsafe_allow_html=True)
         st.markdown("</div>", unsafe_allow_html=True)
 
     st.markdown("---")
 
-    # 3. Bottom Row: Department Status
-    st.markdown("### Department Live Status")
+    # 3. Discharge Forecast Curve
+    st.markdown(f"### Beds Freeing Over Time (next {FORECAST_WINDOWS[-1]}h)")
+    st.plotly_chart(forecast_figure(data_version, fc_hours, site), use_container_width=True)
+
+    st.markdown("---")
+
+    # 4. Bottom Row: Department Status
+    st.markdown("### Site Live Status" if site is None and len(SITES) > 1 else "### Department Live Status")
     d_cols = st.columns(3)
-    for i, (dept, info) in enumerate(DEPARTMENTS.items()):
-        d_df = active_df[active_df['Department'] == dept]
-        occ = len(d_df)
-        avail = info['cap'] - occ
-        ready = len(d_df[d_df['Exp_Discharge'] <= future_limit])
-        pct = (occ / info['cap']) * 100
-        
-        if pct < 70: status, cls, bar = "SAFE", "bg-safe", "#3FB950"
-        elif 70 <= pct <= 84: status, cls, bar = "WARNING", "bg-warn", "#D29922"
-        else: status, cls, bar = "CRITICAL", "bg-crit", "#F85149"
-        
-        with d_cols[i % 3]:
-            st.markdown(f"""
-            <div class="dept-card">
-                <div class="dept-header">
-                    <span class="dept-title">{dept}</span>
-                    <span class="badge {cls}">{status}</span>
-                </div>
-                <div style="font-size:12px; color:#8B949E; display:flex; justify-content:space-between; margin-bottom:5px;">
-                    <span>Cap: {info['cap']}</span>
-                    <span>Occ: <b style="color:#E6EDF3">{occ}</b></span>
-                    <span>Avail: {avail}</span>
-                </div>
-                <div style="font-size:12px; display:flex; justify-content:space-between;">
-                    <span style="color:#A371F7; font-weight:bold;">Forecast Free ({fc_hours}h): {ready}</span>
-                </div>
-                <div style="background:#21262D; height:5px; border-radius:3px; margin-top:8px;">
-                    <div style="width:{min(pct, 100)}%; background:{bar}; height:100%;"></div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+    for col, cards in zip(d_cols, department_cards(data_version, fc_hours, site)):
+        col.markdown(cards, unsafe_allow_html=True)
 
 # ---------------------------------------------------------
 # 5. Live Admissions
 # ---------------------------------------------------------
 elif menu == "Live Admissions":
+    if live_updates:
+        live_refresh(data_version)
     st.title("Patient Admission & Discharge Center")
     
     # 1. Data Management
     with st.expander("Data Operations (Import / Export)", expanded=False):
         c_dl, c_ul = st.columns(2)
         with c_dl:
-            st.download_button("Download Database (CSV)", df.to_csv(index=False).encode('utf-8'), "hospital_db.csv", "text/csv")
+            # The file is only built when the button is clicked, and reused until the data changes
+            exp_fmt = st.selectbox("Export Format", list(EXPORT_FORMATS), format_func=EXPORT_FORMATS.get)
+            exp_active = st.checkbox("Active patients only")
+            exp_depts = st.multiselect("Departments", list(DEPARTMENTS), placeholder="All departments")
+            exp_range = st.date_input("Stays between", value=(), disabled=exp_active)
+            exp_start, exp_end = (exp_range if len(exp_range) == 2 and not exp_active else (None, None))
+            exp_filters = dict(active_only=exp_active, departments=exp_depts,
+                               start=exp_start and pd.Timestamp(exp_start),
+                               end=exp_end and pd.Timestamp(exp_end) + timedelta(days=1) - timedelta(seconds=1))
+
+            def export_bytes(fmt=exp_fmt, filters=exp_filters):
+                with metrics.span(f"export.{fmt}"), open(exporter.export(store, fmt, **filters), "rb") as fh:
+                    return fh.read()
+
+            st.download_button("Download Database", export_bytes, f"hospital_db{exporter.FORMATS[exp_fmt][0]}",
+                               exporter.FORMATS[exp_fmt][1], on_click="ignore")
         with c_ul:
-            up_file = st.file_uploader("Upload Data (CSV)", type=['csv'])
-            if up_file:
+            up_file = st.file_uploader("Upload Data (CSV / CSV.GZ / Parquet)", type=['csv', 'gz', 'parquet'])
+            imp_mode = st.radio("Import Mode", ["Append", "Merge", "Replace"], horizontal=True,
+                                help="Merge updates active stays with the same PIN and Admit_Date. Replace wipes the census first.")
+            if up_file and st.button("Import"):
+                bar = st.progress(0.0, text="Importing...")
                 try:
-                    new_df = pd.read_csv(up_file)
-                    for col in ['Admit_Date', 'Exp_Discharge', 'Actual_Discharge']: 
-                        new_df[col] = pd.to_datetime(new_df[col], errors='coerce')
-                    st.session_state.df = new_df
-                    st.success("Data Loaded.")
+                    report = importer.import_file(store, up_file, up_file.name, imp_mode.lower(),
+                                                  progress=lambda n: bar.progress(min(n / 1e6, 1.0), text=f"{n:,} rows read"))
+                    st.session_state.import_report = report
                     st.rerun()
-                except: st.error("Invalid File")
-
-    # 2. Admission Form
-    st.subheader("New Admission")
-    c1, c2 = st.columns(2)
-    with c1:
-        # Filter: Only show PINs that are NOT currently admitted
-        active_pins = df[df['Actual_Discharge'].isna()]['PIN'].tolist()
-        all_pins = list(PATIENT_DB.keys())
-        valid_pins = [p for p in all_pins if p not in active_pins]
+                except (ValueError, pd.errors.ParserError, pa.ArrowException, UnicodeDecodeError, OSError) as e:
+                    bar.empty()
+                    st.error(f"Invalid File: {e}")
+            report = st.session_state.get("import_report")
+            if report:
+                st.success(f"{report['mode'].title()}: {report['loaded']:,} loaded, {report['updated']:,} updated "
+                           f"out of {report['rows']:,} rows.")
+                if report['rejected']:
+                    st.warning(f"{report['rejected']:,} rows rejected (first {len(report['errors']):,} shown).")
+                    st.dataframe(report['errors'], height=200)
+                    st.download_button("Download Rejected Rows", report['errors'].to_csv(index=False).encode('utf-8'),
+                                       "rejected_rows.csv", "text/csv")
+
+    # 2. Admission Form (a fragment: picking PIN / ward / bed reruns only the form)
+    @st.fragment
+    def admission_form():
+        st.subheader("New Admission")
+        c1, c2 = st.columns(2)
+        with c1:
+            # Filter: Only show PINs that are NOT currently admitted (one page at a time)
+            active_pins = store.active_pins()
+            pin_q = st.text_input("Search Patient PIN", placeholder="e.g. PIN-10")
+            n_match = registry.count(pin_q, exclude=active_pins)
+            n_pages = max(1, -(-n_match // PIN_PAGE_SIZE))
+            pin_page = st.number_input(f"Results page (1-{n_pages})", 1, n_pages, 1) - 1 if n_pages > 1 else 0
+            valid_pins = registry.search(pin_q, page=pin_page, page_size=PIN_PAGE_SIZE, exclude=active_pins)
         
-        pin = st.selectbox("Select Patient PIN", ["Select..."] + valid_pins)
-        gender = "Unknown"
-        if pin != "Select...":
-            gender = PATIENT_DB.get(pin, "Unknown")
-            st.info(f"Gender: **{gender}**")
+            pin = st.selectbox("Select Patient PIN", ["Select..."] + valid_pins)
+            st.caption(f"{n_match} patients available")
+            gender = "Unknown"
+            if pin != "Select...":
+                gender = registry.gender(pin)
+                st.info(f"Gender: **{gender}**")
         
-        dept = st.selectbox("Assign Department", ["Select..."] + list(DEPARTMENTS.keys()))
+            adm_wards = site_scope("adm_site")
+            dept = st.selectbox("Assign Department", ["Select..."] + adm_wards)
         
-        bed_opts = ["Select Dept"]
-        if dept != "Select...":
-            occ_beds = df[(df['Department'] == dept) & (df['Actual_Discharge'].isna())]['Bed'].tolist()
-            all_beds = [f"{dept[:3].upper()}-{i+1:03d}" for i in range(DEPARTMENTS[dept]['cap'])]
-            free_beds = [b for b in all_beds if b not in occ_beds]
-            bed_opts = free_beds if free_beds else ["NO BEDS AVAILABLE"]
-        bed = st.selectbox("Assign Bed", bed_opts)
-
-    with c2:
-        d1, t1 = st.columns(2)
-        adm_d = d1.date_input("Admit Date", CURRENT_DATE)
-        adm_t = t1.time_input("Admit Time", CURRENT_DATE.time())
-        d2, t2 = st.columns(2)
-        exp_d = d2.date_input("Exp Discharge Date", CURRENT_DATE + timedelta(days=3))
-        exp_t = t2.time_input("Exp Discharge Time", CURRENT_DATE.time())
-        src = st.selectbox("Source", ["Emergency", "Elective", "Transfer"])
-
-    if st.button("Confirm Admission", type="primary"):
-        if pin == "Select..." or dept == "Select..." or bed in ["Select Dept", "NO BEDS AVAILABLE"]:
-            st.warning("Please complete all fields.")
-        elif DEPARTMENTS[dept]['gen'] != "Mixed" and DEPARTMENTS[dept]['gen'] != gender:
-            st.error(f"Error: Gender Mismatch. {dept} is for {DEPARTMENTS[dept]['gen']} only.")
-        else:
-            new_rec = {
-                "PIN": pin, "Gender": gender, "Department": dept, "Bed": bed,
-                "Admit_Date": datetime.combine(adm_d, adm_t),
-                "Exp_Discharge": datetime.combine(exp_d, exp_t),
-                "Actual_Discharge": pd.NaT,
-                "Source": src
-            }
-            st.session_state.df = pd.concat([st.session_state.df, pd.DataFrame([new_rec])], ignore_index=True)
-            st.success("Admitted Successfully.")
-            time.sleep(0.5)
+            bed_opts = ["Select Dept"]
+            if dept != "Select...":
+                free_beds = store.free_beds(dept)
+                bed_opts = free_beds if free_beds else ["NO BEDS AVAILABLE"]
+            bed = st.selectbox("Assign Bed", bed_opts)
+
+        with c2:
+            d1, t1 = st.columns(2)
+            adm_d = d1.date_input("Admit Date", CURRENT_DATE)
+            adm_t = t1.time_input("Admit Time", CURRENT_DATE.time())
+            d2, t2 = st.columns(2)
+            exp_d = d2.date_input("Exp Discharge Date", CURRENT_DATE + timedelta(days=3))
+            exp_t = t2.time_input("Exp Discharge Time", CURRENT_DATE.time())
+            src = st.selectbox("Source", ["Emergency", "Elective", "Transfer"])
+
+        if st.button("Confirm Admission", type="primary"):
+            if pin == "Select..." or dept == "Select..." or bed in ["Select Dept", "NO BEDS AVAILABLE"]:
+                st.warning("Please complete all fields.")
+            elif DEPARTMENTS[dept]['gen'] != "Mixed" and DEPARTMENTS[dept]['gen'] != gender:
+                st.error(f"Error: Gender Mismatch. {dept} is for {DEPARTMENTS[dept]['gen']} only.")
+            else:
+                new_rec = {
+                    "PIN": pin, "Gender": gender, "Department": dept, "Bed": bed,
+                    "Admit_Date": datetime.combine(adm_d, adm_t),
+                    "Exp_Discharge": datetime.combine(exp_d, exp_t),
+                    "Actual_Discharge": pd.NaT,
+                    "Source": src
+                }
+                try:
+                    store.admit(new_rec)
+                except BedOccupiedError:
+                    st.error(f"Bed {bed} was just assigned to another patient. Please pick another bed.")
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    st.success("Admitted Successfully.")
+                    time.sleep(0.5)
+                    st.rerun()
+
+    admission_form()
+
+    # 2b. Batch Admission (a whole queue at once, home ward then overflow chain)
+    with st.expander("Batch Admission (overflow-aware)"):
+        st.caption("Queue patients with their home ward. Beds go to the home ward first, then along its overflow "
+                   "wards, honoring each ward's gender rule and using as few overflow beds as possible.")
+        batch_wards = site_scope("batch_site")
+        queue = st.data_editor(
+            pd.DataFrame({"PIN": pd.Series(dtype=str), "Department": pd.Series(dtype=str),
+                          "Source": pd.Series(dtype=str), "Exp_LOS_Days": pd.Series(dtype=float)}),
+            num_rows="dynamic", key="batch_queue", use_container_width=True,
+            column_config={
+                "PIN": st.column_config.TextColumn("PIN", required=True),
+                "Department": st.column_config.SelectboxColumn("Home Ward", options=batch_wards, required=True),
+                "Source": st.column_config.SelectboxColumn("Source", options=schema.SOURCES, default="Emergency"),
+                "Exp_LOS_Days": st.column_config.NumberColumn("Exp LOS (days)", min_value=0, default=3),
+            })
+        queue = queue.dropna(subset=["PIN", "Department"])
+        pins = queue["PIN"].astype(str).str.strip()
+        pending = pd.DataFrame({
+            "PIN": pins, "Gender": [registry.gender(p) for p in pins], "Department": queue["Department"],
+            "Admit_Date": CURRENT_DATE,
+            "Exp_Discharge": CURRENT_DATE + pd.to_timedelta(queue["Exp_LOS_Days"].fillna(3), unit="D"),
+            "Source": queue["Source"].fillna("Emergency"),
+        }, index=queue.index)
+        b1, b2 = st.columns(2)
+        if b1.button("Preview Allocation", disabled=pending.empty):
+            st.session_state.batch_plan = pending[["PIN", "Gender", "Department"]].join(store.admit_batch(pending, commit=False))
+        if b2.button("Admit Batch", type="primary", disabled=pending.empty):
+            plan = pending[["PIN", "Gender", "Department"]].join(store.admit_batch(pending))
+            st.session_state.batch_plan = plan
+            st.session_state.batch_msg = f"Admitted {int(plan['Bed'].notna().sum())} of {len(plan)} patients."
+            st.session_state.pop("batch_queue", None)
             st.rerun()
+        if "batch_msg" in st.session_state:
+            st.success(st.session_state.pop("batch_msg"))
+        if "batch_plan" in st.session_state:
+            st.dataframe(st.session_state.batch_plan.rename(columns={"Department": "Home Ward"}).drop(columns="Hops"),
+                         use_container_width=True, hide_index=True)
 
     st.markdown("---")
 
     # 3. Patient Management
     st.subheader("Patient Management (Update / Discharge)")
-    active_df = df[df['Actual_Discharge'].isna()].sort_values(by="Admit_Date", ascending=False)
+    active_df = active_external(data_version)
     
+    if "bulk_msg" in st.session_state:
+        st.success(st.session_state.pop("bulk_msg"))
+
     if not active_df.empty:
+        # Bulk mode: mark many discharges / shift many Exp_Discharge values, applied in one transaction
+        with st.expander("Bulk Discharge / Update (ward rounds)"):
+            bw1, bw2 = st.columns(2)
+            bulk_wards = site_scope("bulk_site", bw1)
+            bulk_dept = bw2.selectbox("Ward", ["All Wards"] + bulk_wards, key="bulk_dept")
+            grid = active_df[active_df['Department'].isin(bulk_wards if bulk_dept == "All Wards" else [bulk_dept])]
+            grid = grid[['PIN', 'Department', 'Bed', 'Admit_Date', 'Exp_Discharge']].assign(
+                Discharge=False, Discharge_Time=pd.Timestamp(CURRENT_DATE))
+            # Editor edits are kept by row position, so the grid is keyed on the rows it shows (stay ids and
+            # expected discharges): when one of them changes it starts fresh instead of moving ticks onto
+            # other patients; changes elsewhere in the hospital keep the ticks
+            bulk_rows = int(pd.util.hash_pandas_object(grid['Exp_Discharge']).sum())
+            bulk_key = f"bulk_grid_{bulk_rows}"
+            bulk_shown = st.session_state.get("bulk_rows")
+            st.session_state.bulk_rows = bulk_rows
+            with st.form("bulk_form"):
+                edited = st.data_editor(
+                    grid, key=bulk_key, use_container_width=True, hide_index=True,
+                    disabled=['PIN', 'Department', 'Bed', 'Admit_Date'],
+                    column_config={
+                        "Exp_Discharge": st.column_config.DatetimeColumn("Exp Discharge", format="YYYY-MM-DD HH:mm"),
+                        "Discharge": st.column_config.CheckboxColumn("Discharge"),
+                        "Discharge_Time": st.column_config.DatetimeColumn("Discharge Time", format="YYYY-MM-DD HH:mm"),
+                    })
+                apply_bulk = st.form_submit_button("Apply Changes", type="primary")
+            if apply_bulk and bulk_shown != bulk_rows:
+                st.warning("These patients changed while you were editing, so nothing was applied. "
+                           "Review the refreshed list and apply again.")
+            elif apply_bulk:
+                marked = edited[edited['Discharge']]
+                shifted = edited['Exp_Discharge'].ne(grid['Exp_Discharge']) & edited['Exp_Discharge'].notna()
+                try:
+                    n_dis, n_up = store.bulk_update(
+                        marked['Discharge_Time'].fillna(pd.Timestamp(CURRENT_DATE)).to_dict(),
+                        edited.loc[shifted, 'Exp_Discharge'].to_dict(),
+                        shown=grid.loc[marked.index.union(edited.index[shifted]), 'Exp_Discharge'].to_dict())
+                except ValueError as e:
+                    st.error(f"No changes applied. {e}")
+                else:
+                    st.session_state.bulk_msg = f"Discharged {n_dis} patients, updated {n_up} expected discharges."
+                    st.session_state.pop(bulk_key, None)
+                    st.rerun()
+
         target = st.selectbox("Select Patient to Manage", ["Select..."] + active_df['PIN'].tolist())
         
         if target != "Select...":
-            p_idx = df[(df['PIN'] == target) & (df['Actual_Discharge'].isna())].index[0]
-            p_row = df.loc[p_idx]
+            p_idx = active_df.index[active_df['PIN'] == target][0]
+            p_row = active_df.loc[p_idx]
             
             st.info(f"Managing: **{target}** | Dept: **{p_row['Department']}** | Bed: **{p_row['Bed']}**")
             
-            tab_up, tab_dis = st.tabs(["Edit Expected Discharge", "Discharge Patient"])
+            tab_up, tab_tr, tab_dis = st.tabs(["Edit Expected Discharge", "Transfer", "Discharge Patient"])
             
             with tab_up:
                 c_up1, c_up2 = st.columns(2)
-                new_exp_d = c_up1.date_input("New Expected Date", p_row['Exp_Discharge'])
-                new_exp_t = c_up2.time_input("New Expected Time", p_row['Exp_Discharge'].time())
+                # Imported rows may have no expected discharge yet
+                cur_exp = p_row['Exp_Discharge'] if pd.notna(p_row['Exp_Discharge']) else pd.Timestamp(CURRENT_DATE)
+                new_exp_d = c_up1.date_input("New Expected Date", cur_exp)
+                new_exp_t = c_up2.time_input("New Expected Time", cur_exp.time())
                 if st.button("Update Information"):
-                    st.session_state.df.at[p_idx, 'Exp_Discharge'] = datetime.combine(new_exp_d, new_exp_t)
+                    store.update_exp(p_idx, datetime.combine(new_exp_d, new_exp_t))
                     st.success("Record Updated.")
                     st.rerun()
             
+            with tab_tr:
+                # Another ward closes this ward stay and opens a new one; the same ward only changes the bed
+                c_t1, c_t2 = st.columns(2)
+                tr_wards = site_scope("tr_site", c_t1, list(SITES).index(DEPARTMENTS[p_row['Department']]['site']))
+                ok_depts = [d for d in tr_wards if DEPARTMENTS[d]['gen'] in ("Mixed", p_row['Gender'])]
+                tr_dept = c_t1.selectbox("Transfer To", ok_depts)
+                tr_beds = store.free_beds(tr_dept)
+                tr_bed = c_t2.selectbox("New Bed", tr_beds if tr_beds else ["NO BEDS AVAILABLE"])
+                c_t3, c_t4 = st.columns(2)
+                tr_d = c_t3.date_input("Transfer Date", CURRENT_DATE)
+                tr_t = c_t4.time_input("Transfer Time", CURRENT_DATE.time())
+                if st.button("Confirm Transfer", disabled=not tr_beds):
+                    try:
+                        store.transfer(p_idx, tr_dept, tr_bed, datetime.combine(tr_d, tr_t))
+                    except (BedOccupiedError, ValueError) as e:
+                        st.error(str(e))
+                    else:
+                        st.success(f"Patient {target} moved to {tr_dept} / {tr_bed}.")
+                        time.sleep(0.5)
+                        st.rerun()
+
             with tab_dis:
                 c_d1, c_d2 = st.columns(2)
                 act_d = c_d1.date_input("Actual Discharge Date", CURRENT_DATE)
                 act_t = c_d2.time_input("Actual Discharge Time", CURRENT_DATE.time())
                 if st.button("Confirm Discharge", type="primary"):
-                    st.session_state.df.at[p_idx, 'Actual_Discharge'] = datetime.combine(act_d, act_t)
+                    store.discharge(p_idx, datetime.combine(act_d, act_t))
                     st.success(f"Patient {target} Discharged.")
                     time.sleep(0.5)
                     st.rerun()
@@ -405,38 +719,11 @@ elif menu == "Live Admissions":
 # ---------------------------------------------------------
 elif menu == "Operational Analytics":
     st.title("Operational Analytics")
-    calc = df.copy()
     
-    # --- 1. CALCULATE KPIs (Hospital Level) ---
-    if not calc.empty:
-        min_date = calc['Admit_Date'].min()
-        max_date = CURRENT_DATE
-        days_range = (max_date - min_date).days
-        if days_range < 1: days_range = 1
-    else:
-        days_range = 1
-        
-    total_dis = len(calc[calc['Actual_Discharge'].notnull()])
-    total_cap = sum(d['cap'] for d in DEPARTMENTS.values())
-    
-    # BOR
-    active = calc[calc['Actual_Discharge'].isna()]
-    h_bor = (len(active) / total_cap) * 100
-    
-    # ALOS
-    discharged_only = calc[calc['Actual_Discharge'].notnull()]
-    h_alos = 0
-    if not discharged_only.empty:
-        h_alos = (discharged_only['Actual_Discharge'] - discharged_only['Admit_Date']).dt.total_seconds().mean() / 86400
-        
-    # BTR & BTI
-    h_btr = total_dis / total_cap
-    
-    calc['Discharge_Calc'] = calc['Actual_Discharge'].fillna(CURRENT_DATE)
-    calc['Patient_Days'] = (calc['Discharge_Calc'] - calc['Admit_Date']).dt.total_seconds() / 86400
-    total_pat_days = calc['Patient_Days'].sum()
-    avail_bed_days = (total_cap * days_range) - total_pat_days
-    h_bti = avail_bed_days / total_dis if total_dis > 0 else 0
+    # --- 1. KPIs (Hospital Level) from the running aggregates ---
+    with metrics.span("compute.hospital_kpis"):
+        h_kpi = store.hospital_kpis(CURRENT_DATE)
+    h_bor, h_alos, h_btr, h_bti = h_kpi['BOR'], h_kpi['ALOS'], h_kpi['BTR'], h_kpi['BTI']
 
     # --- 2. DISPLAY KPIs ---
     st.markdown('<div class="section-header">Operational KPIs</div>', unsafe_allow_html=True)
@@ -454,56 +741,9 @@ elif menu == "Operational Analytics":
     # --- 3. TREND CHART (Line Chart with Markers) - EXACT MATCH ---
     st.markdown('<div class="section-header">Admissions vs Discharges (Operational Trend)</div>', unsafe_allow_html=True)
     
-    # Aggregate data by Date
-    daily_adm = calc.groupby(calc['Admit_Date'].dt.date).size().reset_index(name='Admissions')
-    
-    if not discharged_only.empty:
-        daily_dis = discharged_only.groupby(discharged_only['Actual_Discharge'].dt.date).size().reset_index(name='Discharges')
-    else:
-        daily_dis = pd.DataFrame(columns=['Actual_Discharge', 'Discharges'])
-
-    # Merge and fill NaN with 0
-    if not daily_adm.empty:
-        trend = pd.merge(daily_adm, daily_dis, left_on='Admit_Date', right_on='Actual_Discharge', how='outer')
-        trend['Admit_Date'] = trend['Admit_Date'].fillna(trend['Actual_Discharge'])
-        trend = trend.drop(columns=['Actual_Discharge']).fillna(0).sort_values('Admit_Date')
-        
-        # Filter for the last 7-10 days leading up to CURRENT_DATE
-        mask = (trend['Admit_Date'] <= CURRENT_DATE.date()) & (trend['Admit_Date'] >= (CURRENT_DATE - timedelta(days=10)).date())
-        trend = trend.loc[mask]
-
-        # Plotly Line Chart to mimic the reference image
-        fig_trend = go.Figure()
-        
-        # Line 1: Admissions (Blue)
-        fig_trend.add_trace(go.Scatter(
-            x=trend['Admit_Date'], y=trend['Admissions'],
-            mode='lines+markers',
-            name='Admissions',
-            line=dict(color='#1f77b4', width=2), # Standard Blue
-            marker=dict(size=8)
-        ))
-        
-        # Line 2: Discharges (Orange)
-        fig_trend.add_trace(go.Scatter(
-            x=trend['Admit_Date'], y=trend['Discharges'],
-            mode='lines+markers',
-            name='Discharges',
-            line=dict(color='#ff7f0e', width=2), # Standard Orange
-            marker=dict(size=8)
-        ))
-        
-        fig_trend.update_layout(
-            paper_bgcolor="#0E1117", 
-            plot_bgcolor="#0E1117", 
-            font={'color': "white"},
-            xaxis_title="Date", 
-            yaxis_title="Number of Patients",
-            xaxis=dict(showgrid=True, gridcolor='#30363D'),
-            yaxis=dict(showgrid=True, gridcolor='#30363D'),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-            margin=dict(l=0, r=0, t=20, b=0)
-        )
+    # Daily admissions / discharges for the last 10 days leading up to CURRENT_DATE
+    fig_trend = trend_figure(data_version, CURRENT_DATE - timedelta(days=10), CURRENT_DATE)
+    if fig_trend is not None:
         st.plotly_chart(fig_trend, use_container_width=True)
     else:
         st.info("No data available for trend analysis.")
@@ -513,33 +753,14 @@ elif menu == "Operational Analytics":
     # --- 4. Detailed Department Table ---
     st.markdown('<div class="section-header">Hospital Details Performance</div>', unsafe_allow_html=True)
     
-    dept_rows = []
-    for dept, info in DEPARTMENTS.items():
-        d_df = calc[calc['Department'] == dept]
-        
-        d_active = len(d_df[d_df['Actual_Discharge'].isna()])
-        d_bor = (d_active / info['cap']) * 100
-        
-        d_dis = d_df[d_df['Actual_Discharge'].notnull()]
-        d_alos = (d_dis['Actual_Discharge'] - d_dis['Admit_Date']).dt.total_seconds().mean() / 86400 if not d_dis.empty else 0
-        
-        d_btr = len(d_dis) / info['cap']
-        
-        d_pat_days = ((d_df['Discharge_Calc'] - d_df['Admit_Date']).dt.total_seconds() / 86400).sum()
-        d_avail_days = (info['cap'] * days_range) - d_pat_days
-        d_bti = d_avail_days / len(d_dis) if len(d_dis) > 0 else 0
-        
-        dept_rows.append({
-            "Department": dept,
-            "BOR (%)": round(d_bor, 1),
-            "ALOS (Days)": round(d_alos, 1),
-            "BTR (Times)": round(d_btr, 2),
-            "BTI (Days)": round(d_bti, 1)
-        })
-    
     # Progress Bar for BOR
+    if len(SITES) > 1:
+        st.dataframe(
+            site_performance(data_version),
+            column_config={"BOR (%)": st.column_config.ProgressColumn("BOR (%)", format="%.1f%%", min_value=0, max_value=100)},
+            use_container_width=True, hide_index=True)
     st.dataframe(
-        pd.DataFrame(dept_rows),
+        department_performance(data_version),
         column_config={
             "BOR (%)": st.column_config.ProgressColumn(
                 "BOR (%)",
@@ -552,14 +773,171 @@ elif menu == "Operational Analytics":
         hide_index=True
     )
 
+    st.markdown("---")
+
+    # --- 5. Census Timeline (any historical period, from the interval index) ---
+    st.markdown('<div class="section-header">Census Timeline</div>', unsafe_allow_html=True)
+    t1, t2, t3 = st.columns([2, 1, 1])
+    tl_range = t1.date_input("Period", (CURRENT_DATE.date() - timedelta(days=14), CURRENT_DATE.date()), max_value=CURRENT_DATE.date())
+    tl_wards = site_scope("tl_site", t2)
+    tl_dept = t3.selectbox("Ward", ["Hospital"] + tl_wards)
+    if len(tl_range) == 2:
+        tl_start = pd.Timestamp(tl_range[0])
+        tl_end = min(pd.Timestamp(tl_range[1]) + timedelta(days=1), pd.Timestamp(CURRENT_DATE))
+        stats, fig_tl = timeline_view(data_version, tl_start, tl_end, tl_dept)
+        row = stats.loc[tl_dept]
+        m1, m2, m3 = st.columns(3)
+        m1.markdown(kpi_box("Avg Midnight Census", f"{row['Midnight_Census']:.1f}", f"of {row['Capacity']} beds"), unsafe_allow_html=True)
+        m2.markdown(kpi_box("Peak Occupancy", f"{row['Peak']}", f"{row['Peak_Time']:%d %b %H:%M}"), unsafe_allow_html=True)
+        m3.markdown(kpi_box("BOR", f"{row['BOR']:.1f}", "% of bed-days"), unsafe_allow_html=True)
+
+        st.plotly_chart(fig_tl, use_container_width=True)
+
+        st.dataframe(
+            stats.loc[["Hospital"] + tl_wards].reset_index()[["Department", "Midnight_Census", "Peak", "Peak_Time", "Patient_Days", "BOR"]].round(
+                {"Midnight_Census": 1, "Patient_Days": 1, "BOR": 1}),
+            column_config={"BOR": st.column_config.ProgressColumn("BOR (%)", format="%.1f%%", min_value=0, max_value=100)},
+            use_container_width=True, hide_index=True)
+
+    st.markdown("---")
+
+    # --- 6. Surge Simulation (Monte Carlo from the current census) ---
+    st.markdown('<div class="section-header">Surge Simulation</div>', unsafe_allow_html=True)
+    with st.form("surge_form"):
+        s1, s2, s3 = st.columns(3)
+        sg_factor = s1.slider("Arrival surge factor", 1.0, 3.0, surge.DEFAULT_SURGE["factor"], 0.1)
+        sg_sources = s1.multiselect("Surging sources", schema.SOURCES, default=surge.DEFAULT_SURGE["sources"])
+        sg_days = s2.number_input("Surge length (days)", 1, 28, 7)
+        sg_horizon = s2.number_input("Horizon (days)", 1, 28, 14)
+        sg_reps = s3.select_slider("Replications", [128, 256, 512, 1024, 2048], value=512)
+        sg_seed = s3.number_input("Seed", 0, 2**31 - 1, DEMO_SEED)
+        run_surge = st.form_submit_button("Run Simulation")
+    if run_surge:
+        sg_horizon_h = int(sg_horizon) * 24
+        with st.spinner("Simulating..."):
+            inputs = store.surge_inputs(CURRENT_DATE, sg_horizon_h, {
+                "factor": sg_factor, "sources": sg_sources or None, "hours": min(int(sg_days) * 24, sg_horizon_h)})
+            st.session_state.surge_result = surge.simulate(inputs, reps=int(sg_reps), seed=int(sg_seed),
+                                                            pool=get_surge_pool())
+    if "surge_result" in st.session_state:
+        results = st.session_state.surge_result
+        summary = surge.summarize(results)
+        hosp = summary.loc["Hospital"]
+        m1, m2, m3 = st.columns(3)
+        m1.markdown(kpi_box("Hospital BOR (P50)", f"{hosp[('bor', 'p50')]:.1f}", f"% (P95 {hosp[('bor', 'p95')]:.1f}%)"), unsafe_allow_html=True)
+        m2.markdown(kpi_box(f"Hours at >= {core.CRIT_PCT}%", f"{hosp[('crit_hours', 'p50')]:.0f}", f"P95 {hosp[('crit_hours', 'p95')]:.0f} h"), unsafe_allow_html=True)
+        m3.markdown(kpi_box("Overflow Placements", f"{hosp[('overflow_out', 'mean')]:.1f}", f"P95 {hosp[('overflow_out', 'p95')]:.0f}"), unsafe_allow_html=True)
+
+        sg_wards = site_scope("surge_site")
+        wards = results[results["Department"].isin(sg_wards)]
+        import plotly.graph_objects as go
+        fig_sg = go.Figure()
+        for dept in sg_wards:
+            fig_sg.add_trace(go.Box(x=wards.loc[wards["Department"] == dept, "bor"], name=dept, boxpoints=False))
+        fig_sg.add_vline(x=core.CRIT_PCT, line_dash="dot", line_color="#F85149", annotation_text="Critical")
+        fig_sg.update_layout(height=320, paper_bgcolor="#0E1117", plot_bgcolor="#0E1117", font={'color': "white"},
+                             xaxis=dict(showgrid=True, gridcolor='#30363D', title="Simulated BOR (%)"),
+                             margin=dict(l=0, r=0, t=20, b=0), showlegend=False)
+        st.plotly_chart(fig_sg, use_container_width=True)
+
+        table = pd.DataFrame({
+            "BOR P50": summary[("bor", "p50")], "BOR P95": summary[("bor", "p95")],
+            "Crit Hours P50": summary[("crit_hours", "p50")], "Crit Hours P95": summary[("crit_hours", "p95")],
+            "P(Critical)": summary["p_critical"] * 100,
+            "Overflow Out (mean)": summary[("overflow_out", "mean")], "Boarding Hours (mean)": summary[("boarding_hours", "mean")],
+        }).loc[["Hospital"] + sg_wards].rename_axis("Department").reset_index()
+        st.dataframe(
+            table.round(1),
+            column_config={"P(Critical)": st.column_config.ProgressColumn("P(Critical)", format="%.0f%%", min_value=0, max_value=100)},
+            use_container_width=True, hide_index=True)
+
 # ---------------------------------------------------------
 # 7. Settings
 # ---------------------------------------------------------
 elif menu == "Settings":
     st.title("System Settings")
-    st.warning("Factory Reset: This will wipe all data. Use it to fix Ghost Data issues.")
+    st.warning("Factory Reset: This will wipe all data for every session. Use it to fix Ghost Data issues.")
     if st.button("FACTORY RESET (Clean System)", type="primary"):
-        del st.session_state.df
-        st.success("System Reset Successfully.")
+        store.reset()
+        st.success("System Reset Successfully. The previous census can be restored from the Audit Trail below.")
         time.sleep(1)
         st.rerun()
+
+    st.markdown("---")
+    st.subheader("ADT Feed")
+    if adt_feed is None:
+        st.caption("No feed configured. Set OCCUPYBED_FEED_FILE (JSON lines) and/or OCCUPYBED_FEED_PORT and restart; "
+                   "`python -m occupybed.feed --help` writes or sends a demo stream.")
+    else:
+        fs = adt_feed.stats()
+        f1, f2, f3, f4 = st.columns(4)
+        f1.metric("Applied", f"{fs['applied']:,}")
+        f2.metric("Rejected", f"{fs['rejected']:,}")
+        f3.metric("Queued", f"{fs['queued']:,}")
+        f4.metric("Throughput", f"{fs['per_sec']:,.0f}/s" if fs['batches'] else "-")
+        st.caption(f"Sources: {fs['sources']} | {fs['batches']:,} batches | {fs['unreadable']:,} unreadable lines"
+                   + (f" | last batch {fs['last_batch']:%H:%M:%S}" if fs['last_batch'] is not None else ""))
+        if adt_feed.rejected:
+            st.dataframe(pd.DataFrame([dict(m, reason=r) for m, r in list(adt_feed.rejected)[::-1]]),
+                         use_container_width=True, hide_index=True, height=200)
+
+    if st.query_params.get("diagnostics"):
+        # Hidden panel: open Settings with ?diagnostics=1
+        st.markdown("---")
+        st.subheader("Diagnostics")
+        span_rows = pd.DataFrame(metrics.REGISTRY.spans(), columns=["span", "count", "total", "mean", "p50", "p95", "max"])
+        page_rows = span_rows[span_rows["span"].str.startswith("page.")]
+        d_cols = st.columns(max(len(page_rows), 1))
+        for d_col, (_, row) in zip(d_cols, page_rows.iterrows()):
+            d_col.metric(f"{row['span'][5:]} rerun p50 / p95", f"{row['p50'] * 1000:,.0f} / {row['p95'] * 1000:,.0f} ms",
+                         help=f"Over the last {min(row['count'], metrics.SAMPLES):,} of {row['count']:,} runs")
+        span_ms = span_rows.assign(**{c: span_rows[c] * 1000 for c in ["mean", "p50", "p95", "max"]}).drop(columns="total")
+        st.dataframe(span_ms, use_container_width=True, hide_index=True,
+                     column_config={c: st.column_config.NumberColumn(f"{c} (ms)", format="%.1f") for c in ["mean", "p50", "p95", "max"]})
+        memo_stats = page_cache.stats()
+        st.caption(" | ".join(f"{k.replace('_', ' ')}: {v:,.0f}" for k, v in metrics.REGISTRY.gauges().items())
+                   + f" | page cache: {memo_stats['hits']:,} hits / {memo_stats['misses']:,} misses")
+        with st.expander("Prometheus text"):
+            st.code(metrics.REGISTRY.render(), language="text")
+            st.caption(f"Served on {METRICS_HOST}:{METRICS_PORT}/metrics" if METRICS_PORT else "Set OCCUPYBED_METRICS_PORT to serve this on /metrics, "
+                       "or OCCUPYBED_METRICS_FILE to write it for a textfile collector.")
+        if st.button("Reset metrics"):
+            metrics.REGISTRY.reset()
+            st.rerun()
+
+    st.markdown("---")
+    st.subheader("Audit Trail (ADT Event Log)")
+    a1, a2 = st.columns([2, 1])
+    audit_pin = a1.text_input("Filter by PIN", placeholder="e.g. PIN-1042")
+    audit_limit = a2.number_input("Events", 50, 5000, 200, step=50)
+    audit_pin_no = schema.parse_pin(audit_pin) if audit_pin.strip() else None
+    if audit_pin.strip() and audit_pin_no is None:
+        st.warning("Invalid PIN format.")
+    else:
+        audit = store.audit(int(audit_limit), audit_pin_no)
+        audit["pin"] = "PIN-" + audit["pin"].astype("string")
+        st.dataframe(audit.dropna(axis=1, how="all"), use_container_width=True, hide_index=True)
+
+    with st.expander("Restore Census"):
+        st.caption("Rebuilds the active census as it was right after the chosen event (e.g. the one before a "
+                   "Factory Reset), from the nearest snapshot plus the log.")
+        last_seq = store.events.last_seq
+        restore_seq = st.number_input("Event #", 0, max(last_seq, 0), max(last_seq - 1, 0))
+        if st.button("Restore Census"):
+            n_restored = store.restore(int(restore_seq))
+            st.success(f"Restored {n_restored} active stays as of event #{restore_seq}.")
+            time.sleep(1)
+            st.rerun()
+
+# ---------------------------------------------------------
+# 8. Instrumentation (end of every full run)
+# ---------------------------------------------------------
+# Fragment reruns (search, admission form, live refresh checks) don't reach here
+metrics.observe(f"page.{menu}", time.perf_counter() - run_started)
+census_size = store.census_size()
+metrics.gauge("census_active_stays", census_size["active"])
+metrics.gauge("census_discharged_stays", census_size["discharged"])
+metrics.gauge("process_resident_memory_bytes", metrics.rss_bytes())
+metrics.gauge("page_cache_entries", len(page_cache))
+if METRICS_FILE and (not os.path.exists(METRICS_FILE) or time.time() - os.path.getmtime(METRICS_FILE) >= METRICS_FILE_SECS):
+    metrics.REGISTRY.write_file(METRICS_FILE)
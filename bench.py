@@ -0,0 +1,174 @@
+"""Benchmark each page's hot path at 10k / 100k / 1M stays.
+
+    python bench.py                      # all sizes, results in bench_output.txt
+    python bench.py --sizes 10000 --repeat 3 --store
+    python bench.py --sizes 1000000 --sites 300       # 2,100 wards over 300 sites
+
+Census data comes from occupybed.synth (seeded), with ward capacities scaled
+so that HISTORY_DAYS of history holds the requested number of stays. The
+Overview / Live Admissions / Analytics paths run against a CensusStore loaded
+with that census and make the same store calls as app.py; the model builds
+(LOS model, timeline, surge) run on the census frame. Latency
+is the median over --repeat runs; peak memory is the tracemalloc peak of one
+extra run, so it covers Python / numpy / pandas allocations but not Arrow or
+SQLite buffers.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from occupybed import core, feed, schema, surge, synth
+from occupybed.config import DEPARTMENTS
+from occupybed.forecast import WINDOWS
+from occupybed.los_model import LosModel
+from occupybed.store import CensusStore
+from occupybed.timeline import CensusTimeline
+
+SIZES = [10_000, 100_000, 1_000_000]
+HISTORY_DAYS = 730
+NOW = pd.Timestamp("2026-01-08 12:00")
+FORECAST_HOURS = 24
+TREND_DAYS = 10
+SURGE_REPS = 256
+ADT_MESSAGES = 20_000
+
+
+def scaled_departments(n_stays, departments=DEPARTMENTS):
+    # Stays per bed per day at the generator's default occupancy and LOS
+    per_bed = synth.DEFAULT_OCCUPANCY / synth.DEFAULT_LOS[0] * HISTORY_DAYS
+    scale = n_stays / per_bed / sum(info['cap'] for info in departments.values())
+    return {dept: dict(info, cap=max(1, round(info['cap'] * scale))) for dept, info in departments.items()}
+
+
+# --- Page paths (store calls made by app.py) ---
+def overview(store, departments):
+    windows = store.expected_free(NOW, WINDOWS)
+    table = core.occupancy(store.active(), departments, windows[FORECAST_HOURS])
+    sites = core.site_summary(table)
+    model = store.predicted_free(NOW, range(WINDOWS[-1] + 1))
+    curve = store.discharge_curve(NOW, horizon=WINDOWS[-1])
+    return core.hospital_summary(table), core.recommendations(table), sites, core.recommendations(sites), model, curve
+
+
+def live_admissions(store, departments):
+    beds = {dept: store.free_beds(dept) for dept in departments}
+    return beds, schema.to_external(store.active()).sort_values(by="Admit_Date", ascending=False)
+
+
+def analytics(store, departments):
+    trend = store.daily_flow(NOW - pd.Timedelta(days=TREND_DAYS), NOW)
+    return (store.hospital_kpis(NOW), core.department_table(store.department_kpis(NOW)),
+            core.department_table(store.site_kpis(NOW)), trend)
+
+
+# --- Model builds (from the census frame) ---
+
+def los_forecast(census, departments):
+    # Full LOS-model training on the discharged stays, then scoring the active census
+    model = LosModel(departments)
+    done = census[census["Actual_Discharge"].notna()]
+    model.add(done["Department"].to_numpy(), done["Source"].to_numpy(),
+              (done["Actual_Discharge"] - done["Admit_Date"]).dt.total_seconds().astype("int64").to_numpy())
+    return model.bed_forecast(core.active(census), NOW, range(WINDOWS[-1] + 1))
+
+
+def census_timeline(census, departments):
+    # Interval index build, then a month of period stats and an hourly curve
+    timeline = CensusTimeline(departments)
+    timeline.add(census["Department"].to_numpy(), core.epoch_seconds(census["Admit_Date"]), core.epoch_seconds(census["Actual_Discharge"]))
+    start = NOW - pd.Timedelta(days=30)
+    return timeline.period_stats(start, NOW), timeline.curve(start, NOW)
+
+
+def surge_simulation(census, departments):
+    # Two weeks ahead from the current census, SURGE_REPS replications in-process
+    model = LosModel(departments)
+    done = census[census["Actual_Discharge"].notna()]
+    model.add(done["Department"].to_numpy(), done["Source"].to_numpy(),
+              (done["Actual_Discharge"] - done["Admit_Date"]).dt.total_seconds().astype("int64").to_numpy())
+    rates = surge.arrival_rates(census, departments, NOW)
+    inputs = surge.prepare(core.active(census), model, rates, departments, NOW)
+    return surge.summarize(surge.simulate(inputs, reps=SURGE_REPS, seed=0, workers=1))
+
+
+STORE_PAGES = {"overview": overview, "live_admissions": live_admissions, "analytics": analytics}
+MODEL_PAGES = {"los_forecast": los_forecast, "census_timeline": census_timeline, "surge_simulation": surge_simulation}
+
+
+def store_open(census, departments, tmp):
+    # Full census load, then a cold open (index + KPI rebuild from the archive)
+    path = os.path.join(tmp, f"bench-{len(census)}-{time.perf_counter_ns()}", "o.db")
+    CensusStore(path, departments).append_typed(census)
+    store = CensusStore(path, departments)
+    return store.hospital_kpis(NOW)
+
+
+def adt_ingest(store, departments):
+    # ADT_MESSAGES demo messages through the feed's queue and micro-batches
+    msgs = feed.demo_messages(departments, ADT_MESSAGES, NOW, first_pin=10**9 + store.events.last_seq)
+
+    async def run():
+        ingestor = feed.Ingestor(store)
+        consumer = asyncio.create_task(ingestor.run())
+        for msg in msgs:
+            await ingestor.queue.put(msg)
+        await ingestor.queue.join()
+        consumer.cancel()
+        return ingestor.applied
+
+    return asyncio.run(run())
+
+
+def measure(fn, args, repeat):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - t)
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sites", type=int, default=1, help="copies of the built-in wards, one per site")
+    parser.add_argument("--store", action="store_true", help="also time loading and reopening a CensusStore, and ADT feed ingest")
+    parser.add_argument("--out", default="bench_output.txt")
+    args = parser.parse_args()
+
+    lines = [f"{'stays':>10}  {'page':<16}  {'median ms':>10}  {'peak MB':>8}"]
+    print(lines[0])
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            departments = scaled_departments(size, synth.group_departments(args.sites) if args.sites > 1 else DEPARTMENTS)
+            census = synth.generate(departments, days=HISTORY_DAYS, end=NOW, seed=args.seed)
+            store = CensusStore(os.path.join(tmp, f"pages-{len(census)}", "o.db"), departments)
+            store.append_typed(census)
+            runs = [(name, fn, (store, departments), args.repeat) for name, fn in STORE_PAGES.items()]
+            runs += [(name, fn, (census, departments), args.repeat) for name, fn in MODEL_PAGES.items()]
+            if args.store:
+                # adt_ingest last: it writes into the store the page paths read
+                runs.append(("store_open", store_open, (census, departments, tmp), 1))
+                runs.append(("adt_ingest", adt_ingest, (store, departments), 1))
+            for name, fn, fn_args, repeat in runs:
+                secs, peak = measure(fn, fn_args, repeat)
+                lines.append(f"{len(census):>10}  {name:<16}  {secs * 1000:>10.1f}  {peak / 2**20:>8.1f}")
+                print(lines[-1], flush=True)
+    with open(args.out, "w") as fh:
+        fh.write("\n".join(lines) + "\n")
+
+
+if __name__ == "__main__":
+    main()
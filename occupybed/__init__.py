@@ -0,0 +1 @@
+# OccupyBed AI - storage & compute modules used by app.py
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------
+# Batch Bed Allocation (overflow-aware)
+# ---------------------------------------------------------
+# A batch of pending admissions, each with a home ward, is placed as one
+# min-cost flow:
+#
+#   source -> (home ward, gender) group -> usable ward -> free beds -> sink
+#
+# A ward is usable for a group if it is on the home ward's overflow chain
+# (home -> its overflow -> that ward's overflow ...) and its gender rule
+# admits the patient; the edge cost is the number of hops from home. The
+# flow places as many patients as possible and, among those placements,
+# uses the fewest overflow hops. The graph has at most 3 x wards nodes
+# whatever the batch size, so a batch of hundreds is placed in milliseconds.
+# Within a group, earlier patients in the batch get the cheaper wards, and
+# beds are taken lowest slot first.
+
+HOME, OVERFLOW, NO_BED, MISMATCH, UNKNOWN = "Home", "Overflow", "No free bed", "Gender mismatch", "Unknown ward"
+
+
+def chain(departments, dept):
+    # Home ward followed by its overflow wards, stopping at an unconfigured ward or a cycle
+    wards = []
+    while dept in departments and dept not in wards:
+        wards.append(dept)
+        dept = departments[dept].get('overflow')
+    return wards
+
+
+def admits(departments, ward, gender):
+    return departments[ward]['gen'] in ("Mixed", gender)
+
+
+def _min_cost_flow(n_nodes, edges, source, sink):
+    # Successive shortest paths (Bellman-Ford on the residual graph); edges are
+    # (u, v, capacity, cost) and the flow on each is returned
+    graph = [[] for _ in range(n_nodes)]
+    head, cap, cost = [], [], []
+    for u, v, c, w in edges:
+        graph[u].append(len(head))
+        head += [v, u]
+        cap += [c, 0]
+        cost += [w, -w]
+        graph[v].append(len(head) - 1)
+    while True:
+        dist, prev = [np.inf] * n_nodes, [-1] * n_nodes
+        dist[source] = 0
+        changed = True
+        while changed:
+            changed = False
+            for u in range(n_nodes):
+                if dist[u] == np.inf:
+                    continue
+                for e in graph[u]:
+                    if cap[e] > 0 and dist[u] + cost[e] < dist[head[e]]:
+                        dist[head[e]], prev[head[e]] = dist[u] + cost[e], e
+                        changed = True
+        if dist[sink] == np.inf:
+            break
+        push, v = np.inf, sink
+        while v != source:
+            push, v = min(push, cap[prev[v]]), head[prev[v] ^ 1]
+        v = sink
+        while v != source:
+            cap[prev[v]] -= push
+            cap[prev[v] ^ 1] += push
+            v = head[prev[v] ^ 1]
+    return [c - cap[2 * i] for i, (_, _, c, _) in enumerate(edges)]
+
+
+def allocate(pending, departments, free_slots):
+    # pending: Department (home ward) and Gender per patient, in batch order;
+    # free_slots: ward -> free bed slots. Returns Ward, Bed (slot, -1 if not
+    # placed), Hops and Status per patient, on pending's index.
+    homes = pending["Department"].astype(object).to_numpy()
+    genders = pending["Gender"].astype(object).to_numpy()
+    n = len(pending)
+    ward_out = np.full(n, None, dtype=object)
+    bed_out = np.full(n, -1, dtype=np.int64)
+    hops_out = np.full(n, -1, dtype=np.int64)
+    status = np.where(pd.Series(homes).isin(list(departments)).to_numpy(), NO_BED, UNKNOWN).astype(object)
+    known = status == NO_BED
+    status[known] = [NO_BED if admits(departments, h, g) else MISMATCH for h, g in zip(homes[known], genders[known])]
+
+    groups = {}
+    for i in np.flatnonzero(status == NO_BED):
+        groups.setdefault((homes[i], genders[i]), []).append(i)
+    wards = list(departments)
+    ward_node = {w: 1 + len(groups) + k for k, w in enumerate(wards)}
+    sink = 1 + len(groups) + len(wards)
+    edges, options = [], []
+    for g, ((home, gender), members) in enumerate(groups.items()):
+        edges.append((0, 1 + g, len(members), 0))
+        for hop, ward in enumerate(chain(departments, home)):
+            if admits(departments, ward, gender):
+                options.append((g, ward, hop, len(edges)))
+                edges.append((1 + g, ward_node[ward], len(members), hop))
+    for ward in wards:
+        edges.append((ward_node[ward], sink, len(free_slots.get(ward, [])), 0))
+    flow = _min_cost_flow(sink + 1, edges, 0, sink)
+
+    # Patients in batch order take their group's cheapest wards first
+    taken = {ward: 0 for ward in wards}
+    members = list(groups.values())
+    cursor = [0] * len(groups)
+    for g, ward, hop, e in sorted(options, key=lambda o: (o[0], o[2])):
+        k = flow[e]
+        if not k:
+            continue
+        idx = members[g][cursor[g]:cursor[g] + k]
+        cursor[g] += k
+        ward_out[idx] = ward
+        bed_out[idx] = free_slots[ward][taken[ward]:taken[ward] + k]
+        hops_out[idx] = hop
+        status[idx] = HOME if hop == 0 else OVERFLOW
+        taken[ward] += k
+    return pd.DataFrame({"Ward": ward_out, "Bed": bed_out, "Hops": hops_out, "Status": status}, index=pending.index)
@@ -0,0 +1,126 @@
+import heapq
+
+import numpy as np
+
+# ---------------------------------------------------------
+# Bed Occupancy Index
+# ---------------------------------------------------------
+# Per department, an array keyed by bed slot holds the stay id in that bed
+# (-1 = free), plus a running free count and a min-heap of free slots.
+#   free count / occupant of a bed  -> O(1)
+#   first free bed                   -> O(log cap) amortized (lazy heap)
+# Beds are addressed by 0-based slot; "<DEP>-<nnn>" labels are only for
+# display. Stays without a bed (slot NO_BED) are not indexed; occupying any
+# other slot outside the ward raises ValueError.
+
+FREE = -1
+NO_BED = -1
+
+
+class BedOccupiedError(Exception):
+    pass
+
+
+def bed_prefix(dept):
+    # Up to 3 letters of the ward name, so "ED" beds are "ED-001"
+    return f"{dept[:3].upper()}-"
+
+
+def bed_label(dept, slot):
+    return f"{bed_prefix(dept)}{slot + 1:03d}"
+
+
+def bed_slot(dept, label, cap):
+    prefix = bed_prefix(dept)
+    if not isinstance(label, str) or not label.startswith(prefix):
+        return None
+    num = label[len(prefix):]
+    if not (num.isascii() and num.isdigit()):
+        return None
+    slot = int(num) - 1
+    return slot if 0 <= slot < cap else None
+
+
+class BedIndex:
+    def __init__(self, departments):
+        self.caps = {dept: info['cap'] for dept, info in departments.items()}
+        self._occ = {dept: np.full(cap, FREE, dtype=np.int64) for dept, cap in self.caps.items()}
+        self._free = dict(self.caps)
+        self._heap = {dept: list(range(cap)) for dept, cap in self.caps.items()}
+        self._in_heap = {dept: np.ones(cap, dtype=bool) for dept, cap in self.caps.items()}
+        self._where = {}
+
+    def load(self, active):
+        for stay_id, dept, slot in zip(active.index, active['Department'], active['Bed']):
+            if self._valid(dept, int(slot)):
+                self.occupy(dept, int(slot), int(stay_id))
+
+    def slot(self, dept, bed):
+        # Slot of a bed label or of an integer slot; None if not a bed of the ward
+        cap = self.caps.get(dept)
+        if cap is None:
+            return None
+        if isinstance(bed, (int, np.integer)) and not isinstance(bed, bool):
+            return int(bed) if 0 <= bed < cap else None
+        return bed_slot(dept, bed, cap)
+
+    def _valid(self, dept, slot):
+        return dept in self.caps and 0 <= slot < self.caps[dept]
+
+    # --- Queries ---
+    def free_count(self, dept):
+        return self._free.get(dept, 0)
+
+    def occupant(self, dept, slot):
+        if not self._valid(dept, slot):
+            return None
+        stay_id = self._occ[dept][slot]
+        return None if stay_id == FREE else int(stay_id)
+
+    def is_free(self, dept, slot):
+        return self.occupant(dept, slot) is None
+
+    def first_free(self, dept):
+        heap = self._heap.get(dept)
+        if heap is None:
+            return None
+        occ, in_heap = self._occ[dept], self._in_heap[dept]
+        while heap and occ[heap[0]] != FREE:
+            in_heap[heapq.heappop(heap)] = False
+        return bed_label(dept, heap[0]) if heap else None
+
+    def free_slots(self, dept):
+        if dept not in self._occ:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self._occ[dept] == FREE)
+
+    def free_beds(self, dept):
+        return [bed_label(dept, s) for s in self.free_slots(dept)]
+
+    def occupied_beds(self, dept):
+        if dept not in self._occ:
+            return set()
+        return {bed_label(dept, s) for s in np.flatnonzero(self._occ[dept] != FREE)}
+
+    # --- Updates ---
+    def occupy(self, dept, slot, stay_id):
+        if slot == NO_BED:
+            return
+        if not self._valid(dept, slot):
+            raise ValueError(f"Invalid bed for {dept}: slot {slot}")
+        if not self.is_free(dept, slot):
+            raise BedOccupiedError(f"{dept} bed {bed_label(dept, slot)} is already occupied.")
+        self._occ[dept][slot] = stay_id
+        self._free[dept] -= 1
+        self._where[stay_id] = (dept, slot)
+
+    def release(self, stay_id):
+        loc = self._where.pop(stay_id, None)
+        if loc is None:
+            return
+        dept, slot = loc
+        self._occ[dept][slot] = FREE
+        self._free[dept] += 1
+        if not self._in_heap[dept][slot]:
+            self._in_heap[dept][slot] = True
+            heapq.heappush(self._heap[dept], slot)
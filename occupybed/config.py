@@ -0,0 +1,95 @@
+import os
+
+import pandas as pd
+
+# ---------------------------------------------------------
+# Ward Configuration
+# ---------------------------------------------------------
+# cap: licensed beds, gen: Male / Female / Mixed, overflow: ward that takes
+# this ward's patients when it is full ("None" = no overflow ward), site:
+# hospital of the group the ward belongs to.
+#
+# The built-in wards below form one demo site. A group configuration is a
+# table (CSV, Parquet or JSON records) with one row per ward, pointed to by
+# OCCUPYBED_WARDS:
+#
+#   Site,Department,Capacity,Gender,Overflow
+#   North,Medical Male,50,Male,Surgical Male (North)
+#
+# Ward names are unique across the whole group (the census, bed index and
+# event log key on them), so sites with the same ward types need distinct
+# names, e.g. a site suffix. Rows keep their file order, which is the order
+# wards and sites are shown in.
+
+DEFAULT_SITE = "Main"
+GENDER_RULES = ("Male", "Female", "Mixed")
+TABLE_COLUMNS = ["Site", "Department", "Capacity", "Gender", "Overflow"]
+
+_BUILTIN = {
+    "Medical Male": {"cap": 50, "gen": "Male", "overflow": "Surgical Male"},
+    "Medical Female": {"cap": 50, "gen": "Female", "overflow": "Surgical Female"},
+    "Surgical Male": {"cap": 40, "gen": "Male", "overflow": "Medical Male"},
+    "Surgical Female": {"cap": 40, "gen": "Female", "overflow": "Medical Female"},
+    "ICU": {"cap": 16, "gen": "Mixed", "overflow": "HDU"},
+    "Pediatric": {"cap": 30, "gen": "Mixed", "overflow": "None"},
+    "Obstetrics": {"cap": 24, "gen": "Female", "overflow": "Gynae"},
+}
+
+
+def from_table(frame):
+    # Ward table -> departments dict; raises ValueError listing every problem
+    missing = [c for c in ["Department", "Capacity", "Gender"] if c not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing ward columns: {', '.join(missing)}")
+    frame = frame.reindex(columns=TABLE_COLUMNS)
+    names = frame["Department"].astype("string").str.strip()
+    caps = pd.to_numeric(frame["Capacity"], errors="coerce")
+    sites = frame["Site"].astype("string").str.strip().fillna(DEFAULT_SITE)
+    overflow = frame["Overflow"].astype("string").str.strip().fillna("None")
+    problems = []
+    if names.isna().any() or (names == "").any():
+        problems.append("empty ward name")
+    dupes = names[names.duplicated()].dropna().unique().tolist()
+    if dupes:
+        problems.append(f"duplicate ward names {dupes[:5]}")
+    bad_cap = names[caps.isna() | (caps < 0) | (caps % 1 != 0)].tolist()
+    if bad_cap:
+        problems.append(f"invalid capacity for {bad_cap[:5]}")
+    bad_gen = names[~frame["Gender"].isin(GENDER_RULES)].tolist()
+    if bad_gen:
+        problems.append(f"gender rule not in {GENDER_RULES} for {bad_gen[:5]}")
+    if problems:
+        raise ValueError("Invalid ward configuration: " + "; ".join(problems))
+    return {name: {"cap": int(cap), "gen": gen, "overflow": over, "site": site}
+            for name, cap, gen, over, site in zip(names, caps, frame["Gender"], overflow, sites)}
+
+
+def load_departments(path=None):
+    # Ward table at `path` (see above), or the built-in single-site wards
+    if not path:
+        return {dept: dict(info, site=DEFAULT_SITE) for dept, info in _BUILTIN.items()}
+    lower = path.lower()
+    if lower.endswith(".parquet"):
+        frame = pd.read_parquet(path)
+    elif lower.endswith(".json"):
+        frame = pd.read_json(path, orient="records")
+    else:
+        frame = pd.read_csv(path, dtype={"Site": str, "Department": str, "Gender": str, "Overflow": str})
+    return from_table(frame)
+
+
+def to_table(departments):
+    return pd.DataFrame([{"Site": info.get("site", DEFAULT_SITE), "Department": dept, "Capacity": info["cap"],
+                          "Gender": info["gen"], "Overflow": info.get("overflow", "None")}
+                         for dept, info in departments.items()], columns=TABLE_COLUMNS)
+
+
+def sites(departments):
+    # Site -> its wards, both in configuration order
+    out = {}
+    for dept, info in departments.items():
+        out.setdefault(info.get("site", DEFAULT_SITE), []).append(dept)
+    return out
+
+
+DEPARTMENTS = load_departments(os.environ.get("OCCUPYBED_WARDS"))
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+from .config import DEFAULT_SITE
+
+# ---------------------------------------------------------
+# Compute Core (UI-free page logic)
+# ---------------------------------------------------------
+# Pure functions over typed census frames (schema.py), a departments dict and
+# the store's forecasts / KPIs: the table shaping app.py renders. Free beds,
+# KPIs and daily flow come incrementally from CensusStore (BedIndex,
+# KpiAggregator); bench.py times both at scale.
+
+WARN_PCT = 70
+CRIT_PCT = 85
+
+
+def epoch_seconds(ser):
+    vals = ser.to_numpy(dtype="datetime64[s]")
+    out = vals.astype(np.int64).astype(np.float64)
+    out[np.isnat(vals)] = np.nan
+    return out
+
+
+def active(census):
+    return census[census["Actual_Discharge"].isna()]
+
+
+def statuses(pct):
+    # SAFE below WARN_PCT, WARNING below CRIT_PCT, else CRITICAL
+    pct = np.asarray(pct, dtype=np.float64)
+    return np.select([pct < WARN_PCT, pct < CRIT_PCT], ["SAFE", "WARNING"], "CRITICAL").astype(object)
+
+
+# --- Overview ---
+def occupancy(active_df, departments, expected_free):
+    # One row per department: Site, Capacity, Occupied, Available,
+    # Expected_Free (one column of DischargeForecast.expected_free), Pct, Status
+    names = list(departments)
+    caps = np.array([info['cap'] for info in departments.values()], dtype=np.int64)
+    occ = active_df["Department"].value_counts().reindex(names, fill_value=0).to_numpy()
+    table = pd.DataFrame({
+        "Site": [info.get('site', DEFAULT_SITE) for info in departments.values()],
+        "Capacity": caps, "Occupied": occ, "Available": caps - occ,
+        "Expected_Free": expected_free.reindex(names, fill_value=0).to_numpy(),
+        "Pct": np.divide(occ * 100, caps, out=np.zeros(len(caps)), where=caps > 0),
+    }, index=pd.Index(names, name="Department"))
+    table["Status"] = statuses(table["Pct"])
+    return table
+
+
+def site_summary(table):
+    # occupancy() rolled up to one row per site (one groupby pass), same
+    # columns plus the number of wards per status
+    sums = table.groupby("Site", sort=False)[["Capacity", "Occupied", "Available", "Expected_Free"]].sum()
+    cap = sums["Capacity"].to_numpy()
+    sums["Pct"] = np.divide(sums["Occupied"].to_numpy() * 100, cap, out=np.zeros(len(cap)), where=cap > 0)
+    sums["Status"] = statuses(sums["Pct"])
+    wards = pd.crosstab(table["Site"], table["Status"]).reindex(index=sums.index, columns=["SAFE", "WARNING", "CRITICAL"],
+                                                                 fill_value=0)
+    sums[["Wards_Safe", "Wards_Warning", "Wards_Critical"]] = wards.to_numpy()
+    sums.insert(0, "Wards", sums[["Wards_Safe", "Wards_Warning", "Wards_Critical"]].sum(axis=1))
+    return sums
+
+
+def hospital_summary(table):
+    cap, occ = int(table["Capacity"].sum()), int(table["Occupied"].sum())
+    return {
+        "Capacity": cap, "Occupied": occ, "Available": cap - occ,
+        "Expected_Free": int(table["Expected_Free"].sum()),
+        "Pct": occ / cap * 100 if cap else 0,
+    }
+
+
+def recommendations(table):
+    # (department, level, message) for every row (ward, or site for a
+    # site_summary) at or above WARN_PCT, in table order
+    hot = table["Pct"][table["Pct"] >= WARN_PCT]
+    recs = []
+    for dept, pct in hot.items():
+        if pct >= CRIT_PCT:
+            recs.append((dept, "critical", f"Critical load ({int(pct)}%). Activate surge protocol."))
+        else:
+            recs.append((dept, "high", f"High Load ({int(pct)}%). Prioritize pending discharges."))
+    return recs
+
+
+# --- Operational Analytics ---
+def department_table(dept_kpis):
+    return pd.DataFrame([{
+        "Department": dept,
+        "BOR (%)": round(k['BOR'], 1),
+        "ALOS (Days)": round(k['ALOS'], 1),
+        "BTR (Times)": round(k['BTR'], 2),
+        "BTI (Days)": round(k['BTI'], 1),
+    } for dept, k in dept_kpis.items()])
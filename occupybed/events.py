@@ -0,0 +1,256 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# ---------------------------------------------------------
+# ADT Event Log (append-only, with snapshots)
+# ---------------------------------------------------------
+# Every change to the active census is one JSON line:
+#
+#   {"seq": 41, "ts": 1767873600, "type": "admit", "id": 7, "pin": 1042, ...}
+#
+# Types: admit / discharge (the full stay) / update_exp / move (bed change
+# within a ward) / load (bulk import of discharged history, counts only) /
+# reset / restore. A transfer to another ward is a discharge + admit pair. Sequence numbers are
+# handed out by the store inside its write transaction, so the database
+# always knows the last event it contains (meta 'event_seq').
+#
+# Layout under the events directory:
+#   events-<first seq>.jsonl      - segments of SEGMENT_EVENTS lines
+#   snapshot-<seq>.parquet        - the active census right after event <seq>
+# Lines are flushed on every append and fsynced in batches: after
+# FSYNC_EVENTS lines, or at most FSYNC_SECS after an append (a timer covers
+# quiet periods), and before every snapshot.
+# A snapshot is taken every SNAPSHOT_EVENTS events, so rebuilding the census
+# is one small Parquet read plus a replay of at most that many lines, however
+# long the log. Segments and snapshots are never deleted: together they are
+# the audit trail and allow restoring the census as of any event. The files
+# are written by one process per data directory (the app's shared store).
+
+SEGMENT_EVENTS = 50_000
+SNAPSHOT_EVENTS = 20_000
+FSYNC_EVENTS = 256
+FSYNC_SECS = 1.0
+TAIL_BYTES = 1 << 16
+
+# Stay fields carried by admit / discharge events, in `stays` column order
+FIELDS = ["pin", "gender", "department", "bed", "admit_date", "exp_discharge", "source"]
+
+
+def _seq(line):
+    # Every line starts with {"seq": N, so it can be skipped without parsing
+    return int(line[8:line.index(b",")])
+
+
+def _reversed_lines(path):
+    # Lines of a segment from the end, read TAIL_BYTES at a time
+    with open(path, "rb") as fh:
+        pos = fh.seek(0, os.SEEK_END)
+        rest = b""
+        while pos > 0:
+            step = min(TAIL_BYTES, pos)
+            pos -= step
+            fh.seek(pos)
+            lines = (fh.read(step) + rest).split(b"\n")
+            rest = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    yield line
+        if rest:
+            yield rest
+
+
+def _values(ser):
+    # Plain Python values as stored in `stays` (epoch seconds for dates, None for missing)
+    if pd.api.types.is_datetime64_any_dtype(ser):
+        vals = ser.to_numpy(dtype="datetime64[s]")
+        return [None if nat else v for v, nat in zip(vals.astype(np.int64).tolist(), np.isnat(vals))]
+    return ser.astype(object).where(ser.notna(), None).tolist()
+
+
+def apply(state, event, discharged=None):
+    # Replay one event onto {stay id: [FIELDS...]}; discharge events are
+    # also collected in `discharged`
+    kind, stay_id = event["type"], event.get("id")
+    if kind == "admit":
+        state[stay_id] = [event[f] for f in FIELDS]
+    elif kind == "discharge":
+        state.pop(stay_id, None)
+        if discharged is not None:
+            discharged.append(event)
+    elif kind == "update_exp" and stay_id in state:
+        state[stay_id][5] = event["exp_discharge"]
+    elif kind == "move" and stay_id in state:
+        state[stay_id][3] = event["bed"]
+    elif kind == "reset":
+        state.clear()
+
+
+class EventLog:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._fh = None
+        self._in_segment = 0
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+        self._sync_lock = threading.RLock()     # append / sync vs the sync timer
+        self._timer = None
+        self.last_seq = 0
+        segments = self._segments()
+        if segments:
+            self._in_segment, self.last_seq = self._recover_segment(segments[-1])
+        snaps = self.snapshots()
+        self.snapshot_seq = snaps[-1][0] if snaps else 0
+        atexit.register(self.sync)
+
+    # --- Files ---
+    def _segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, "events-*.jsonl")))
+
+    def snapshots(self):
+        paths = glob.glob(os.path.join(self.directory, "snapshot-*.parquet"))
+        return sorted((int(os.path.basename(p)[9:-8]), p) for p in paths)
+
+    def _recover_segment(self, path):
+        # Drops a torn last line (crash mid-write); returns (lines, last seq)
+        with open(path, "rb+") as fh:
+            size = fh.seek(0, os.SEEK_END)
+            fh.seek(max(0, size - TAIL_BYTES))
+            tail = fh.read()
+            if tail and not tail.endswith(b"\n"):
+                cut = tail.rfind(b"\n") + 1
+                fh.truncate(size - len(tail) + cut)
+                tail = tail[:cut]
+            fh.seek(0)
+            lines = sum(chunk.count(b"\n") for chunk in iter(lambda: fh.read(1 << 20), b""))
+        last = tail.rstrip(b"\n").rsplit(b"\n", 1)[-1]
+        first = int(os.path.basename(path)[7:-6])
+        return lines, _seq(last) if last else first - 1
+
+    def _open_segment(self, first_seq):
+        if self._fh is not None:
+            self.sync()
+            self._fh.close()
+        segments = self._segments()
+        if segments and self._in_segment < SEGMENT_EVENTS:
+            path = segments[-1]
+        else:
+            path = os.path.join(self.directory, f"events-{first_seq:012d}.jsonl")
+            self._in_segment = 0
+        self._fh = open(path, "ab")
+
+    # --- Writes ---
+    def append(self, records):
+        # Records already carry seq and ts (see CensusStore._log)
+        if not records:
+            return
+        with self._sync_lock:
+            if self._fh is None or self._in_segment >= SEGMENT_EVENTS:
+                self._open_segment(records[0]["seq"])
+            self._fh.write(b"".join(json.dumps(r, separators=(",", ": ")).encode() + b"\n" for r in records))
+            self._fh.flush()
+            self._in_segment += len(records)
+            self._unsynced += len(records)
+            self.last_seq = max(self.last_seq, records[-1]["seq"])
+            if self._unsynced >= FSYNC_EVENTS or time.monotonic() - self._synced_at >= FSYNC_SECS:
+                self.sync()
+            elif self._timer is None:
+                self._timer = threading.Timer(FSYNC_SECS, self._timed_sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _timed_sync(self):
+        with self._sync_lock:
+            self._timer = None
+            self.sync()
+
+    def sync(self):
+        with self._sync_lock:
+            if self._fh is not None and self._unsynced:
+                os.fsync(self._fh.fileno())
+            self._unsynced = 0
+            self._synced_at = time.monotonic()
+
+    def due_snapshot(self):
+        return self.last_seq - self.snapshot_seq >= SNAPSHOT_EVENTS
+
+    def snapshot(self, active, seq):
+        # Active census (typed, indexed by stay id) right after event `seq`
+        self.sync()
+        out = os.path.join(self.directory, f"snapshot-{seq:012d}.parquet")
+        pq.write_table(pa.Table.from_pandas(active.reset_index(names="id"), preserve_index=False), out + ".tmp")
+        os.replace(out + ".tmp", out)
+        self.snapshot_seq = max(self.snapshot_seq, seq)
+
+    # --- Reads ---
+    def read(self, after=0, upto=None):
+        # Events with after < seq <= upto, in seq order; whole segments before
+        # `after` are skipped by name and earlier lines by their seq prefix
+        segments = self._segments()
+        firsts = [int(os.path.basename(p)[7:-6]) for p in segments]
+        events = []
+        for i, path in enumerate(segments):
+            if i + 1 < len(segments) and firsts[i + 1] <= after + 1:
+                continue
+            if upto is not None and firsts[i] > upto:
+                break
+            with open(path, "rb") as fh:
+                for line in fh:
+                    seq = _seq(line)
+                    if seq > after and (upto is None or seq <= upto):
+                        events.append(json.loads(line))
+        return sorted(events, key=lambda e: e["seq"])
+
+    def state(self, upto=None, base=None):
+        # Active census as {stay id: [FIELDS...]} after event `upto` (default:
+        # the last), from the latest snapshot at or before `base` (default:
+        # `upto`) plus the events after it. Also returns the replayed
+        # discharge events.
+        upto = self.last_seq if upto is None else upto
+        snaps = [(s, p) for s, p in self.snapshots() if s <= (upto if base is None else min(base, upto))]
+        start, state = 0, {}
+        if snaps:
+            start, path = snaps[-1]
+            frame = pd.read_parquet(path)
+            cols = [_values(frame[c]) for c in ["PIN", "Gender", "Department", "Bed", "Admit_Date", "Exp_Discharge", "Source"]]
+            state = {stay_id: list(row) for stay_id, row in zip(frame["id"].tolist(), zip(*cols))}
+        discharged = []
+        for event in self.read(start, upto):
+            if event["type"] == "restore":
+                state = self.state(event["to"])[0]
+            else:
+                apply(state, event, discharged)
+        return state, discharged
+
+    def recent(self, limit=200, pin=None):
+        # Newest events first (optionally for one PIN) for the audit view;
+        # segments are read backwards from the end, and only as far as needed
+        out = []
+        needle = None if pin is None else f'"pin": {int(pin)}'.encode()
+        for path in reversed(self._segments()):
+            for line in _reversed_lines(path):
+                if needle is not None and needle not in line:
+                    continue
+                event = json.loads(line)
+                if pin is None or event.get("pin") == pin:
+                    out.append(event)
+                    if len(out) >= limit:
+                        break
+            if len(out) >= limit:
+                break
+        frame = pd.DataFrame(out, columns=["seq", "ts", "type", "id", "pin", "department", "bed", "admit_date",
+                                           "exp_discharge", "actual_discharge", "source", "old", "to", "rows"])
+        frame = frame.astype({c: "Int64" for c in ["seq", "id", "pin", "bed", "to", "rows"]})
+        frame["ts"] = pd.to_datetime(frame["ts"], unit="s")
+        for col in ["admit_date", "exp_discharge", "actual_discharge", "old"]:
+            frame[col] = pd.to_datetime(frame[col], unit="s")
+        return frame
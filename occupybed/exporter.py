@@ -0,0 +1,110 @@
+import contextlib
+import glob
+import gzip
+import hashlib
+import os
+import tempfile
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from . import schema
+from .schema import COLUMNS
+
+# ---------------------------------------------------------
+# Streaming Export (CSV / gzip CSV / Parquet)
+# ---------------------------------------------------------
+# Exports are written only when requested, one archive partition (and at most
+# CHUNK_ROWS rows of CSV) at a time, into a file under <data dir>/exports
+# named after the store version and the filters. Asking again before the data
+# changes returns the same file; files of older versions are removed once a
+# newer export has been written.
+#
+# Filters: active_only, start/end (stays overlapping the period, as in
+# CensusStore.history) and a list of departments.
+
+CHUNK_ROWS = 50_000
+
+# format -> (file extension, mime type)
+FORMATS = {
+    "csv": (".csv", "text/csv"),
+    "csv.gz": (".csv.gz", "application/gzip"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+_CAT = pa.dictionary(pa.int32(), pa.string())
+EXPORT_SCHEMA = pa.schema([
+    ("PIN", pa.string()), ("Gender", _CAT), ("Department", _CAT), ("Bed", pa.string()),
+    ("Admit_Date", pa.timestamp("s")), ("Exp_Discharge", pa.timestamp("s")),
+    ("Actual_Discharge", pa.timestamp("s")), ("Source", _CAT),
+])
+
+
+def iter_frames(store, active_only=False, start=None, end=None, departments=None):
+    # Typed frames to export: the active census first, then the archive
+    act = store.active()
+    if end is not None:
+        act = act[act["Admit_Date"] <= end]
+    if departments:
+        act = act[act["Department"].isin(departments)]
+    yield act
+    if active_only:
+        return
+    for part in store.iter_archive(start, end):
+        if departments:
+            part = part[part["Department"].isin(departments)]
+        if not part.empty:
+            yield part
+
+
+def write_csv(frames, out, compress=False):
+    stream = gzip.GzipFile(fileobj=out, mode="wb", mtime=0) if compress else out
+    header = True
+    for frame in frames:
+        for i in range(0, max(len(frame), 1), CHUNK_ROWS):
+            chunk = schema.to_external(frame.iloc[i:i + CHUNK_ROWS])[COLUMNS]
+            stream.write(chunk.to_csv(index=False, header=header).encode("utf-8"))
+            header = False
+    if compress:
+        stream.close()
+
+
+def write_parquet(frames, out):
+    with pq.ParquetWriter(out, EXPORT_SCHEMA) as writer:
+        for frame in frames:
+            ext = schema.to_external(frame)[COLUMNS]
+            writer.write_table(pa.Table.from_pandas(ext, schema=EXPORT_SCHEMA, preserve_index=False))
+
+
+def _version(path):
+    return int(os.path.basename(path).split("-")[1][1:])
+
+
+def export_path(store, fmt, active_only=False, start=None, end=None, departments=None):
+    key = repr((fmt, active_only, str(start), str(end), sorted(departments or [])))
+    digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+    out_dir = os.path.join(os.path.dirname(os.path.abspath(store.path)), "exports")
+    return os.path.join(out_dir, f"census-v{store.version}-{digest}{FORMATS[fmt][0]}")
+
+
+def export(store, fmt="csv", active_only=False, start=None, end=None, departments=None):
+    # Path of the export file, written now unless this version is already on disk
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    path = export_path(store, fmt, active_only, start, end, departments)
+    if os.path.exists(path):
+        return path
+    out_dir = os.path.dirname(path)
+    os.makedirs(out_dir, exist_ok=True)
+    frames = iter_frames(store, active_only, start, end, departments)
+    with tempfile.NamedTemporaryFile(dir=out_dir, suffix=".tmp", delete=False) as out:
+        if fmt == "parquet":
+            write_parquet(frames, out)
+        else:
+            write_csv(frames, out, compress=fmt == "csv.gz")
+    os.replace(out.name, path)
+    for old in glob.glob(os.path.join(out_dir, "census-v*")):
+        if _version(old) < _version(path):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(old)
+    return path
@@ -0,0 +1,269 @@
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from . import metrics
+
+# ---------------------------------------------------------
+# ADT Feed Ingestor (asyncio, micro-batches)
+# ---------------------------------------------------------
+# Admissions arrive as a stream of ADT messages, one JSON object per line:
+#
+#   {"type": "admit", "pin": "PIN-2005", "gender": "Male", "department": "Surgical Male",
+#    "time": "2026-01-08T12:03:00", "exp_discharge": "2026-01-11T12:00:00"}
+#   {"type": "transfer", "pin": "PIN-2005", "department": "ICU", "bed": "ICU-004", "time": ...}
+#   {"type": "discharge", "pin": "PIN-2005", "time": ...}
+#
+# HL7 event codes are accepted for the type (A01 admit, A02 transfer, A03
+# discharge); a missing bed means the first free bed of the ward. Stand-ins
+# for the interface engine: a file that is followed like `tail -f`, and a TCP
+# port taking newline-delimited messages (any number of connections).
+#
+# Sources put parsed messages on a bounded queue; when it is full they wait,
+# which stops reading from the file / socket and lets TCP push back on the
+# sender. One consumer drains the queue into micro-batches (up to BATCH_MAX
+# messages, or whatever arrived within BATCH_WAIT of the first) and applies
+# each batch with CensusStore.apply_adt in a worker thread: one transaction,
+# one event-log append and one version bump per batch instead of per message,
+# which is what keeps throughput in the thousands of messages per second.
+# The app's live pages poll the store version and rerun when it moves.
+
+QUEUE_SIZE = 10_000
+BATCH_MAX = 500
+BATCH_WAIT = 0.05
+POLL_SECS = 0.2
+REJECTED_KEEP = 200
+TYPES = {"admit": "admit", "A01": "admit", "transfer": "transfer", "A02": "transfer",
+         "discharge": "discharge", "A03": "discharge"}
+
+log = logging.getLogger(__name__)
+
+
+def parse(line):
+    # One feed line -> message dict with a normalized type, None if unreadable
+    try:
+        msg = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(msg, dict):
+        return None
+    if isinstance(msg.get("type"), str):
+        msg["type"] = TYPES.get(msg["type"], msg["type"])
+    return msg
+
+
+class Ingestor:
+    def __init__(self, store, batch_max=BATCH_MAX, batch_wait=BATCH_WAIT, queue_size=QUEUE_SIZE):
+        self.store = store
+        self.batch_max = batch_max
+        self.batch_wait = batch_wait
+        self.queue = asyncio.Queue(queue_size)
+        self.sources = []
+        self.received = self.applied = self.batches = self.unreadable = 0
+        self.rejected = collections.deque(maxlen=REJECTED_KEEP)
+        self.n_rejected = 0
+        self.busy = 0.0     # seconds spent applying batches
+        self.last_batch = None
+
+    # --- Sources ---
+    async def put_line(self, line):
+        msg = parse(line)
+        if msg is None:
+            self.unreadable += 1
+            return
+        self.received += 1
+        await self.queue.put(msg)
+
+    async def follow(self, path, from_start=True):
+        # Reads new lines as they are appended; waits for the file to appear
+        self.sources.append(f"file {path}")
+        while True:
+            try:
+                fh = open(path, "rb")
+                break
+            except FileNotFoundError:
+                await asyncio.sleep(POLL_SECS)
+        with fh:
+            if not from_start:
+                fh.seek(0, 2)
+            partial = b""
+            while True:
+                chunk = fh.read(1 << 16)
+                if not chunk:
+                    await asyncio.sleep(POLL_SECS)
+                    continue
+                lines = (partial + chunk).split(b"\n")
+                partial = lines.pop()
+                for line in lines:
+                    if line.strip():
+                        await self.put_line(line)
+
+    async def _client(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    await self.put_line(line)
+        finally:
+            writer.close()
+
+    async def listen(self, host, port):
+        # Accepting connections as soon as this returns; close the returned server to stop
+        server = await asyncio.start_server(self._client, host, port)
+        self.sources.append(f"tcp {host}:{port}")
+        return server
+
+    # --- Consumer ---
+    async def _next_batch(self):
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.batch_wait
+        while len(batch) < self.batch_max:
+            if self.queue.empty():
+                left = deadline - asyncio.get_running_loop().time()
+                if left <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), left))
+                except asyncio.TimeoutError:
+                    break
+            else:
+                batch.append(self.queue.get_nowait())
+        return batch
+
+    async def run(self):
+        while True:
+            batch = await self._next_batch()
+            t = time.perf_counter()
+            try:
+                applied, rejected = await asyncio.to_thread(self.store.apply_adt, batch)
+            except Exception as exc:
+                # Nothing of the batch was committed; keep consuming
+                log.exception("ADT batch of %d messages failed", len(batch))
+                applied, rejected = 0, [(msg, f"Batch failed: {exc}") for msg in batch]
+            self.applied += applied
+            self.n_rejected += len(rejected)
+            self.rejected.extend(rejected)
+            self.batches += 1
+            self.busy += time.perf_counter() - t
+            metrics.observe("feed.batch", time.perf_counter() - t)
+            self.last_batch = time.time()
+            for _ in batch:
+                self.queue.task_done()
+
+    def stats(self):
+        # per_sec: messages handled per second of apply time (capacity, not arrival rate)
+        return {"sources": ", ".join(self.sources), "received": self.received, "applied": self.applied,
+                "rejected": self.n_rejected, "unreadable": self.unreadable, "queued": self.queue.qsize(),
+                "batches": self.batches, "per_sec": (self.applied + self.n_rejected) / max(self.busy, 1e-9),
+                "last_batch": None if self.last_batch is None else pd.Timestamp(self.last_batch, unit="s")}
+
+
+def start(store, path=None, port=None, host="127.0.0.1"):
+    # Runs an Ingestor for a file and/or TCP port on its own event loop in a
+    # daemon thread (the Streamlit server owns the main thread). Returns once
+    # the port is listening; a port that can't be bound raises here.
+    ready = threading.Event()
+    holder = {}
+
+    def main():
+        async def go():
+            ingestor = Ingestor(store)
+            try:
+                servers = [await ingestor.listen(host, port)] if port else []
+            except OSError as exc:
+                holder["error"] = exc
+                ready.set()
+                return
+            holder["ingestor"] = ingestor
+            ready.set()
+            tasks = [ingestor.run()] + ([ingestor.follow(path)] if path else [])
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for server in servers:
+                    server.close()
+        asyncio.run(go())
+
+    threading.Thread(target=main, name="adt-feed", daemon=True).start()
+    ready.wait()
+    if "error" in holder:
+        raise holder["error"]
+    return holder["ingestor"]
+
+
+# ---------------------------------------------------------
+# Demo feed
+# ---------------------------------------------------------
+def demo_messages(departments, n, start_time, seed=0, first_pin=500_000):
+    # A plausible stream: admits of new patients, then transfers and
+    # discharges of patients the stream itself admitted
+    rng = np.random.default_rng(seed)
+    wards = {g: [d for d, info in departments.items() if info['gen'] in ("Mixed", g)] for g in ("Male", "Female")}
+    t = pd.Timestamp(start_time)
+    inside, out, next_pin = {}, [], first_pin
+    for _ in range(n):
+        t += pd.Timedelta(seconds=int(rng.integers(1, 60)))
+        r = rng.random()
+        if not inside or r < 0.4:
+            gender = "Male" if rng.random() < 0.5 else "Female"
+            dept = wards[gender][rng.integers(len(wards[gender]))]
+            pin, next_pin = next_pin, next_pin + 1
+            inside[pin] = gender
+            out.append({"type": "admit", "pin": f"PIN-{pin}", "gender": gender, "department": dept,
+                        "time": t.isoformat(), "exp_discharge": (t + pd.Timedelta(days=int(rng.integers(1, 8)))).isoformat(),
+                        "source": "Emergency" if rng.random() < 0.6 else "Elective"})
+        else:
+            pin = list(inside)[rng.integers(len(inside))]
+            if r < 0.6:
+                choices = wards[inside[pin]]
+                out.append({"type": "transfer", "pin": f"PIN-{pin}", "department": choices[rng.integers(len(choices))],
+                            "time": t.isoformat()})
+            else:
+                del inside[pin]
+                out.append({"type": "discharge", "pin": f"PIN-{pin}", "time": t.isoformat()})
+    return out
+
+
+async def _send(host, port, lines, rate):
+    _, writer = await asyncio.open_connection(host, port)
+    t0 = time.monotonic()
+    for i, line in enumerate(lines):
+        writer.write(line)
+        if rate and i % 100 == 99:
+            await writer.drain()
+            await asyncio.sleep(max(0.0, t0 + (i + 1) / rate - time.monotonic()))
+    await writer.drain()
+    writer.close()
+    await writer.wait_closed()
+
+
+def main():
+    from .config import DEPARTMENTS
+
+    parser = argparse.ArgumentParser(description="Write or send a demo ADT feed")
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument("--start", default=None, help="time of the first message (default: now)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--file", help="append the messages to this file")
+    parser.add_argument("--send", metavar="HOST:PORT", help="send the messages to a feed port")
+    parser.add_argument("--rate", type=float, default=0, help="messages per second when sending (0 = as fast as possible)")
+    args = parser.parse_args()
+
+    msgs = demo_messages(DEPARTMENTS, args.count, args.start or pd.Timestamp.now().floor("s"), args.seed)
+    lines = [json.dumps(m).encode() + b"\n" for m in msgs]
+    if args.file:
+        with open(args.file, "ab") as fh:
+            fh.writelines(lines)
+    if args.send:
+        host, port = args.send.rsplit(":", 1)
+        asyncio.run(_send(host or "127.0.0.1", int(port), lines, args.rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------
+# Discharge Forecast (expected free beds over time)
+# ---------------------------------------------------------
+# Exp_Discharge of every active stay, kept as one sorted int64 array of
+# department code << 32 | epoch seconds, so each department is a contiguous
+# sorted run. "Beds expected free within h hours" for every department and
+# every horizon is then a single searchsorted over a (departments x horizons)
+# matrix of keys. Overdue stays (Exp_Discharge already past) count as
+# expected free, stays without an Exp_Discharge never do.
+
+HOUR = 3600
+WINDOWS = [6, 12, 24, 48, 72]
+_SHIFT = 32
+
+
+def _epochs(ser):
+    vals = ser.to_numpy(dtype="datetime64[s]")
+    return vals.astype(np.int64), ~np.isnat(vals)
+
+
+class DischargeForecast:
+    def __init__(self, departments):
+        self.departments = departments
+        self._codes = {dept: i for i, dept in enumerate(departments)}
+        self._keys = np.empty(0, dtype=np.int64)
+
+    @classmethod
+    def from_active(cls, active, departments):
+        fc = cls(departments)
+        fc.load(active)
+        return fc
+
+    def _code(self, dept):
+        if dept not in self._codes:
+            self._codes[dept] = len(self._codes)
+        return self._codes[dept]
+
+    def _key(self, dept, exp):
+        return (self._code(dept) << _SHIFT) | int(exp)
+
+    # --- Updates ---
+    def load(self, active):
+        self._keys = np.empty(0, dtype=np.int64)
+        self.add(active["Department"], active["Exp_Discharge"])
+
+    def add(self, depts, exps):
+        # Bulk insert: department labels and Exp_Discharge values (NaT skipped)
+        secs, ok = _epochs(pd.Series(exps))
+        codes = np.array([self._code(d) for d in depts], dtype=np.int64)
+        keys = (codes[ok] << _SHIFT) | secs[ok]
+        self._keys = np.sort(np.concatenate([self._keys, keys]), kind="stable")
+
+    def admit(self, dept, exp):
+        if exp is None:
+            return
+        key = self._key(dept, exp)
+        self._keys = np.insert(self._keys, np.searchsorted(self._keys, key), key)
+
+    def discharge(self, dept, exp):
+        if exp is None:
+            return
+        key = self._key(dept, exp)
+        i = np.searchsorted(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            self._keys = np.delete(self._keys, i)
+
+    def update(self, dept, old, new):
+        self.discharge(dept, old)
+        self.admit(dept, new)
+
+    # --- Queries ---
+    def expected_free(self, now, hours=WINDOWS):
+        # Department x horizon (hours) counts of stays expected out by now + h
+        names = list(self.departments)
+        codes = np.array([self._codes[d] for d in names], dtype=np.int64)[:, None] << _SHIFT
+        limits = int(pd.Timestamp(now).value // 10**9) + np.asarray(hours, dtype=np.int64) * HOUR
+        counts = (np.searchsorted(self._keys, codes | limits[None, :], side="right")
+                  - np.searchsorted(self._keys, codes, side="left"))
+        return pd.DataFrame(counts, index=pd.Index(names, name="Department"), columns=list(hours))
+
+    def curve(self, now, horizon=72, step=1):
+        # Cumulative beds expected free per department (+ Hospital), indexed by time
+        hours = np.arange(0, horizon + step, step)
+        free = self.expected_free(now, hours).T
+        free.index = pd.Index(pd.Timestamp(now) + pd.to_timedelta(hours, unit="h"), name="Time")
+        free["Hospital"] = free.sum(axis=1)
+        return free
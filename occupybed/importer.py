@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from . import schema
+from .schema import COLUMNS
+
+# ---------------------------------------------------------
+# Streaming Import (CSV / gzip CSV / Parquet)
+# ---------------------------------------------------------
+# Files are read CHUNK_ROWS at a time and each chunk is validated and stored
+# before the next one is read, so peak memory is one chunk plus at most
+# MAX_REPORTED rejected rows kept for the report.
+#   append  - add every valid row
+#   merge   - rows matching an active stay (same PIN and Admit_Date) update
+#             it (discharge / new Exp_Discharge; one transaction per chunk,
+#             rows that change nothing are not counted); rows already
+#             archived are skipped; everything else is added
+#   replace - the file is validated end to end first, then the census is
+#             wiped and loaded, so an unreadable file never clears the data
+
+CHUNK_ROWS = 50_000
+MAX_REPORTED = 1000
+MODES = ["append", "merge", "replace"]
+
+
+def iter_chunks(fileobj, name, chunk_rows=CHUNK_ROWS):
+    name = name.lower()
+    if name.endswith(".parquet"):
+        for batch in pq.ParquetFile(fileobj).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        compression = "gzip" if name.endswith(".gz") else None
+        yield from pd.read_csv(fileobj, chunksize=chunk_rows, dtype=str, compression=compression)
+
+
+def _epochs(ser):
+    return ser.to_numpy(dtype="datetime64[s]").astype(np.int64)
+
+
+def _census_conflicts(store, typed, merge):
+    # Row-level checks against the live census for rows that would become active.
+    # Returns (rows to append, update rows indexed by stay id, rejected rows).
+    active = store.active()
+    by_key = dict(zip(zip(active["PIN"].tolist(), _epochs(active["Admit_Date"]).tolist()), active.index))
+    active_pins = set(active["PIN"].tolist())
+    keys = list(zip(typed["PIN"].tolist(), _epochs(typed["Admit_Date"]).tolist()))
+    updates, error = {}, np.full(len(typed), "", dtype=object)
+    matched = np.zeros(len(typed), dtype=bool)
+    seen_beds, seen_pins = set(), set()
+    for i, (key, dept, slot, dis) in enumerate(zip(keys, typed["Department"], typed["Bed"], typed["Actual_Discharge"])):
+        if merge and key in by_key:
+            updates[by_key[key]] = i
+            matched[i] = True
+            continue
+        if not pd.isna(dis):
+            continue
+        if key[0] in active_pins or key[0] in seen_pins:
+            error[i] = "Patient already admitted"
+        elif store.bed_occupant(dept, int(slot)) is not None or (dept, slot) in seen_beds:
+            error[i] = "Bed already occupied"
+        seen_pins.add(key[0])
+        seen_beds.add((dept, slot))
+    bad = error != ""
+    add = typed[~matched & ~bad]
+    if merge and not add.empty:
+        # Discharged rows are partitioned by discharge month, so only those months are read
+        dis = add[add["Actual_Discharge"].notna()]
+        if not dis.empty:
+            archived = store.archive_keys(set(dis["Actual_Discharge"].dt.strftime("%Y-%m")))
+            dup = [k in archived for k in zip(dis["PIN"].tolist(), _epochs(dis["Admit_Date"]).tolist())]
+            add = add.drop(index=dis.index[dup])
+    rejected = schema.to_external(typed[bad]).assign(Error=error[bad])
+    return add, typed.iloc[list(updates.values())].set_axis(list(updates)), rejected
+
+
+def _apply_updates(store, updates):
+    # One store.bulk_update for the chunk; returns the number of stays changed
+    active = store.active()
+    updates = updates[updates.index.isin(active.index)]
+    out = updates["Actual_Discharge"].dropna()
+    exp = updates.loc[updates["Actual_Discharge"].isna(), "Exp_Discharge"].dropna()
+    exp = exp[exp.ne(active.loc[exp.index, "Exp_Discharge"])]
+    if out.empty and exp.empty:
+        return 0
+    n_dis, n_up = store.bulk_update(out.to_dict(), exp.to_dict())
+    return n_dis + n_up
+
+
+def import_file(store, fileobj, name, mode="append", chunk_rows=CHUNK_ROWS, progress=None):
+    if mode not in MODES:
+        raise ValueError(f"Unknown import mode: {mode}")
+    if mode == "replace":
+        for chunk in iter_chunks(fileobj, name, chunk_rows):
+            schema.validate(chunk, store.departments)
+        fileobj.seek(0)
+        store.reset()
+    report = {"mode": mode, "rows": 0, "loaded": 0, "updated": 0, "rejected": 0}
+    errors, kept = [], 0
+    for chunk in iter_chunks(fileobj, name, chunk_rows):
+        typed, rejected = schema.validate(chunk, store.departments)
+        add, updates, conflicts = _census_conflicts(store, typed, merge=mode == "merge")
+        store.append_typed(add)
+        report["updated"] += _apply_updates(store, updates)
+        report["rows"] += len(chunk)
+        report["loaded"] += len(add)
+        for bad in (rejected, conflicts):
+            report["rejected"] += len(bad)
+            if kept < MAX_REPORTED and not bad.empty:
+                errors.append(bad[COLUMNS + ["Error"]].head(MAX_REPORTED - kept).astype("string"))
+                kept += len(errors[-1])
+        if progress:
+            progress(report["rows"])
+    report["errors"] = pd.concat(errors) if errors else pd.DataFrame(columns=COLUMNS + ["Error"])
+    return report
@@ -0,0 +1,139 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from .config import DEFAULT_SITE
+
+# ---------------------------------------------------------
+# Incremental KPI Engine (BOR / ALOS / BTR / BTI)
+# ---------------------------------------------------------
+# Running sums per department, kept in epoch seconds:
+#   active, active_admit  -> active count and sum of their admit times
+#   dis, los              -> discharge count and sum of (discharge - admit)
+#   moved_los             -> sum of (transfer - admit) of ward stays closed by
+#                            a transfer to another ward
+# plus admissions / discharges per (department, day). A transfer out is not a
+# discharge: it only adds to patient-days (BOR / BTI), never to discharges,
+# ALOS or BTR. Patient-days at `now` are los + moved_los + active * now -
+# active_admit, so every KPI is O(departments) to render no matter how much
+# history sits behind it. Exp_Discharge edits do not feed any of these KPIs.
+
+DAY = 86400
+
+
+def _new():
+    return {"active": 0, "active_admit": 0, "dis": 0, "los": 0, "moved_los": 0}
+
+
+class KpiAggregator:
+    def __init__(self, departments):
+        self.departments = departments
+        self.sums = {dept: _new() for dept in departments}
+        self.daily_adm = Counter()
+        self.daily_dis = Counter()
+        self.first_admit = None
+
+    def _dept(self, dept):
+        if dept not in self.sums:
+            self.sums[dept] = _new()
+        return self.sums[dept]
+
+    def _seen(self, admit):
+        if self.first_admit is None or admit < self.first_admit:
+            self.first_admit = admit
+
+    # --- Updates ---
+    def add(self, depts, admits, discharges, transferred=None):
+        # Bulk load: admits int epoch seconds, discharges float (NaN = active),
+        # transferred marks stays closed by a transfer rather than a discharge
+        f = pd.DataFrame({"d": depts, "a": np.asarray(admits, dtype=np.int64),
+                          "x": np.asarray(discharges, dtype=np.float64)})
+        if f.empty:
+            return
+        self._seen(int(f["a"].min()))
+        moved = np.zeros(len(f), dtype=bool) if transferred is None else np.asarray(transferred, dtype=bool)
+        act, dis, out = f[f["x"].isna()], f[f["x"].notna() & ~moved], f[f["x"].notna() & moved]
+        for dept, n, s in act.groupby("d")["a"].agg(["size", "sum"]).itertuples():
+            d = self._dept(dept)
+            d["active"] += int(n)
+            d["active_admit"] += int(s)
+        los = (dis["x"].astype(np.int64) - dis["a"]).groupby(dis["d"]).agg(["size", "sum"])
+        for dept, n, s in los.itertuples():
+            d = self._dept(dept)
+            d["dis"] += int(n)
+            d["los"] += int(s)
+        for dept, s in (out["x"].astype(np.int64) - out["a"]).groupby(out["d"]).sum().items():
+            self._dept(dept)["moved_los"] += int(s)
+        self.daily_adm.update(f.groupby([f["d"], f["a"] // DAY]).size().to_dict())
+        self.daily_dis.update(dis.groupby([dis["d"], dis["x"].astype(np.int64) // DAY]).size().to_dict())
+
+    def admit(self, dept, admit):
+        d = self._dept(dept)
+        d["active"] += 1
+        d["active_admit"] += admit
+        self.daily_adm[(dept, admit // DAY)] += 1
+        self._seen(admit)
+
+    def discharge(self, dept, admit, when, transfer=False):
+        # transfer: the ward stay was closed by a transfer to another ward
+        d = self._dept(dept)
+        d["active"] -= 1
+        d["active_admit"] -= admit
+        if transfer:
+            d["moved_los"] += when - admit
+            return
+        d["dis"] += 1
+        d["los"] += when - admit
+        self.daily_dis[(dept, when // DAY)] += 1
+
+    # --- KPIs ---
+    def days_range(self, now):
+        if self.first_admit is None:
+            return 1
+        return max((int(pd.Timestamp(now).value // 10**9) - self.first_admit) // DAY, 1)
+
+    def _kpis(self, d, cap, now_s, days):
+        pat_days = (d["los"] + d["moved_los"] + d["active"] * now_s - d["active_admit"]) / DAY
+        return {
+            "BOR": d["active"] / cap * 100 if cap else 0,
+            "ALOS": d["los"] / d["dis"] / DAY if d["dis"] else 0,
+            "BTR": d["dis"] / cap if cap else 0,
+            "BTI": (cap * days - pat_days) / d["dis"] if d["dis"] else 0,
+        }
+
+    def hospital(self, now):
+        total = _new()
+        for d in self.sums.values():
+            for k in total:
+                total[k] += d[k]
+        cap = sum(info['cap'] for info in self.departments.values())
+        return self._kpis(total, cap, int(pd.Timestamp(now).value // 10**9), self.days_range(now))
+
+    def by_department(self, now):
+        now_s, days = int(pd.Timestamp(now).value // 10**9), self.days_range(now)
+        return {dept: self._kpis(self._dept(dept), info['cap'], now_s, days)
+                for dept, info in self.departments.items()}
+
+    def by_site(self, now):
+        # Department sums and capacities added up per site (config.py)
+        now_s, days = int(pd.Timestamp(now).value // 10**9), self.days_range(now)
+        totals, caps = {}, {}
+        for dept, info in self.departments.items():
+            site = info.get('site', DEFAULT_SITE)
+            total = totals.setdefault(site, _new())
+            for k, v in self._dept(dept).items():
+                total[k] += v
+            caps[site] = caps.get(site, 0) + info['cap']
+        return {site: self._kpis(total, caps[site], now_s, days) for site, total in totals.items()}
+
+    def daily(self, start, end):
+        # Hospital-level admissions/discharges for days in [start, end] with any activity
+        first, last = pd.Timestamp(start).value // 10**9 // DAY, pd.Timestamp(end).value // 10**9 // DAY
+        rows = []
+        for day in range(first, last + 1):
+            adm = sum(self.daily_adm.get((dept, day), 0) for dept in self.sums)
+            dis = sum(self.daily_dis.get((dept, day), 0) for dept in self.sums)
+            if adm or dis:
+                rows.append({"Date": pd.Timestamp(day * DAY, unit="s").date(), "Admissions": adm, "Discharges": dis})
+        return pd.DataFrame(rows, columns=["Date", "Admissions", "Discharges"])
@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------
+# Length-of-Stay Model (probabilistic discharge forecast)
+# ---------------------------------------------------------
+# Hourly LOS histograms (Actual_Discharge - Admit_Date, as for ALOS) per
+# (department, source), updated on every discharge. A group with little
+# history is shrunk towards its department's distribution, and a department
+# towards the hospital's (PRIOR_WEIGHT pseudo-stays each). For an active
+# patient who has been in for e hours,
+#
+#   P(out within h hours) = 1 - S(e + h) / S(e),   S(t) = P(LOS >= t)
+#
+# Beyond MAX_LOS_DAYS (or past the longest stay ever seen) a constant hazard
+# of 1 / mean LOS takes over. Bed counts sum these probabilities: the expected
+# value is sum(p), the spread the Poisson-binomial variance sum(p (1 - p)),
+# and the interval a normal approximation clipped to [0, patients].
+#
+# The fitted survival table is cached and only rebuilt after new discharges,
+# so scoring the active census is a few array lookups.
+
+HOUR = 3600
+MAX_LOS_DAYS = 60
+BINS = MAX_LOS_DAYS * 24
+PRIOR_WEIGHT = 20
+Z_90 = 1.645
+
+
+class LosModel:
+    def __init__(self, departments):
+        self.departments = departments
+        self._counts = {}
+        self._los_sum = {}
+        self._fit = None
+
+    # --- Training ---
+    def add(self, depts, sources, los_secs):
+        # Bulk training on discharged stays (LOS in seconds)
+        frame = pd.DataFrame({"d": np.asarray(depts, dtype=object), "s": np.asarray(sources, dtype=object),
+                              "b": np.clip(np.asarray(los_secs, dtype=np.int64) // HOUR, 0, BINS),
+                              "x": np.asarray(los_secs, dtype=np.int64)})
+        # One bincount over (group, bin) for every (department, source) group at once
+        grouped = frame.groupby(["d", "s"], dropna=False)
+        codes = grouped.ngroup().to_numpy()
+        los_sums = grouped["x"].sum()
+        hist = np.bincount(codes * (BINS + 1) + frame["b"].to_numpy(),
+                           minlength=len(los_sums) * (BINS + 1)).reshape(len(los_sums), BINS + 1)
+        for (dept, source), row, los_sum in zip(los_sums.index, hist, los_sums.tolist()):
+            key = (dept, None if pd.isna(source) else source)
+            counts = self._counts.setdefault(key, np.zeros(BINS + 1, dtype=np.int64))
+            counts += row
+            self._los_sum[key] = self._los_sum.get(key, 0) + int(los_sum)
+        if len(frame):
+            self._fit = None
+
+    def discharge(self, dept, source, los_secs):
+        key = (dept, source)
+        counts = self._counts.setdefault(key, np.zeros(BINS + 1, dtype=np.int64))
+        counts[min(max(los_secs // HOUR, 0), BINS)] += 1
+        self._los_sum[key] = self._los_sum.get(key, 0) + los_secs
+        self._fit = None
+
+    def _fitted(self):
+        # Survival table with one row per (department, source), per department
+        # (source None) and for the hospital (key None), plus mean LOS in hours
+        if self._fit is not None:
+            return self._fit
+        rows, keys, means = [], {}, []
+        empty = np.zeros(BINS + 1, dtype=np.int64)
+
+        def add_row(key, counts, los_sum, prior, fallback_mean):
+            pmf = counts + PRIOR_WEIGHT * prior if prior is not None else counts.astype(np.float64)
+            pmf = pmf / pmf.sum() if pmf.sum() else np.full(BINS + 1, 1 / (BINS + 1))
+            keys[key] = len(rows)
+            rows.append(np.concatenate([[1.0], 1 - np.cumsum(pmf)[:-1]]).clip(0, 1))
+            means.append(los_sum / counts.sum() / HOUR if counts.sum() else fallback_mean)
+            return pmf
+
+        hosp = add_row(None, sum(self._counts.values(), empty), sum(self._los_sum.values()), None, 24 * 4)
+        by_dept = {}
+        for key in self._counts:
+            by_dept.setdefault(key[0], []).append(key)
+        for dept in list(self.departments) + sorted(set(by_dept) - set(self.departments)):
+            groups = by_dept.get(dept, [])
+            pmf = add_row((dept, None), sum((self._counts[k] for k in groups), empty),
+                          sum(self._los_sum[k] for k in groups), hosp, means[0])
+            for key in groups:
+                if key[1] is not None:
+                    add_row(key, self._counts[key], self._los_sum[key], pmf, means[keys[(dept, None)]])
+        self._fit = (np.vstack(rows), keys, np.asarray(means))
+        return self._fit
+
+    @property
+    def n_stays(self):
+        return int(sum(c.sum() for c in self._counts.values()))
+
+    def rows(self, depts, sources):
+        # Survival-table row per stay: (department, source), else department, else hospital
+        keys = self._fitted()[1]
+        sources = pd.Series(sources, dtype=object)
+        sources = sources.where(sources.notna(), None)
+        return np.array([keys.get((d, s), keys.get((d, None), 0)) for d, s in zip(depts, sources)], dtype=np.int64)
+
+    def cdf_table(self):
+        # P(LOS <= b hours) per row and hourly bin (last bin: beyond MAX_LOS_DAYS)
+        surv = self._fitted()[0]
+        return 1 - np.concatenate([surv[:, 1:], np.zeros((len(surv), 1))], axis=1)
+
+    # --- Scoring ---
+    def probabilities(self, active, now, hours):
+        # Per active stay (index) x horizon: P(discharged within h hours of now)
+        surv, keys, means = self._fitted()
+        rows = self.rows(active["Department"], active["Source"].to_numpy())
+        now_s = int(pd.Timestamp(now).value // 10**9)
+        elapsed = np.maximum(now_s - active["Admit_Date"].to_numpy(dtype="datetime64[s]").astype(np.int64), 0) / HOUR
+        hours = np.asarray(hours, dtype=np.float64)
+        e_bin = np.minimum(elapsed.astype(np.int64), BINS)
+        h_bin = np.minimum((elapsed[:, None] + hours[None, :]).astype(np.int64), BINS)
+        s_e = surv[rows, e_bin][:, None]
+        s_h = surv[rows[:, None], h_bin]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            p = 1 - s_h / s_e
+        hazard = 1 - np.exp(-hours[None, :] / means[rows][:, None])
+        tail = (e_bin[:, None] >= BINS) | (s_e <= 1e-9) | (h_bin >= BINS)
+        p = np.where(tail, np.maximum(np.nan_to_num(p), hazard), p)
+        return pd.DataFrame(p.clip(0, 1), index=active.index, columns=[int(h) for h in hours])
+
+    def bed_forecast(self, active, now, hours, z=Z_90, total="Hospital"):
+        # Expected free beds with a (default 90%) interval per department and
+        # horizon, plus a `total` row over every stay in `active`; the
+        # per-department sums are one grouped pass, whatever the ward count
+        probs = self.probabilities(active, now, hours)
+        p = probs.to_numpy()
+        names = list(self.departments)
+        codes = pd.Categorical(active["Department"].astype(object), categories=names).codes
+        n_h = p.shape[1]
+        sums = pd.DataFrame(np.hstack([p, p * (1 - p), np.ones((len(p), 1))])).groupby(codes).sum()
+        sums = sums.reindex(range(len(names)), fill_value=0).to_numpy()
+        sums = np.vstack([sums, np.concatenate([p.sum(axis=0), (p * (1 - p)).sum(axis=0), [len(p)]])])
+        mean, sd, count = sums[:, :n_h], np.sqrt(sums[:, n_h:2 * n_h]), sums[:, -1:]
+        return pd.DataFrame({
+            "Department": np.repeat(names + [total], n_h), "Hours": np.tile(probs.columns, len(names) + 1),
+            "Expected": mean.ravel(),
+            "Low": np.clip(np.floor(mean - z * sd), 0, count).astype(int).ravel(),
+            "High": np.clip(np.ceil(mean + z * sd), 0, count).astype(int).ravel(),
+        })
@@ -0,0 +1,64 @@
+import collections
+import functools
+import threading
+
+# ---------------------------------------------------------
+# Version-keyed Memoization (bounded LRU)
+# ---------------------------------------------------------
+# Page computations (derived frames, aggregates, built figures) are cached
+# under (name, store version, args). Every write bumps the store version, so
+# an entry can never be served for data it wasn't built from; entries of
+# older versions are dropped as soon as a newer version is seen, and at most
+# max_entries are kept overall (least recently used go first). One cache is
+# shared by every session of the server, so values must be treated as
+# read-only. Computations run outside the lock: a slow miss doesn't block
+# hits, and two sessions missing at once may both compute (same result).
+
+MAX_ENTRIES = 256
+
+
+class VersionCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _advance(self, version):
+        # Called under the lock; forgets everything older than `version`
+        if self._version is None or version > self._version:
+            self._version = version
+            for key in [k for k in self._entries if k[1] < version]:
+                del self._entries[key]
+
+    def get(self, name, version, fn, *args):
+        key = (name, version, args)
+        with self._lock:
+            self._advance(version)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        value = fn(*args)
+        with self._lock:
+            if version >= self._version:
+                self._entries[key] = value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def cached(self, fn):
+        # fn(*args) becomes wrapper(version, *args); args must be hashable
+        @functools.wraps(fn)
+        def wrapper(version, *args):
+            return self.get(fn.__qualname__, version, fn, *args)
+        return wrapper
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "version": self._version, "hits": self.hits, "misses": self.misses}
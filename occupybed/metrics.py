@@ -0,0 +1,152 @@
+import collections
+import contextlib
+import functools
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# ---------------------------------------------------------
+# Hot-path Instrumentation (spans, gauges, Prometheus text)
+# ---------------------------------------------------------
+# Spans time a named block (a page run, a computation, an export) and keep
+# count and total plus the last SAMPLES durations, from which p50 / p95 are
+# read; gauges hold the latest value (census size, memory). One registry per
+# process, shared by every session and thread. It is rendered in the
+# Prometheus text format (spans as summaries), and can be served over HTTP
+# (serve) or written to a file for a node-exporter textfile collector
+# (write_file). Recording is a lock plus a deque append, so spans can sit on
+# hot paths.
+
+SAMPLES = 1000
+PREFIX = "occupybed"
+QUANTILES = (0.5, 0.95)
+
+
+class Registry:
+    def __init__(self, samples=SAMPLES):
+        self._lock = threading.Lock()
+        self._samples = samples
+        self._spans = {}    # name -> [count, total seconds, deque of recent durations]
+        self._gauges = {}
+        self.started = time.time()
+
+    def observe(self, name, secs):
+        with self._lock:
+            span = self._spans.get(name)
+            if span is None:
+                span = self._spans[name] = [0, 0.0, collections.deque(maxlen=self._samples)]
+            span[0] += 1
+            span[1] += secs
+            span[2].append(secs)
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        # Decorator form of span()
+        def wrap(fn):
+            @functools.wraps(fn)
+            def inner(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return inner
+        return wrap
+
+    def gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = float(value)
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._gauges.clear()
+
+    # --- Reading ---
+    def spans(self):
+        # One row per span: count, total, mean and recent p50 / p95 / max, in seconds
+        with self._lock:
+            items = [(name, count, total, np.array(recent)) for name, (count, total, recent) in self._spans.items()]
+        rows = []
+        for name, count, total, recent in sorted(items):
+            p50, p95 = np.quantile(recent, QUANTILES) if len(recent) else (np.nan, np.nan)
+            rows.append({"span": name, "count": count, "total": total, "mean": total / count,
+                         "p50": float(p50), "p95": float(p95), "max": float(recent.max()) if len(recent) else np.nan})
+        return rows
+
+    def gauges(self):
+        with self._lock:
+            return dict(sorted(self._gauges.items()))
+
+    def render(self):
+        # Prometheus text exposition format
+        lines = [f"# HELP {PREFIX}_span_seconds Wall time of instrumented blocks (quantiles over the last {self._samples})",
+                 f"# TYPE {PREFIX}_span_seconds summary"]
+        for row in self.spans():
+            label = _label(row["span"])
+            for q, key in zip(QUANTILES, ["p50", "p95"]):
+                lines.append(f'{PREFIX}_span_seconds{{span="{label}",quantile="{q}"}} {row[key]:.6f}')
+            lines.append(f'{PREFIX}_span_seconds_sum{{span="{label}"}} {row["total"]:.6f}')
+            lines.append(f'{PREFIX}_span_seconds_count{{span="{label}"}} {row["count"]}')
+        for name, value in self.gauges().items():
+            metric = f"{PREFIX}_{name}"
+            lines += [f"# TYPE {metric} gauge", f"{metric} {value:.15g}"]
+        lines += [f"# TYPE {PREFIX}_start_time_seconds gauge", f"{PREFIX}_start_time_seconds {self.started:.0f}"]
+        return "\n".join(lines) + "\n"
+
+    # --- Export ---
+    def write_file(self, path):
+        # Atomic, so a collector never reads half a file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as fh:
+            fh.write(self.render())
+        os.replace(tmp, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        # GET /metrics from a daemon thread; returns the server (shutdown() to stop).
+        # Loopback only unless a wider host (e.g. "0.0.0.0") is passed
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def rss_bytes():
+    # Current resident memory of this process (peak RSS where /proc is missing)
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+REGISTRY = Registry()
+span, timed, observe, gauge = REGISTRY.span, REGISTRY.timed, REGISTRY.observe, REGISTRY.gauge
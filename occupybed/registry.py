@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------
+# Patient Master Index (MPI)
+# ---------------------------------------------------------
+# PINs live in one sorted fixed-width byte array (~12 bytes per patient), with
+# gender as an int8 code alongside. Exact lookups and prefix ranges are binary
+# searches, so a multi-million patient index answers in microseconds and a
+# page of typeahead results never materializes the whole match list.
+
+GENDERS = np.array(["Male", "Female", "Unknown"])
+_MAX_CHAR = b"\xff"
+
+
+class PatientRegistry:
+    def __init__(self, pins, genders):
+        pins = np.asarray(pins, dtype="S")
+        pins = pins.astype(f"S{max(int(np.char.str_len(pins).max(initial=1)), 1)}")
+        order = np.argsort(pins, kind="stable")
+        self._pins = pins[order]
+        codes = pd.Categorical(genders, categories=GENDERS[:2]).codes
+        self._gender = np.where(codes < 0, 2, codes).astype(np.int8)[order]
+
+    @classmethod
+    def synthetic(cls, n=3000, first=1000):
+        nums = np.arange(first, first + n)
+        return cls(np.char.add("PIN-", nums.astype(str)), np.where(nums % 2 == 0, "Male", "Female"))
+
+    @classmethod
+    def from_file(cls, path):
+        if path.endswith(".parquet"):
+            frame = pd.read_parquet(path, columns=["PIN", "Gender"])
+        else:
+            frame = pd.read_csv(path, usecols=["PIN", "Gender"], dtype=str)
+        return cls(frame["PIN"].to_numpy(dtype=str), frame["Gender"].to_numpy())
+
+    @classmethod
+    def load(cls, path, n=3000):
+        return cls.from_file(path) if path and os.path.exists(path) else cls.synthetic(n)
+
+    def __len__(self):
+        return len(self._pins)
+
+    # --- Exact lookup ---
+    def _find(self, pin):
+        key = str(pin).encode()
+        i = np.searchsorted(self._pins, key)
+        return i if i < len(self._pins) and self._pins[i] == key else None
+
+    def __contains__(self, pin):
+        return self._find(pin) is not None
+
+    def gender(self, pin, default="Unknown"):
+        i = self._find(pin)
+        return default if i is None else str(GENDERS[self._gender[i]])
+
+    # --- Prefix / typeahead ---
+    def _range(self, prefix):
+        key = prefix.encode()
+        lo = np.searchsorted(self._pins, key, side="left")
+        hi = np.searchsorted(self._pins, key + _MAX_CHAR, side="left")
+        return int(lo), int(hi)
+
+    def _excluded(self, lo, hi, exclude):
+        if not exclude:
+            return np.empty(0, dtype=np.int64)
+        keys = np.asarray([str(p).encode() for p in exclude], dtype="S")
+        pos = np.searchsorted(self._pins, keys)
+        hit = (pos >= lo) & (pos < hi)
+        pos, keys = pos[hit], keys[hit]
+        return np.unique(pos[self._pins[pos] == keys])
+
+    def count(self, prefix="", exclude=()):
+        lo, hi = self._range(prefix)
+        return hi - lo - len(self._excluded(lo, hi, exclude))
+
+    def search(self, prefix="", page=0, page_size=50, exclude=()):
+        lo, hi = self._range(prefix)
+        ex = self._excluded(lo, hi, exclude) - lo
+        total = hi - lo - len(ex)
+        ranks = np.arange(page * page_size, min((page + 1) * page_size, total))
+        # The j-th excluded slot has (ex[j] - j) kept entries before it, so a
+        # kept rank r sits at r + #{j : ex[j] - j <= r}.
+        pos = lo + ranks + np.searchsorted(ex - np.arange(len(ex)), ranks, side="right")
+        return [p.decode() for p in self._pins[pos]]
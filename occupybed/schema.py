@@ -0,0 +1,158 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from .beds import NO_BED
+
+# ---------------------------------------------------------
+# Census Schema (typed, validated once at ingest)
+# ---------------------------------------------------------
+# In-memory census frames are indexed by stay id and use compact dtypes:
+#
+#   column            dtype              bytes/stay
+#   (index) stay id   int64              8
+#   PIN               int64              8    "PIN-2005" -> 2005
+#   Gender            category           1    Male / Female / Unknown
+#   Department        category           1    categories = configured wards
+#   Bed               int16              2    0-based slot, -1 = no bed;
+#                                             label "MED-001" is derived
+#   Admit_Date        datetime64[s]      8
+#   Exp_Discharge     datetime64[s]      8
+#   Actual_Discharge  datetime64[s]      8    NaT while active
+#   Source            category           1    Emergency / Elective / Transfer
+#
+# ~45 bytes per stay, so 1M stays (several years for a large hospital) fit
+# in ~45 MB, versus several hundred bytes per stay with object strings.
+# memory_report() gives the live figure for a frame.
+#
+# External data (CSV upload/download, the admission form) keeps the
+# "PIN-xxxx" and "<DEP>-<nnn>" text forms; validate() and to_external()
+# convert at the boundary.
+
+COLUMNS = ["PIN", "Gender", "Department", "Bed", "Admit_Date", "Exp_Discharge", "Actual_Discharge", "Source"]
+DATE_COLS = ["Admit_Date", "Exp_Discharge", "Actual_Discharge"]
+GENDERS = ["Male", "Female", "Unknown"]
+SOURCES = ["Emergency", "Elective", "Transfer"]
+
+_PIN_RE = re.compile(r"^PIN-(\d{1,18})$")
+
+
+def format_pin(pin):
+    return f"PIN-{int(pin)}"
+
+
+def parse_pin(pin):
+    if isinstance(pin, (int, np.integer)):
+        # Same range as the 18-digit text form (fits the int64 column)
+        return int(pin) if 0 <= pin < 10**18 else None
+    m = _PIN_RE.match(str(pin).strip())
+    return int(m.group(1)) if m else None
+
+
+def parse_pins(ser):
+    # Vectorized parse_pin: float array, NaN where the PIN is malformed
+    if pd.api.types.is_integer_dtype(ser):
+        return ser.to_numpy(dtype="float64")
+    digits = ser.astype("string").str.strip().str.extract(r"^PIN-(\d{1,18})$", expand=False)
+    return pd.to_numeric(digits, errors="coerce").to_numpy(dtype="float64")
+
+
+def _prefixes(depts):
+    return depts.astype("string").str[:3].str.upper() + "-"
+
+
+def bed_slots(depts, beds, departments):
+    # Vectorized bed_slot for labels or integer slots: int array, NO_BED where
+    # the bed doesn't fit the ward (wrong prefix, or outside 0 <= slot < cap)
+    caps = depts.astype("string").map({d: info['cap'] for d, info in departments.items()})
+    caps = pd.to_numeric(caps, errors="coerce")
+    if pd.api.types.is_integer_dtype(beds):
+        nums = pd.Series(beds.to_numpy(dtype="float64", na_value=np.nan), index=beds.index)
+        ok = pd.Series(True, index=beds.index)
+    else:
+        # Prefix up to the last "-" (the number has none), so it works for any prefix length
+        parts = beds.astype("string").str.strip().str.extract(r"^(.*-)(\d+)$")
+        nums = pd.to_numeric(parts[1], errors="coerce") - 1
+        ok = parts[0] == _prefixes(depts)
+    ok = ok & (nums >= 0) & (nums < caps)
+    return np.where(ok.fillna(False).to_numpy(dtype=bool), nums.fillna(NO_BED).to_numpy(), NO_BED).astype(np.int64)
+
+
+def bed_labels(depts, slots):
+    slots = pd.Series(np.asarray(slots), index=depts.index)
+    labels = _prefixes(depts) + (slots + 1).astype("string").str.zfill(3)
+    return labels.where(slots >= 0)
+
+
+def _categorical(values, categories):
+    values = pd.Series(values)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        extra = sorted(set(values.cat.categories) - set(categories))
+        return values.cat.set_categories(list(categories) + extra).array
+    values = values.astype("string")
+    extra = sorted(set(values.dropna().unique()) - set(categories))
+    return pd.Categorical(values, categories=list(categories) + extra)
+
+
+def coerce(frame, departments):
+    # Apply the typed schema to rows that were already validated (store reads)
+    out = pd.DataFrame(index=frame.index)
+    out["PIN"] = frame["PIN"].astype(np.int64)
+    out["Gender"] = _categorical(frame["Gender"], GENDERS)
+    out["Department"] = _categorical(frame["Department"], departments)
+    beds = frame["Bed"].fillna(NO_BED)
+    if len(beds) and (beds.min() < NO_BED or beds.max() > np.iinfo(np.int16).max):
+        # int16 would wrap silently; validate() never lets such slots through
+        raise ValueError(f"Bed slot out of range: {beds.min() if beds.min() < NO_BED else beds.max()}")
+    out["Bed"] = beds.astype(np.int16)
+    for col in DATE_COLS:
+        out[col] = pd.to_datetime(frame[col]).astype("datetime64[s]")
+    out["Source"] = _categorical(frame["Source"], SOURCES)
+    return out
+
+
+def validate(frame, departments):
+    # Returns (typed valid rows, rejected rows with an Error column)
+    missing = [c for c in COLUMNS if c not in frame]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    pins = parse_pins(frame["PIN"])
+    dates = {col: pd.to_datetime(frame[col], errors="coerce") for col in DATE_COLS}
+    depts = frame["Department"].astype("string").str.strip()
+    slots = bed_slots(depts, frame["Bed"], departments)
+    checks = [
+        (np.isnan(pins), "Invalid PIN"),
+        (~depts.isin(list(departments)).fillna(False).to_numpy(dtype=bool), "Unknown Department"),
+        (slots < 0, "Invalid Bed for Department"),
+        (~frame["Gender"].isin(GENDERS).to_numpy(dtype=bool), "Invalid Gender"),
+        (~frame["Source"].isin(SOURCES).to_numpy(dtype=bool), "Invalid Source"),
+        (dates["Admit_Date"].isna().to_numpy(), "Invalid Admit_Date"),
+        ((dates["Exp_Discharge"].isna() & frame["Exp_Discharge"].notna()).to_numpy(), "Invalid Exp_Discharge"),
+        ((dates["Actual_Discharge"].isna() & frame["Actual_Discharge"].notna()).to_numpy(), "Invalid Actual_Discharge"),
+        ((dates["Actual_Discharge"] < dates["Admit_Date"]).to_numpy(), "Discharge before Admit"),
+    ]
+    error = np.select([c for c, _ in checks], [msg for _, msg in checks], default="")
+    bad = error != ""
+    typed = pd.DataFrame({
+        "PIN": pins, "Gender": frame["Gender"], "Department": depts, "Bed": slots,
+        **{col: dates[col] for col in DATE_COLS}, "Source": frame["Source"],
+    }, index=frame.index)[~bad]
+    rejected = frame[bad].assign(Error=error[bad])
+    return coerce(typed, departments), rejected
+
+
+def to_external(frame):
+    # Text PINs and bed labels for display and CSV export
+    out = frame.copy()
+    out["PIN"] = "PIN-" + out["PIN"].astype("string")
+    out["Bed"] = bed_labels(out["Department"], out["Bed"])
+    return out
+
+
+def memory_report(frame):
+    usage = frame.memory_usage(index=True, deep=True)
+    report = pd.DataFrame({"Bytes": usage, "Dtype": [str(frame.index.dtype)] + [str(t) for t in frame.dtypes]})
+    report.loc["Total"] = [int(usage.sum()), ""]
+    report["Bytes / Stay"] = report["Bytes"] / max(len(frame), 1)
+    return report
@@ -0,0 +1,1004 @@
+import glob
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from . import allocator, schema, surge
+from .beds import BedIndex, BedOccupiedError, bed_label
+from .config import DEFAULT_SITE
+from .events import EventLog
+from .forecast import WINDOWS, DischargeForecast
+from .kpi import KpiAggregator
+from .los_model import LosModel
+from .schema import COLUMNS, DATE_COLS
+from .timeline import CensusTimeline
+
+# ---------------------------------------------------------
+# Shared Census Store (SQLite / WAL + Parquet archive)
+# ---------------------------------------------------------
+# One store instance is shared by every Streamlit session (see get_store in
+# app.py). Timestamps are kept as integer epoch seconds so that range scans
+# and index lookups stay cheap; PINs and beds are integers (see schema.py)
+# and frames come back in the typed census schema.
+#
+# Hot/cold layout:
+#   stays         - active census only (hot, small, cached in memory)
+#   archive_tail  - discharged stays not yet flushed (append-only buffer)
+#   archive/      - month=YYYY-MM/part-<seq>.parquet, keyed by discharge month
+# A flush writes the tail into Parquet parts named after the highest tail seq
+# handed out so far, then records that seq in `meta` ('flushed_seq'). Parts
+# are written to a temp file and renamed, so a part on disk is complete; one
+# above the recorded seq (an interrupted flush, or a database that was lost or
+# replaced by an older copy) is kept on open and its stays leave the tail.
+#
+# Active beds are unique per department (ux_stays_bed), which rejects double
+# booking even across processes; the in-memory BedIndex answers bed queries.
+# KpiAggregator is built with one pass over the archive on open and then kept
+# current by every write below.
+#
+# Archived stays closed by a transfer to another ward (apply_adt) are listed
+# in `transfers`: they count towards ward census and patient-days, but not as
+# discharges, so KPIs and LOS training leave them out.
+#
+# Every write is also recorded in the ADT event log (events.py). Events are
+# numbered inside the write transaction (meta 'event_seq') and appended to
+# the log after it commits. If the log is ahead of the database on open (the
+# database was lost or replaced by an older copy), the active census is
+# rebuilt from the latest snapshot plus the log tail.
+
+_HOT_COLS = ["pin", "gender", "department", "bed", "admit_date", "exp_discharge", "source"]
+_COLD_COLS = _HOT_COLS[:6] + ["actual_discharge", "source"]
+
+ARCHIVE_FLUSH_ROWS = 5000
+# Expected stay of an ADT admit that carries no exp_discharge (the batch form's default)
+ADT_DEFAULT_LOS_DAYS = 3
+
+# 1 = single `stays` table, 2 = hot/cold split with text PINs and bed labels
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stays (
+    id            INTEGER PRIMARY KEY,
+    pin           INTEGER NOT NULL,
+    gender        TEXT,
+    department    TEXT    NOT NULL,
+    bed           INTEGER NOT NULL,
+    admit_date    INTEGER NOT NULL,
+    exp_discharge INTEGER,
+    source        TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_stays_pin ON stays(pin);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_stays_bed ON stays(department, bed) WHERE bed >= 0;
+CREATE TABLE IF NOT EXISTS archive_tail (
+    seq              INTEGER PRIMARY KEY AUTOINCREMENT,
+    id               INTEGER NOT NULL,
+    pin              INTEGER NOT NULL,
+    gender           TEXT,
+    department       TEXT    NOT NULL,
+    bed              INTEGER NOT NULL,
+    admit_date       INTEGER NOT NULL,
+    exp_discharge    INTEGER,
+    actual_discharge INTEGER NOT NULL,
+    source           TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_tail_discharge ON archive_tail(actual_discharge);
+CREATE TABLE IF NOT EXISTS transfers (
+    id INTEGER PRIMARY KEY
+)
+"""
+
+# Legacy text columns -> integers (malformed legacy PINs become 0); the bed
+# prefix is bed_prefix(): up to 3 letters of the ward name plus "-"
+_LEGACY_PREFIX_LEN = "length(substr(department, 1, 3))"
+_LEGACY_SQL = {
+    "pin": "CAST(substr(pin, 5) AS INTEGER)",
+    "bed": f"CASE WHEN substr(bed, 1, {_LEGACY_PREFIX_LEN} + 1) = upper(substr(department, 1, 3)) || '-' "
+           f"THEN CAST(substr(bed, {_LEGACY_PREFIX_LEN} + 2) AS INTEGER) - 1 ELSE -1 END",
+}
+_LEGACY_INDEXES = ["ix_stays_pin", "ix_stays_dept", "ix_stays_active", "ix_stays_bed", "ux_stays_bed",
+                   "ix_tail_discharge"]
+
+_CAT = pa.dictionary(pa.int32(), pa.string())
+ARCHIVE_SCHEMA = pa.schema([
+    ("id", pa.int64()), ("PIN", pa.int64()), ("Gender", _CAT),
+    ("Department", _CAT), ("Bed", pa.int16()),
+    ("Admit_Date", pa.timestamp("s")), ("Exp_Discharge", pa.timestamp("s")),
+    ("Actual_Discharge", pa.timestamp("s")), ("Source", _CAT),
+])
+
+
+def _epoch(v):
+    if v is None or pd.isna(v):
+        return None
+    return int(pd.Timestamp(v).value // 10**9)
+
+
+def _epoch_col(ser):
+    ser = pd.to_datetime(ser, errors="coerce")
+    out = ser.to_numpy(dtype="datetime64[s]").astype("int64").astype(object)
+    out[ser.isna().to_numpy()] = None
+    return out
+
+
+def _secs(ser):
+    vals = ser.to_numpy(dtype="datetime64[s]")
+    out = vals.astype("int64").astype("float64")
+    out[np.isnat(vals)] = np.nan
+    return out
+
+
+def _str(v):
+    return None if v is None or pd.isna(v) else str(v)
+
+
+def _stay_event(kind, stay_id, row, **extra):
+    # Event for one stay from a typed census row
+    return {"type": kind, "id": int(stay_id), "pin": int(row["PIN"]), "gender": _str(row["Gender"]),
+            "department": str(row["Department"]), "bed": int(row["Bed"]), "admit_date": _epoch(row["Admit_Date"]),
+            "exp_discharge": _epoch(row["Exp_Discharge"]), "source": _str(row["Source"]), **extra}
+
+
+def _part_seq(path):
+    return int(os.path.basename(path)[5:-8])
+
+
+def _to_frame(rows, columns):
+    frame = pd.DataFrame(rows, columns=["id"] + columns).set_index("id")
+    for col in DATE_COLS:
+        if col in frame:
+            frame[col] = pd.to_datetime(frame[col].astype("float64"), unit="s")
+    return frame
+
+
+class CensusStore:
+    def __init__(self, path, departments, archive_dir=None, events_dir=None):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.archive_dir = archive_dir or os.path.join(os.path.dirname(path), "archive")
+        self.events = EventLog(events_dir or os.path.join(os.path.dirname(path), "events"))
+        self.departments = departments
+        self._lock = threading.RLock()
+        self._active = None
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self._conn.executescript(SCHEMA)
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('schema', ?)", (SCHEMA_VERSION,))
+        self._recover_archive()
+        self._recover_events()
+        self._load_indexes()
+
+    # --- Migrations ---
+    def _migrate(self):
+        tables = {r[0] for r in self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if "stays" not in tables:
+            return
+        version = self._meta("schema", 2) if "meta" in tables else 1
+        if version >= SCHEMA_VERSION:
+            return
+        if version == 2:
+            self._migrate_parts()
+        hot = "id, " + ", ".join(_LEGACY_SQL.get(c, c) for c in _HOT_COLS)
+        cold = "id, " + ", ".join(_LEGACY_SQL.get(c, c) for c in _COLD_COLS)
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute("ALTER TABLE stays RENAME TO old_stays")
+            if version == 2:
+                self._conn.execute("ALTER TABLE archive_tail RENAME TO old_tail")
+            for ix in _LEGACY_INDEXES:
+                self._conn.execute(f"DROP INDEX IF EXISTS {ix}")
+            for stmt in SCHEMA.split(";"):
+                self._conn.execute(stmt)
+            if version == 1:
+                self._conn.execute(
+                    f"INSERT INTO stays (id, {', '.join(_HOT_COLS)}) SELECT {hot} FROM old_stays "
+                    "WHERE actual_discharge IS NULL")
+                self._conn.execute(
+                    f"INSERT INTO archive_tail (id, {', '.join(_COLD_COLS)}) SELECT {cold} FROM old_stays "
+                    "WHERE actual_discharge IS NOT NULL ORDER BY actual_discharge")
+                nxt = self._conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM old_stays").fetchone()[0]
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('next_id', ?)", (nxt,))
+            else:
+                self._conn.execute(f"INSERT INTO stays (id, {', '.join(_HOT_COLS)}) SELECT {hot} FROM old_stays")
+                self._conn.execute(
+                    f"INSERT INTO archive_tail (seq, id, {', '.join(_COLD_COLS)}) SELECT seq, {cold} FROM old_tail")
+                self._conn.execute("DROP TABLE old_tail")
+            self._conn.execute("DROP TABLE old_stays")
+
+    def _migrate_parts(self):
+        # Rewrite v2 parts (text PIN / bed label); already converted parts are skipped
+        for part in self._parts():
+            if pq.read_schema(part).field("PIN").type == pa.int64():
+                continue
+            frame = pq.read_table(part).to_pandas()
+            frame["PIN"] = np.nan_to_num(schema.parse_pins(frame["PIN"])).astype(np.int64)
+            frame["Bed"] = schema.bed_slots(frame["Department"], frame["Bed"], self.departments).astype(np.int16)
+            self._write_part(frame, part)
+
+    def _meta(self, key, default=0):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def _recover_archive(self):
+        # Only temp files of an interrupted part write are incomplete. Parts
+        # the database doesn't know about are registered: their stays leave
+        # the tail, and tail seqs (part names) and stay ids move past them.
+        for tmp in glob.glob(os.path.join(self.archive_dir, "month=*", "part-*.parquet.tmp")):
+            os.remove(tmp)
+        flushed = self._meta("flushed_seq")
+        extra = [p for p in self._parts() if _part_seq(p) > flushed]
+        with self._conn:
+            self._conn.execute("DELETE FROM archive_tail WHERE seq <= ?", (flushed,))
+            if not extra:
+                return
+            ids = self._part_ids(extra)
+            self._conn.executemany("DELETE FROM archive_tail WHERE id = ?", ((i,) for i in ids))
+            hi = max(_part_seq(p) for p in extra)
+            if not self._conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'archive_tail'",
+                                      (hi,)).rowcount:
+                self._conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('archive_tail', ?)", (hi,))
+            # Recorded up to the first tail row still waiting for a flush
+            left = self._conn.execute("SELECT MIN(seq) FROM archive_tail").fetchone()[0]
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('flushed_seq', ?)",
+                               (hi if left is None else max(flushed, min(hi, left - 1)),))
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('next_id', ?)",
+                               (max([self._meta("next_id", 1)] + [i + 1 for i in ids]),))
+
+    def _part_ids(self, parts):
+        ids = set()
+        for part in parts:
+            ids.update(pq.read_table(part, columns=["id"]).column("id").to_pylist())
+        return ids
+
+    def _recover_events(self):
+        # Log ahead of the database: active census from snapshot + tail, and
+        # the stays discharged by events the database never saw go to the tail
+        applied = self._meta("event_seq")
+        if self.events.last_seq <= applied:
+            if self.events.last_seq < applied or not self.events.snapshots():
+                # Log started on an existing database, or lost its unsynced tail
+                self.events.snapshot(self._load_active(), applied)
+            return
+        state, discharged = self.events.state(base=applied or None)
+        discharged = [e for e in discharged if e["seq"] > applied]
+        # Stays flushed to parts before the database was lost are archived already
+        archived = self._part_ids(self._parts()) if discharged else set()
+        archived.update(r[0] for r in self._conn.execute("SELECT id FROM archive_tail"))
+        with self._conn:
+            self._write_state(state)
+            self._conn.executemany(
+                "INSERT INTO archive_tail (id, " + ", ".join(_COLD_COLS) + ") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(e["id"], *(e[c] for c in _COLD_COLS)) for e in discharged if e["id"] not in archived])
+            self._conn.executemany("INSERT OR IGNORE INTO transfers VALUES (?)",
+                                   [(e["id"],) for e in discharged if e.get("reason") == "transfer"])
+            next_id = max([self._meta("next_id", 1)] + [e["id"] + 1 for e in discharged])
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('next_id', ?)", (next_id,))
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('event_seq', ?)", (self.events.last_seq,))
+            self._bump()
+
+    def _write_state(self, state):
+        # Inside a transaction: replace the active census with {stay id: [stays columns]}
+        self._conn.execute("DELETE FROM stays")
+        self._conn.executemany("INSERT INTO stays (id, " + ", ".join(_HOT_COLS) + ") VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                               [(stay_id, *row) for stay_id, row in state.items()])
+        next_id = max([self._meta("next_id", 1)] + [stay_id + 1 for stay_id in state])
+        self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('next_id', ?)", (next_id,))
+        self._active = None
+
+    def _log(self, records):
+        # Inside a write transaction: number the events; _publish appends
+        # them to the log once the transaction has committed
+        start = self._meta("event_seq") + 1
+        self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('event_seq', ?)", (start + len(records) - 1,))
+        ts = int(time.time())
+        return [{"seq": start + i, "ts": ts, **r} for i, r in enumerate(records)]
+
+    def _publish(self, events):
+        self.events.append(events)
+        if self.events.due_snapshot():
+            self.events.snapshot(self._load_active(), self.events.last_seq)
+
+    def _bump(self):
+        # Called inside every write transaction; see `version`
+        self._conn.execute("INSERT INTO meta VALUES ('version', 1) "
+                           "ON CONFLICT(key) DO UPDATE SET value = value + 1")
+
+    def _next_ids(self, n):
+        start = self._meta("next_id", 1)
+        self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('next_id', ?)", (start + n,))
+        return range(start, start + n)
+
+    # --- Hot partition (active census) ---
+    def _load_active(self):
+        if self._active is None:
+            rows = self._conn.execute("SELECT id, " + ", ".join(_HOT_COLS) + " FROM stays").fetchall()
+            frame = _to_frame(rows, [c for c in COLUMNS if c != "Actual_Discharge"])
+            frame["Actual_Discharge"] = pd.NaT
+            self._active = schema.coerce(frame, self.departments)
+        return self._active
+
+    def _load_indexes(self):
+        active = self._load_active()
+        self.beds = BedIndex(self.departments)
+        self.beds.load(active)
+        self._by_pin = dict(zip(active["PIN"].tolist(), active.index.tolist()))
+        self.forecast = DischargeForecast.from_active(active, self.departments)
+        self.kpis = KpiAggregator(self.departments)
+        self.kpis.add(active["Department"].to_numpy(), _secs(active["Admit_Date"]), _secs(active["Actual_Discharge"]))
+        self.timeline = CensusTimeline(self.departments)
+        self.timeline.add(active["Department"].to_numpy(), _secs(active["Admit_Date"]), _secs(active["Actual_Discharge"]))
+        self.los = LosModel(self.departments)
+        transfers = {r[0] for r in self._conn.execute("SELECT id FROM transfers")}
+        for part in self._iter_archive():
+            admits, discharges = _secs(part["Admit_Date"]), _secs(part["Actual_Discharge"])
+            moved = part.index.isin(transfers) if transfers else np.zeros(len(part), dtype=bool)
+            self.kpis.add(part["Department"].to_numpy(), admits, discharges, moved)
+            self.timeline.add(part["Department"].to_numpy(), admits, discharges)
+            self.los.add(part["Department"].to_numpy()[~moved], part["Source"].to_numpy()[~moved],
+                         (discharges - admits)[~moved])
+
+    @property
+    def version(self):
+        # Data version, bumped by every write (in any process); caches of
+        # derived data (exports, charts) key on it
+        with self._lock:
+            return self._meta("version")
+
+    def is_empty(self):
+        with self._lock:
+            return (self._conn.execute("SELECT 1 FROM stays LIMIT 1").fetchone() is None
+                    and self._conn.execute("SELECT 1 FROM archive_tail LIMIT 1").fetchone() is None
+                    and not self._parts())
+
+    def census_size(self):
+        # Active and discharged stay counts, from the running KPI sums
+        with self._lock:
+            sums = self.kpis.sums.values()
+            return {"active": sum(d["active"] for d in sums), "discharged": sum(d["dis"] for d in sums)}
+
+    def active(self, dept=None):
+        with self._lock:
+            frame = self._load_active()
+        if dept is None:
+            return frame.copy()
+        return frame[frame["Department"] == dept]
+
+    def find_active(self, pin):
+        with self._lock:
+            stay_id = self._by_pin.get(schema.parse_pin(pin))
+            return None if stay_id is None else self._load_active().loc[stay_id]
+
+    def active_pins(self):
+        with self._lock:
+            return {schema.format_pin(p) for p in self._by_pin}
+
+    def occupied_beds(self, dept):
+        with self._lock:
+            return self.beds.occupied_beds(dept)
+
+    def free_beds(self, dept):
+        with self._lock:
+            return self.beds.free_beds(dept)
+
+    def first_free_bed(self, dept):
+        with self._lock:
+            return self.beds.first_free(dept)
+
+    def hospital_kpis(self, now):
+        with self._lock:
+            return self.kpis.hospital(now)
+
+    def department_kpis(self, now):
+        with self._lock:
+            return self.kpis.by_department(now)
+
+    def site_kpis(self, now):
+        with self._lock:
+            return self.kpis.by_site(now)
+
+    def daily_flow(self, start, end):
+        with self._lock:
+            return self.kpis.daily(start, end)
+
+    def expected_free(self, now, hours=WINDOWS):
+        with self._lock:
+            return self.forecast.expected_free(now, hours)
+
+    def discharge_curve(self, now, horizon=72, step=1):
+        with self._lock:
+            return self.forecast.curve(now, horizon, step)
+
+    def discharge_probabilities(self, now, hours=WINDOWS):
+        # LOS-model probability that each active stay is out within each horizon
+        with self._lock:
+            return self.los.probabilities(self._load_active(), now, hours)
+
+    def predicted_free(self, now, hours=WINDOWS, site=None):
+        # LOS-model expected free beds (with interval) per department and
+        # horizon, plus a Hospital row, or with `site` a row for that site
+        with self._lock:
+            active = self._load_active()
+            if site is None:
+                return self.los.bed_forecast(active, now, hours)
+            wards = [d for d, info in self.departments.items() if info.get('site', DEFAULT_SITE) == site]
+            return self.los.bed_forecast(active[active["Department"].isin(wards)], now, hours, total=site)
+
+    def surge_inputs(self, now, hours=14 * 24, scenario=None):
+        # Simulation inputs: active census, LOS model and recent arrival rates
+        recent = self.history(pd.Timestamp(now) - pd.Timedelta(days=surge.ARRIVAL_DAYS), now)
+        rates = surge.arrival_rates(recent, self.departments, now)
+        with self._lock:
+            return surge.prepare(self._load_active(), self.los, rates, self.departments, now, hours, scenario)
+
+    def census_at(self, times):
+        with self._lock:
+            return self.timeline.census_at(times)
+
+    def census_curve(self, start, end, freq="h"):
+        with self._lock:
+            return self.timeline.curve(start, end, freq)
+
+    def period_stats(self, start, end):
+        with self._lock:
+            return self.timeline.period_stats(start, end)
+
+    def bed_occupant(self, dept, bed):
+        with self._lock:
+            slot = bed if isinstance(bed, (int, np.integer)) else self.beds.slot(dept, bed)
+            stay_id = None if slot is None else self.beds.occupant(dept, slot)
+            return None if stay_id is None else self._load_active().loc[stay_id]
+
+    # --- Cold partition (discharged archive) ---
+    def _parts(self, start=None):
+        parts = sorted(glob.glob(os.path.join(self.archive_dir, "month=*", "part-*.parquet")))
+        if start is not None:
+            first = pd.Timestamp(start).strftime("%Y-%m")
+            parts = [p for p in parts if os.path.basename(os.path.dirname(p))[6:] >= first]
+        return parts
+
+    def iter_archive(self, start=None, end=None):
+        # Discharged stays overlapping [start, end], one partition at a time
+        # (unflushed tail last). A stay discharged before `start` cannot
+        # overlap, so months earlier than `start` are skipped.
+        filters = []
+        if start is not None:
+            filters.append(("Actual_Discharge", ">=", pd.Timestamp(start)))
+        if end is not None:
+            filters.append(("Admit_Date", "<=", pd.Timestamp(end)))
+        with self._lock:
+            parts = self._parts(start)
+            where, params = [], []
+            if start is not None:
+                where.append("actual_discharge >= ?")
+                params.append(_epoch(start))
+            if end is not None:
+                where.append("admit_date <= ?")
+                params.append(_epoch(end))
+            sql = "SELECT id, " + ", ".join(_COLD_COLS) + " FROM archive_tail"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            tail = _to_frame(self._conn.execute(sql, params).fetchall(), COLUMNS)
+        for part in parts:
+            frame = pq.read_table(part, schema=ARCHIVE_SCHEMA, filters=filters or None).to_pandas().set_index("id")
+            if not frame.empty:
+                yield schema.coerce(frame, self.departments)
+        if not tail.empty:
+            yield schema.coerce(tail, self.departments)
+
+    def archive(self, start=None, end=None):
+        frames = list(self.iter_archive(start, end))
+        if not frames:
+            return schema.coerce(_to_frame([], COLUMNS), self.departments)
+        return schema.coerce(pd.concat(frames), self.departments) if len(frames) > 1 else frames[0]
+
+    def _iter_archive(self):
+        # One partition at a time (indexed by stay id), so index builds never hold the whole archive
+        cols = ["Department", "Admit_Date", "Actual_Discharge", "Source"]
+        for part in self._parts():
+            yield pq.read_table(part, columns=["id"] + cols, schema=ARCHIVE_SCHEMA).to_pandas().set_index("id")
+        rows = self._conn.execute(
+            "SELECT id, department, admit_date, actual_discharge, source FROM archive_tail").fetchall()
+        yield _to_frame(rows, cols)
+
+    def archive_keys(self, months):
+        # (PIN, admit epoch) of archived stays discharged in the given YYYY-MM months
+        keys = set()
+        for part in self._parts():
+            if os.path.basename(os.path.dirname(part))[6:] in months:
+                t = pq.read_table(part, columns=["PIN", "Admit_Date"])
+                keys.update(zip(t.column("PIN").to_pylist(), t.column("Admit_Date").cast(pa.int64()).to_pylist()))
+        with self._lock:
+            keys.update(self._conn.execute("SELECT pin, admit_date FROM archive_tail").fetchall())
+        return keys
+
+    def history(self, start=None, end=None):
+        act = self.active()
+        if end is not None:
+            act = act[act["Admit_Date"] <= pd.Timestamp(end)]
+        cold = self.archive(start, end)
+        if cold.empty:
+            return act
+        return schema.coerce(pd.concat([cold, act]).sort_index(), self.departments)
+
+    def _drop_archived(self, ids):
+        # Rewrites the parts holding any of these stays without them
+        for part in self._parts():
+            if ids.isdisjoint(self._part_ids([part])):
+                continue
+            frame = pq.read_table(part, schema=ARCHIVE_SCHEMA).to_pandas()
+            frame = frame[~frame["id"].isin(ids)]
+            if frame.empty:
+                os.remove(part)
+            else:
+                self._write_part(frame, part)
+
+    def _write_part(self, frame, out):
+        table = pa.Table.from_pandas(frame, schema=ARCHIVE_SCHEMA, preserve_index=False)
+        pq.write_table(table, out + ".tmp")
+        os.replace(out + ".tmp", out)
+
+    def flush_archive(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, id, " + ", ".join(_COLD_COLS) + " FROM archive_tail ORDER BY seq").fetchall()
+            if not rows:
+                return 0
+            # Highest seq handed out (see _recover_archive), so part names only grow
+            hi = self._conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'archive_tail'").fetchone()[0]
+            frame = schema.coerce(_to_frame([r[1:] for r in rows], COLUMNS), self.departments).reset_index()
+            months = frame["Actual_Discharge"].dt.strftime("%Y-%m")
+            for month, part in frame.groupby(months):
+                out_dir = os.path.join(self.archive_dir, f"month={month}")
+                os.makedirs(out_dir, exist_ok=True)
+                self._write_part(part, os.path.join(out_dir, f"part-{hi:012d}.parquet"))
+            with self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('flushed_seq', ?)", (hi,))
+                self._conn.execute("DELETE FROM archive_tail WHERE seq <= ?", (hi,))
+            return len(rows)
+
+    def _maybe_flush(self):
+        if self._conn.execute("SELECT COUNT(*) FROM archive_tail").fetchone()[0] >= ARCHIVE_FLUSH_ROWS:
+            self.flush_archive()
+
+    # --- Writes ---
+    def admit(self, rec):
+        # Takes form values ("PIN-2005", "MED-001"); check-and-insert runs
+        # under the store lock and the unique bed index catches a competing
+        # writer in another process.
+        dept = rec["Department"]
+        pin = schema.parse_pin(rec["PIN"])
+        slot = self.beds.slot(dept, rec["Bed"])
+        if pin is None or slot is None:
+            raise ValueError(f"Invalid PIN or bed: {rec['PIN']} / {rec['Bed']}")
+        with self._lock:
+            if pin in self._by_pin:
+                raise ValueError(f"Invalid PIN: {rec['PIN']} is already admitted")
+            if not self.beds.is_free(dept, slot):
+                raise BedOccupiedError(f"{dept} bed {bed_label(dept, slot)} is already occupied.")
+            try:
+                with self._conn:
+                    stay_id = self._next_ids(1)[0]
+                    row = (pin, rec["Gender"], dept, int(slot), _epoch(rec["Admit_Date"]), _epoch(rec["Exp_Discharge"]),
+                           rec["Source"])
+                    self._conn.execute(
+                        "INSERT INTO stays (id, " + ", ".join(_HOT_COLS) + ") VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (stay_id, *row))
+                    events = self._log([{"type": "admit", "id": stay_id, **dict(zip(_HOT_COLS, row))}])
+                    self._bump()
+            except sqlite3.IntegrityError as e:
+                if "UNIQUE" not in str(e):
+                    raise
+                raise BedOccupiedError(f"{dept} bed {bed_label(dept, slot)} is already occupied.")
+            self._index_admit(events[0])
+            self._active = None
+            self._publish(events)
+        return stay_id
+
+    def _index_admit(self, ev):
+        # In-memory indexes after a committed admit event
+        self.beds.occupy(ev["department"], ev["bed"], ev["id"])
+        self._by_pin[ev["pin"]] = ev["id"]
+        self.kpis.admit(ev["department"], ev["admit_date"])
+        self.timeline.admit(ev["department"], ev["admit_date"])
+        self.forecast.admit(ev["department"], ev["exp_discharge"])
+
+    def _index_discharge(self, ev):
+        # In-memory indexes after a committed discharge event (or a ward stay
+        # closed by a transfer, which is not a discharge for KPIs / LOS)
+        moved = ev.get("reason") == "transfer"
+        self.beds.release(ev["id"])
+        self._by_pin.pop(ev["pin"], None)
+        self.kpis.discharge(ev["department"], ev["admit_date"], ev["actual_discharge"], transfer=moved)
+        self.timeline.discharge(ev["department"], ev["actual_discharge"])
+        self.forecast.discharge(ev["department"], ev["exp_discharge"])
+        if not moved:
+            self.los.discharge(ev["department"], ev["source"], ev["actual_discharge"] - ev["admit_date"])
+
+    def apply_adt(self, messages):
+        # ADT micro-batch (see feed.py), applied in order in one transaction.
+        # Messages: type admit / transfer / discharge, pin, time and, as
+        # needed, department, bed (label or 0-based slot; first free bed if
+        # missing), gender, exp_discharge (ADT_DEFAULT_LOS_DAYS after the
+        # admit if missing), source. A transfer to another ward closes the
+        # ward stay (listed in `transfers`, not a discharge) and opens a new
+        # one (Source "Transfer"), so ward census and BOR follow the patient;
+        # within a ward it only moves the bed. Invalid messages (bad time,
+        # wrong field type, unknown ward, bed outside the ward, ...) are
+        # skipped one by one. Returns (applied count, [(message, reason)]).
+        rejected, records = [], []
+        with self._lock:
+            active = self._load_active()
+            stays = {}      # stay id -> admit-event fields, for stays read or written here
+            pins = {}       # pin -> stay id (None = discharged) changed in this batch
+            taken, freed = set(), set()
+
+            def stay_of(pin):
+                stay_id = pins[pin] if pin in pins else self._by_pin.get(pin)
+                if stay_id is not None and stay_id not in stays:
+                    stays[stay_id] = _stay_event("admit", stay_id, active.loc[stay_id])
+                return stay_id
+
+            def bed_for(dept, bed):
+                if bed is None:
+                    free = set(self.beds.free_slots(dept).tolist()) | {b for d, b in freed if d == dept}
+                    free -= {b for d, b in taken if d == dept}
+                    return (min(free), None) if free else (None, "No free bed")
+                slot = self.beds.slot(dept, bed)
+                if slot is None:
+                    return None, "Invalid bed"
+                key = (dept, int(slot))
+                if key in taken or (key not in freed and not self.beds.is_free(dept, int(slot))):
+                    return None, "Bed occupied"
+                return int(slot), None
+
+            def open_stay(pin, gender, dept, slot, when, exp, source):
+                stay_id = self._next_ids(1)[0]
+                ev = {"type": "admit", "id": stay_id, "pin": pin, "gender": gender, "department": dept, "bed": slot,
+                      "admit_date": when, "exp_discharge": exp, "source": source}
+                self._conn.execute("INSERT INTO stays (id, " + ", ".join(_HOT_COLS) + ") VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                   (stay_id, *(ev[c] for c in _HOT_COLS)))
+                stays[stay_id], pins[pin] = ev, stay_id
+                taken.add((dept, slot))
+                freed.discard((dept, slot))
+                records.append(dict(ev))
+
+            def close_stay(stay_id, when, **extra):
+                ev = dict(stays.pop(stay_id), type="discharge", actual_discharge=when, **extra)
+                self._conn.execute(
+                    "INSERT INTO archive_tail (id, " + ", ".join(_COLD_COLS) + ") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (stay_id, *(ev[c] for c in _COLD_COLS)))
+                self._conn.execute("DELETE FROM stays WHERE id = ?", (stay_id,))
+                if extra.get("reason") == "transfer":
+                    self._conn.execute("INSERT INTO transfers VALUES (?)", (stay_id,))
+                pins[ev["pin"]] = None
+                freed.add((ev["department"], ev["bed"]))
+                taken.discard((ev["department"], ev["bed"]))
+                records.append(ev)
+
+            with self._conn:
+                for msg in messages:
+                    try:
+                        when, exp = _epoch(msg.get("time")), _epoch(msg.get("exp_discharge"))
+                    except (ValueError, TypeError, OverflowError):
+                        rejected.append((msg, "Invalid time"))
+                        continue
+                    bad = next((f for f in ("department", "gender", "source")
+                                if msg.get(f) is not None and not isinstance(msg.get(f), str)), None)
+                    bed = msg.get("bed")
+                    if bad is None and (isinstance(bed, bool) or not isinstance(bed, (str, int, np.integer, type(None)))):
+                        bad = "bed"
+                    if bad is not None:
+                        rejected.append((msg, f"Invalid {bad}"))
+                        continue
+                    kind, pin, dept = msg.get("type"), schema.parse_pin(msg.get("pin")), msg.get("department")
+                    stay_id = stay_of(pin) if pin is not None else None
+                    stay = stays.get(stay_id)
+                    if pin is None or when is None:
+                        reason = "Invalid PIN or time"
+                    elif kind == "admit":
+                        reason = ("Already admitted" if stay is not None else
+                                  "Unknown department" if dept not in self.departments else
+                                  "Gender mismatch" if self.departments[dept]['gen'] not in ("Mixed", msg.get("gender")) else
+                                  "Invalid source" if msg.get("source", "Emergency") not in schema.SOURCES else None)
+                    elif kind in ("transfer", "discharge"):
+                        reason = ("Not admitted" if stay is None else
+                                  "Time before admission" if when < stay["admit_date"] else None)
+                        if reason is None and kind == "transfer":
+                            reason = ("Unknown department" if dept not in self.departments else
+                                      "Gender mismatch" if self.departments[dept]['gen'] not in ("Mixed", stay["gender"]) else None)
+                    else:
+                        reason = "Unknown message type"
+                    slot = None
+                    if reason is None and kind != "discharge":
+                        slot, reason = bed_for(dept, bed)
+                    if reason is not None:
+                        rejected.append((msg, reason))
+                    elif kind == "admit":
+                        exp = exp if exp is not None else when + ADT_DEFAULT_LOS_DAYS * 86400
+                        open_stay(pin, msg.get("gender"), dept, slot, when, exp, msg.get("source", "Emergency"))
+                    elif kind == "discharge":
+                        close_stay(stay_id, when)
+                    elif dept == stay["department"]:
+                        # Bed move within the ward
+                        self._conn.execute("UPDATE stays SET bed = ? WHERE id = ?", (slot, stay_id))
+                        freed.add((dept, stay["bed"]))
+                        taken.discard((dept, stay["bed"]))
+                        taken.add((dept, slot))
+                        stay["bed"] = slot
+                        records.append({"type": "move", "id": stay_id, "pin": pin, "department": dept, "bed": slot})
+                    else:
+                        exp = exp if exp is not None else stay["exp_discharge"]
+                        close_stay(stay_id, when, reason="transfer")
+                        open_stay(pin, stay["gender"], dept, slot, when, exp, "Transfer")
+                events = self._log(records) if records else []
+                self._bump()
+            # Committed: bring the in-memory indexes along, in order
+            for ev in events:
+                if ev["type"] == "admit":
+                    self._index_admit(ev)
+                elif ev["type"] == "discharge":
+                    self._index_discharge(ev)
+                else:
+                    self.beds.release(ev["id"])
+                    self.beds.occupy(ev["department"], ev["bed"], ev["id"])
+            self._active = None
+            self._publish(events)
+            self._maybe_flush()
+        return len(messages) - len(rejected), rejected
+
+    def transfer(self, stay_id, dept, bed, when):
+        # Moves an active stay to another ward (or bed); see apply_adt
+        with self._lock:
+            active = self._load_active()
+            if int(stay_id) not in active.index:
+                raise ValueError(f"Stay {stay_id} is not active.")
+            msg = {"type": "transfer", "pin": int(active.at[int(stay_id), "PIN"]), "department": dept, "bed": bed,
+                   "time": when}
+            _, rejected = self.apply_adt([msg])
+        if rejected:
+            reason = rejected[0][1]
+            raise (BedOccupiedError if reason == "Bed occupied" else ValueError)(f"Transfer rejected: {reason}.")
+
+    def admit_batch(self, pending, commit=True):
+        # Places a batch of pending admissions (PIN, Gender, Department = home
+        # ward, Admit_Date, Exp_Discharge, Source) with the overflow-aware
+        # allocator; with commit, every placed patient is admitted in one
+        # transaction. Returns the plan: Ward, Bed label, Hops, Status.
+        pins = schema.parse_pins(pending["PIN"])
+        with self._lock:
+            status = np.select(
+                [np.isnan(pins), pd.Series(pins).duplicated().to_numpy(),
+                 np.isin(pins, np.fromiter(self._by_pin, dtype=np.float64, count=len(self._by_pin)))],
+                ["Invalid PIN", "Duplicate PIN", "Already admitted"], default="")
+            ok = status == ""
+            free = {dept: self.beds.free_slots(dept) for dept in self.departments}
+            plan = allocator.allocate(pending[ok], self.departments, free).reindex(pending.index)
+            plan = plan.fillna({"Bed": -1, "Hops": -1}).astype({"Bed": np.int64, "Hops": np.int64})
+            plan.loc[~ok, "Status"] = status[~ok]
+            placed = plan["Bed"].to_numpy() >= 0
+            if commit and placed.any():
+                rows = pending[placed]
+                typed, rejected = schema.validate(pd.DataFrame({
+                    "PIN": rows["PIN"], "Gender": rows["Gender"], "Department": plan.loc[placed, "Ward"],
+                    "Bed": plan.loc[placed, "Bed"],
+                    "Admit_Date": rows["Admit_Date"], "Exp_Discharge": rows["Exp_Discharge"],
+                    "Actual_Discharge": pd.NaT, "Source": rows["Source"],
+                }), self.departments)
+                if not rejected.empty:
+                    raise ValueError(f"{len(rejected)} invalid rows (first: {rejected['Error'].iloc[0]})")
+                self.append_typed(typed)
+        plan["Bed"] = schema.bed_labels(plan["Ward"].fillna(""), plan["Bed"])
+        return plan
+
+    def discharge(self, stay_id, when):
+        stay_id = int(stay_id)
+        with self._lock:
+            active = self._load_active()
+            if stay_id not in active.index:
+                return
+            row = active.loc[stay_id]
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO archive_tail (id, " + ", ".join(_COLD_COLS) + ") SELECT id, " +
+                    ", ".join(_HOT_COLS[:6]) + ", ?, source FROM stays WHERE id = ?", (_epoch(when), stay_id))
+                self._conn.execute("DELETE FROM stays WHERE id = ?", (stay_id,))
+                events = self._log([_stay_event("discharge", stay_id, row, actual_discharge=_epoch(when))])
+                self._bump()
+                self._active = None
+            self._index_discharge(events[0])
+            self._publish(events)
+            self._maybe_flush()
+
+    def update_exp(self, stay_id, when):
+        stay_id = int(stay_id)
+        with self._lock:
+            active = self._load_active()
+            if stay_id not in active.index:
+                return
+            row = active.loc[stay_id]
+            with self._conn:
+                self._conn.execute("UPDATE stays SET exp_discharge = ? WHERE id = ?", (_epoch(when), stay_id))
+                events = self._log([{"type": "update_exp", "id": stay_id, "pin": int(row["PIN"]),
+                                     "department": str(row["Department"]), "old": _epoch(row["Exp_Discharge"]),
+                                     "exp_discharge": _epoch(when)}])
+                self._bump()
+                self._active = None
+            self.forecast.update(row["Department"], _epoch(row["Exp_Discharge"]), _epoch(when))
+            self._publish(events)
+
+    def bulk_update(self, discharges=None, exp_updates=None, shown=None):
+        # Many discharges (stay id -> discharge time) and Exp_Discharge edits
+        # (stay id -> new time) validated together and applied in one
+        # transaction: either every change lands or none does. With `shown`
+        # (stay id -> Exp_Discharge the user saw), a stay that has changed
+        # since fails the whole update.
+        discharges = pd.to_datetime(pd.Series(discharges if discharges is not None else {}, dtype=object))
+        exp_updates = pd.to_datetime(pd.Series(exp_updates if exp_updates is not None else {}, dtype=object))
+        with self._lock:
+            active = self._load_active()
+            for label, changes in (("discharge", discharges), ("update", exp_updates)):
+                missing = changes.index.difference(active.index)
+                if len(missing):
+                    raise ValueError(f"Cannot {label} stay {missing[0]}: not an active stay.")
+                if changes.isna().any():
+                    raise ValueError(f"Cannot {label} stay {changes.index[changes.isna()][0]}: missing date.")
+            if shown:
+                seen = pd.to_datetime(pd.Series(shown, dtype=object))
+                missing = seen.index.difference(active.index)
+                if len(missing):
+                    raise ValueError(f"Stay {missing[0]} is no longer active.")
+                now_exp = active.loc[seen.index, "Exp_Discharge"]
+                moved = seen.ne(now_exp) & ~(seen.isna() & now_exp.isna())
+                if moved.any():
+                    raise ValueError(f"Stay {moved.index[moved][0]} has changed since it was shown.")
+            early = discharges < active.loc[discharges.index, "Admit_Date"]
+            if early.any():
+                raise ValueError(f"Cannot discharge stay {early.index[early][0]}: discharge before admit.")
+            old_exp = active.loc[exp_updates.index, ["Department", "Exp_Discharge"]]
+            new_exp = dict(zip(exp_updates.index, _secs(exp_updates).astype(np.int64).tolist()))
+            gone = active.loc[discharges.index]
+            when = _secs(discharges).astype(np.int64)
+            records = [{"type": "update_exp", "id": int(i), "pin": int(active.at[i, "PIN"]), "department": str(dept),
+                        "old": _epoch(old), "exp_discharge": new_exp[i]}
+                       for i, (dept, old) in zip(exp_updates.index, old_exp.itertuples(index=False))]
+            for (i, row), out in zip(gone.iterrows(), when.tolist()):
+                event = _stay_event("discharge", i, row, actual_discharge=out)
+                event["exp_discharge"] = new_exp.get(i, event["exp_discharge"])
+                records.append(event)
+            with self._conn:
+                self._conn.executemany("UPDATE stays SET exp_discharge = ? WHERE id = ?",
+                                       ((new, i) for i, new in new_exp.items()))
+                self._conn.executemany(
+                    "INSERT INTO archive_tail (id, " + ", ".join(_COLD_COLS) + ") SELECT id, " +
+                    ", ".join(_HOT_COLS[:6]) + ", ?, source FROM stays WHERE id = ?",
+                    zip(when.tolist(), discharges.index.tolist()))
+                self._conn.executemany("DELETE FROM stays WHERE id = ?", ((i,) for i in discharges.index.tolist()))
+                events = self._log(records) if records else []
+                self._bump()
+                self._active = None
+            for (dept, old), new in zip(old_exp.itertuples(index=False), new_exp.values()):
+                self.forecast.update(dept, _epoch(old), new)
+            admits = _secs(gone["Admit_Date"]).astype(np.int64)
+            for stay_id, row, admit, out in zip(gone.index, gone.itertuples(index=False), admits, when):
+                self.beds.release(stay_id)
+                self._by_pin.pop(int(row.PIN), None)
+                self.kpis.discharge(row.Department, int(admit), int(out))
+                self.timeline.discharge(row.Department, int(out))
+                self.forecast.discharge(row.Department, new_exp.get(stay_id, _epoch(row.Exp_Discharge)))
+            self.los.add(gone["Department"].to_numpy(), gone["Source"].to_numpy(), when - admits)
+            self._publish(events)
+            self._maybe_flush()
+        return len(discharges), len(exp_updates)
+
+    def append(self, frame, strict=True):
+        # Validates external rows once; with strict=False the valid rows are
+        # stored and the rejected ones are returned with an Error column.
+        typed, rejected = schema.validate(frame, self.departments)
+        if strict and not rejected.empty:
+            raise ValueError(f"{len(rejected)} invalid rows (first: {rejected['Error'].iloc[0]})")
+        self.append_typed(typed)
+        return rejected
+
+    def append_typed(self, typed):
+        # Rows already in the typed schema (schema.validate output)
+        if typed.empty:
+            return
+        cols = {
+            "PIN": typed["PIN"].tolist(), "Bed": typed["Bed"].tolist(),
+            **{c: typed[c].astype(object).where(typed[c].notna(), None).tolist()
+               for c in ["Gender", "Department", "Source"]},
+            **{c: _epoch_col(typed[c]) for c in DATE_COLS},
+        }
+        is_active = typed["Actual_Discharge"].isna().to_numpy()
+        with self._lock:
+            with self._conn:
+                ids = self._next_ids(len(typed))
+                rows = list(zip(ids, *(cols[c] for c in COLUMNS)))
+                hot = [r[:7] + r[8:] for r, a in zip(rows, is_active) if a]
+                cold = sorted((r for r, a in zip(rows, is_active) if not a), key=lambda r: r[7])
+                try:
+                    self._conn.executemany(
+                        "INSERT INTO stays (id, " + ", ".join(_HOT_COLS) + ") VALUES (?, ?, ?, ?, ?, ?, ?, ?)", hot)
+                except sqlite3.IntegrityError as e:
+                    if "UNIQUE" not in str(e):
+                        raise
+                    raise BedOccupiedError("Upload assigns an already occupied bed to an active patient.")
+                self._conn.executemany(
+                    "INSERT INTO archive_tail (id, " + ", ".join(_COLD_COLS) + ") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    cold)
+                # Active rows are logged one admit each; discharged history only as a count
+                records = [{"type": "admit", "id": r[0], **dict(zip(_HOT_COLS, r[1:]))} for r in hot]
+                events = self._log(records + ([{"type": "load", "rows": len(cold)}] if cold else []))
+                self._bump()
+                self._active = None
+            for r in hot:
+                self.beds.occupy(r[3], r[4], r[0])
+                self._by_pin[r[1]] = r[0]
+            self.kpis.add(typed["Department"].to_numpy(), _secs(typed["Admit_Date"]), _secs(typed["Actual_Discharge"]))
+            self.timeline.add(typed["Department"].to_numpy(), _secs(typed["Admit_Date"]), _secs(typed["Actual_Discharge"]))
+            hot_rows, cold_rows = typed[is_active], typed[~is_active]
+            self.forecast.add(hot_rows["Department"], hot_rows["Exp_Discharge"])
+            self.los.add(cold_rows["Department"].to_numpy(), cold_rows["Source"].to_numpy(),
+                         _secs(cold_rows["Actual_Discharge"]) - _secs(cold_rows["Admit_Date"]))
+            self._publish(events)
+            self._maybe_flush()
+
+    def replace(self, frame):
+        typed, rejected = schema.validate(frame, self.departments)
+        if not rejected.empty:
+            raise ValueError(f"{len(rejected)} invalid rows (first: {rejected['Error'].iloc[0]})")
+        with self._lock:
+            self.reset()
+            self.append_typed(typed)
+
+    def reset(self):
+        with self._lock:
+            shutil.rmtree(self.archive_dir, ignore_errors=True)
+            with self._conn:
+                self._conn.execute("DELETE FROM stays")
+                self._conn.execute("DELETE FROM archive_tail")
+                self._conn.execute("DELETE FROM transfers")
+                events = self._log([{"type": "reset"}])
+                self._bump()
+                self._active = None
+            self._load_indexes()
+            # The census before the reset stays in the log (see restore)
+            self._publish(events)
+            self.events.snapshot(self._load_active(), events[-1]["seq"])
+
+    def restore(self, seq):
+        # Active census as it was right after event `seq` (e.g. just before a
+        # reset); stays active again leave the archive (tail and parts), the
+        # rest of the archived history is left as it is
+        with self._lock:
+            state, _ = self.events.state(upto=seq)
+            with self._conn:
+                self._write_state(state)
+                self._conn.executemany("DELETE FROM archive_tail WHERE id = ?", ((i,) for i in state))
+                self._conn.executemany("DELETE FROM transfers WHERE id = ?", ((i,) for i in state))
+                events = self._log([{"type": "restore", "to": int(seq)}])
+                self._bump()
+            self._drop_archived(set(state))
+            self._load_indexes()
+            self._publish(events)
+            self.events.snapshot(self._load_active(), events[-1]["seq"])
+            return len(state)
+
+    def audit(self, limit=200, pin=None):
+        # Newest ADT events first, optionally for one PIN
+        with self._lock:
+            return self.events.recent(limit, pin)
@@ -0,0 +1,211 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .core import CRIT_PCT
+from .los_model import BINS, HOUR
+from .schema import SOURCES
+
+# ---------------------------------------------------------
+# Surge Simulation (Monte Carlo, hourly steps)
+# ---------------------------------------------------------
+# Starts from the active census and runs the next `hours` hour by hour:
+#   1. departures due this hour leave (departure calendar)
+#   2. arrivals ~ Poisson(rate per department and source x surge factor)
+#   3. waiting + new patients take free beds in their own ward, then in the
+#      configured overflow ward (same gender rule), else keep waiting
+#   4. every placed patient draws an LOS and is booked into the calendar
+# Remaining LOS of patients already in bed is drawn from the fitted LOS model
+# conditioned on the time they have already stayed; new arrivals use their
+# department's distribution. Arrival rates are fitted from recent admissions.
+#
+# Replications run in chunks of CHUNK, vectorized across the chunk, and the
+# chunks are spread over a process pool. Chunk i always gets child i of
+# SeedSequence(seed), so results depend on the seed and the number of
+# replications only, never on the number of workers. Spawning workers costs
+# seconds, so runs under PARALLEL_MIN_STEPS (replications x wards x hours)
+# stay in-process, and callers that simulate repeatedly pass a long-lived
+# pool from make_pool().
+
+CHUNK = 64
+# ~1 s of serial work; below this a pool costs more than it saves
+PARALLEL_MIN_STEPS = 2_000_000
+ARRIVAL_DAYS = 28
+DEFAULT_SURGE = {"factor": 1.3, "sources": ["Emergency"], "departments": None, "start": 0, "hours": 7 * 24}
+
+
+def arrival_rates(census, departments, now, days=ARRIVAL_DAYS):
+    # Admissions per hour by department x source over the `days` before now
+    now = pd.Timestamp(now)
+    recent = census[(census["Admit_Date"] > now - pd.Timedelta(days=days)) & (census["Admit_Date"] <= now)]
+    counts = pd.crosstab(recent["Department"].astype(object), recent["Source"].astype(object))
+    counts = counts.reindex(index=list(departments), columns=SOURCES, fill_value=0)
+    return counts / (days * 24)
+
+
+def prepare(active, los_model, rates, departments, now, hours=14 * 24, surge=None):
+    # Everything a worker needs, as plain arrays (cheap to pickle)
+    names = list(departments)
+    index = {d: i for i, d in enumerate(names)}
+    gens = [info['gen'] for info in departments.values()]
+    overflow = []
+    for dept, info in departments.items():
+        target = info.get('overflow')
+        ok = target in index and departments[target]['gen'] in ("Mixed", info['gen'])
+        overflow.append(index[target] if ok else -1)
+    surge = dict(DEFAULT_SURGE, **(surge or {}))
+    factor = np.ones((hours, len(names), len(SOURCES)))
+    srcs = [SOURCES.index(s) for s in (surge["sources"] or SOURCES)]
+    dpts = [index[d] for d in (surge["departments"] or names)]
+    window = slice(surge["start"], surge["start"] + surge["hours"])
+    for d in dpts:
+        factor[window, d, srcs] = surge["factor"]
+    hourly = (factor * rates.reindex(index=names, columns=SOURCES).to_numpy()[None, :, :]).sum(axis=2)
+    cdf = los_model.cdf_table()
+    now_s = int(pd.Timestamp(now).value // 10**9)
+    admit_s = active["Admit_Date"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+    return {
+        "names": names, "gens": gens,
+        "caps": np.array([info['cap'] for info in departments.values()], dtype=np.int64),
+        "overflow": np.array(overflow, dtype=np.int64),
+        "hours": hours, "rates": hourly,
+        # Rows stacked as row + cdf, so one searchsorted serves every row
+        "cdf": cdf, "cdf_flat": (np.arange(len(cdf))[:, None] + np.minimum(cdf, 1 - 1e-12)).ravel(),
+        "dept_rows": los_model.rows(names, [None] * len(names)),
+        "active_dept": np.array([index.get(d, -1) for d in active["Department"]], dtype=np.int64),
+        "active_row": los_model.rows(active["Department"], active["Source"].to_numpy()),
+        "active_elapsed": np.maximum(now_s - admit_s, 0) // HOUR,
+    }
+
+
+def _sample_los(rng, inp, rows, floor=None):
+    # LOS in hours per stay (inverse CDF); with `floor`, conditioned on LOS >= floor
+    cdf = inp["cdf"]
+    n_bins = cdf.shape[1]
+    lo = np.zeros(len(rows)) if floor is None else np.where(floor > 0, cdf[rows, np.minimum(floor, n_bins) - 1], 0)
+    u = np.minimum(lo + rng.random(len(rows)) * (1 - lo), 1 - 1e-12)
+    pos = np.clip(np.searchsorted(inp["cdf_flat"], rows + u, side="left") - rows * n_bins, 0, BINS)
+    if floor is None:
+        return pos
+    # No LOS mass left past `floor` (a stay already longer than any seen, or
+    # past MAX_LOS_DAYS): the tail bin, rather than leaving right away
+    return np.where(lo >= 1 - 1e-9, BINS, np.maximum(pos, np.minimum(floor, BINS)))
+
+
+def _run_chunk(inp, reps, seed_seq):
+    rng = np.random.default_rng(seed_seq)
+    caps, hours = inp["caps"], inp["hours"]
+    n_dept = len(caps)
+    horizon = hours + 1
+    cal = np.zeros((reps, n_dept, horizon), dtype=np.int64)
+    occ = np.zeros((reps, n_dept), dtype=np.int64)
+
+    def book(r, ward, start, los):
+        # Departure at start + LOS; beyond the horizon (or past MAX_LOS_DAYS) never leaves
+        leave = start + los
+        keep = (leave < horizon) & (los < BINS)
+        np.add.at(cal, (r[keep], ward[keep], leave[keep]), 1)
+
+    # Patients in bed now: remaining LOS given the hours already stayed. A draw
+    # in the tail bin (including stays already past MAX_LOS_DAYS) never leaves.
+    placed = inp["active_dept"] >= 0
+    depts, rows, elapsed = inp["active_dept"][placed], inp["active_row"][placed], inp["active_elapsed"][placed]
+    occ += np.bincount(depts, minlength=n_dept)[None, :]
+    r = np.repeat(np.arange(reps), len(depts))
+    elapsed = np.tile(elapsed, reps)
+    los = _sample_los(rng, inp, np.tile(rows, reps), elapsed)
+    book(r, np.tile(depts, reps), np.zeros(len(r), dtype=np.int64),
+         np.where(los >= BINS, BINS, np.maximum(los - elapsed, 0)))
+
+    caps_all = np.append(caps, caps.sum())
+    waiting = np.zeros((reps, n_dept), dtype=np.int64)
+    occ_sum = np.zeros((reps, n_dept + 1), dtype=np.int64)
+    crit_hours = np.zeros((reps, n_dept + 1), dtype=np.int64)
+    peak = np.column_stack([occ, occ.sum(axis=1)])
+    overflow_out = np.zeros((reps, n_dept), dtype=np.int64)
+    boarding = np.zeros((reps, n_dept + 1), dtype=np.int64)
+    reps_idx = np.arange(reps)
+    for t in range(hours):
+        occ -= cal[:, :, t]
+        demand = waiting + rng.poisson(inp["rates"][t], size=(reps, n_dept))
+        home = np.minimum(demand, np.maximum(caps - occ, 0))
+        occ += home
+        waiting = demand - home
+        moves = []
+        for d, o in enumerate(inp["overflow"]):
+            if o < 0:
+                continue
+            mv = np.minimum(waiting[:, d], np.maximum(caps[o] - occ[:, o], 0))
+            occ[:, o] += mv
+            waiting[:, d] -= mv
+            overflow_out[:, d] += mv
+            moves.append((d, o, mv))
+        # One LOS draw per placed patient, from the home department's distribution
+        r_parts, home_parts, ward_parts = [], [], []
+        for d in range(n_dept):
+            r_parts.append(np.repeat(reps_idx, home[:, d]))
+            home_parts.append(np.full(int(home[:, d].sum()), d))
+            ward_parts.append(home_parts[-1])
+        for d, o, mv in moves:
+            r_parts.append(np.repeat(reps_idx, mv))
+            home_parts.append(np.full(int(mv.sum()), d))
+            ward_parts.append(np.full(int(mv.sum()), o))
+        r, home_d, ward = (np.concatenate(p) for p in (r_parts, home_parts, ward_parts))
+        if len(r):
+            book(r, ward, np.full(len(r), t), np.maximum(_sample_los(rng, inp, inp["dept_rows"][home_d]), 1))
+        # Last column: the hospital as a whole
+        occ_all = np.column_stack([occ, occ.sum(axis=1)])
+        occ_sum += occ_all
+        crit_hours += occ_all * 100 >= CRIT_PCT * caps_all
+        np.maximum(peak, occ_all, out=peak)
+        boarding[:, :-1] += waiting
+    boarding[:, -1] = boarding[:, :-1].sum(axis=1)
+    overflow_out = np.column_stack([overflow_out, overflow_out.sum(axis=1)])
+    return {"bor": occ_sum / (caps_all * hours) * 100, "crit_hours": crit_hours, "peak": peak,
+            "overflow_out": overflow_out, "boarding_hours": boarding}
+
+
+def make_pool(workers=None):
+    # spawn: the app process runs server threads, which fork does not copy
+    # safely. Workers start on first use and are kept until shutdown().
+    return ProcessPoolExecutor(workers or os.cpu_count() or 1, mp_context=multiprocessing.get_context("spawn"))
+
+
+def simulate(inputs, reps=1000, seed=0, workers=None, pool=None):
+    # Per replication x department (+ Hospital) results, long format; `pool`
+    # (make_pool) is reused as is, otherwise a large run gets a pool of its own
+    n_chunks = -(-reps // CHUNK)
+    sizes = [min(CHUNK, reps - i * CHUNK) for i in range(n_chunks)]
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    workers = min(workers or os.cpu_count() or 1, n_chunks)
+    if workers <= 1 or reps * len(inputs["caps"]) * inputs["hours"] < PARALLEL_MIN_STEPS:
+        chunks = [_run_chunk(inputs, n, s) for n, s in zip(sizes, seeds)]
+    elif pool is not None:
+        chunks = list(pool.map(_run_chunk, [inputs] * n_chunks, sizes, seeds))
+    else:
+        with make_pool(workers) as own:
+            chunks = list(own.map(_run_chunk, [inputs] * n_chunks, sizes, seeds))
+    names = inputs["names"] + ["Hospital"]
+    frames = []
+    for i, out in enumerate(chunks):
+        rep = np.repeat(np.arange(sizes[i]) + i * CHUNK, len(names))
+        frame = pd.DataFrame({"Replication": rep, "Department": np.tile(names, sizes[i])})
+        for key, vals in out.items():
+            frame[key] = vals.ravel()
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def summarize(results):
+    # Per department: mean and 5th / 50th / 95th percentiles of each metric
+    metrics = ["bor", "crit_hours", "peak", "overflow_out", "boarding_hours"]
+    grouped = results.groupby("Department", sort=False)[metrics]
+    table = pd.concat({
+        "mean": grouped.mean(), "p5": grouped.quantile(0.05),
+        "p50": grouped.quantile(0.5), "p95": grouped.quantile(0.95),
+    }, axis=1).swaplevel(axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+    table["p_critical"] = (results["crit_hours"] > 0).groupby(results["Department"], sort=False).mean()
+    return table
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+from . import schema
+from .config import DEPARTMENTS
+from .kpi import DAY
+
+# ---------------------------------------------------------
+# Synthetic Census Generator (demo data / load testing)
+# ---------------------------------------------------------
+# Every bed runs its own renewal process: idle gap (turnover plus an
+# exponential wait) -> stay (lognormal LOS) -> idle gap -> ... so a bed never
+# holds two patients and capacity is respected by construction. All beds of a
+# department are drawn as one (beds x stays) matrix and a cumulative sum gives
+# the admit / discharge times, so a multi-year, million-stay history takes
+# seconds. The same seed always gives the same census.
+#
+#   arrival_rate  admissions per day, per department (dict) or for all;
+#                 defaults to the rate that keeps DEFAULT_OCCUPANCY. Rates
+#                 above what the beds can turn over saturate at full capacity.
+#   los           (mean days, sigma) of the lognormal LOS, per department or
+#                 for all
+#
+# PINs follow PatientRegistry.synthetic (first_pin + n, even = Male), so the
+# demo census matches the demo patient index. Stays active at `end` never
+# share a PIN; historical stays reuse PINs freely (readmissions).
+
+DEFAULT_LOS = (4.0, 0.6)
+DEFAULT_OCCUPANCY = 0.75
+TURNOVER = 2 * 3600
+SOURCE_MIX = [0.6, 0.3, 0.1]
+EXP_NOISE = 0.25
+
+
+def _per_dept(value, dept, default):
+    if value is None:
+        return default
+    return value.get(dept, default) if isinstance(value, dict) else value
+
+
+def _bed_stays(rng, cap, start_s, end_s, los_mean, los_sigma, rate):
+    # (slot, admit, discharge, los) arrays for every stay overlapping [start_s, end_s]
+    cycle = max(cap / rate * DAY, los_mean * DAY + TURNOVER) if rate > 0 else float("inf")
+    if not np.isfinite(cycle):
+        return [np.empty(0, dtype=np.int64)] * 4
+    idle = cycle - los_mean * DAY - TURNOVER
+    mu = np.log(los_mean * DAY) - los_sigma ** 2 / 2
+    k = int(np.ceil((end_s - start_s) / cycle)) + 8
+    t = start_s - rng.uniform(0, cycle, cap)
+    blocks = []
+    while True:
+        los = rng.lognormal(mu, los_sigma, (cap, k)).astype(np.int64) + 3600
+        gap = TURNOVER + rng.exponential(idle, (cap, k)).astype(np.int64) if idle > 0 else np.full((cap, k), TURNOVER)
+        dis = t[:, None].astype(np.int64) + np.cumsum(gap + los, axis=1)
+        blocks.append((dis - los, dis, los))
+        t = dis[:, -1]
+        if t.min() >= end_s:
+            break
+    admit, dis, los = (np.concatenate(b, axis=1) for b in zip(*blocks))
+    slot = np.broadcast_to(np.arange(cap)[:, None], admit.shape)
+    keep = (dis > start_s) & (admit <= end_s)
+    return slot[keep], admit[keep], dis[keep], los[keep]
+
+
+def _assign_pins(rng, genders, active, n_patients, first_pin):
+    # first_pin + 2*i is Male, first_pin + 2*i + 1 Female (first_pin even)
+    pins = np.empty(len(genders), dtype=np.int64)
+    female = genders == "Female"
+    for g in (False, True):
+        rows = female == g
+        act, hist = rows & active, rows & ~active
+        pool = max(n_patients // 2, int(act.sum()))
+        idx = np.empty(len(genders), dtype=np.int64)
+        idx[act] = rng.choice(pool, int(act.sum()), replace=False)
+        idx[hist] = rng.integers(0, pool, int(hist.sum()))
+        pins[rows] = first_pin + 2 * idx[rows] + int(g)
+    return pins
+
+
+def generate(departments, days=365, end=None, arrival_rate=None, los=None, seed=None,
+             n_patients=None, first_pin=1000):
+    # Typed census frame (see schema.py) covering the `days` before `end`
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end) if end is not None else pd.Timestamp.now().floor("h")
+    end_s = int(end.value // 10**9)
+    start_s = end_s - int(days * DAY)
+    parts = []
+    for dept, info in departments.items():
+        los_mean, los_sigma = _per_dept(los, dept, DEFAULT_LOS)
+        rate = _per_dept(arrival_rate, dept, DEFAULT_OCCUPANCY * info['cap'] / los_mean)
+        slot, admit, dis, stay_los = _bed_stays(rng, info['cap'], start_s, end_s, los_mean, los_sigma, rate)
+        n = len(slot)
+        if info['gen'] in ("Male", "Female"):
+            gender = np.full(n, info['gen'], dtype=object)
+        else:
+            gender = rng.choice(np.array(["Male", "Female"], dtype=object), n)
+        exp = admit + (stay_los * rng.lognormal(0, EXP_NOISE, n)).astype(np.int64) // 3600 * 3600
+        parts.append(pd.DataFrame({
+            "Gender": gender, "Department": dept, "Bed": slot, "Admit_Date": admit,
+            "Exp_Discharge": exp, "Actual_Discharge": np.where(dis > end_s, -1, dis),
+            "Source": rng.choice(np.array(schema.SOURCES, dtype=object), n, p=SOURCE_MIX),
+        }))
+    frame = pd.concat(parts, ignore_index=True).sort_values("Admit_Date", kind="stable", ignore_index=True)
+    active = frame["Actual_Discharge"].to_numpy() < 0
+    n_patients = n_patients or max(len(frame) // 3, 2 * int(active.sum()), 2)
+    frame.insert(0, "PIN", _assign_pins(rng, frame["Gender"].to_numpy(), active, n_patients, first_pin))
+    for col in schema.DATE_COLS:
+        secs = frame[col].to_numpy()
+        frame[col] = np.where(secs < 0, np.datetime64("NaT"), secs.astype("datetime64[s]"))
+    return schema.coerce(frame, departments)
+
+
+def group_departments(n_sites, template=None):
+    # A group of n_sites hospitals, each a copy of `template` (default: the
+    # built-in wards). Ward names get the site appended so they stay unique
+    # across the group, and overflow chains stay within the site.
+    template = template or DEPARTMENTS
+    out = {}
+    for i in range(1, n_sites + 1):
+        site = f"Site {i:0{len(str(n_sites))}d}"
+        for dept, info in template.items():
+            over = info.get('overflow', "None")
+            out[f"{dept} ({site})"] = dict(info, site=site, overflow=f"{over} ({site})" if over in template else over)
+    return out
@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+
+from .kpi import DAY
+
+# ---------------------------------------------------------
+# Census Timeline (point-in-time occupancy)
+# ---------------------------------------------------------
+# Every stay is the interval [Admit_Date, Actual_Discharge); active stays are
+# open-ended. Per department we keep the sorted admit times and the sorted
+# discharge times (epoch seconds), so
+#
+#   census(T) = #admits <= T  -  #discharges <= T
+#
+# is two binary searches, for any number of T at once. Prefix sums of both
+# arrays give patient-days over [start, end] in O(log n) as well, and the
+# peak over a period is one sweep over the events inside it. Writes go to a
+# pending buffer that is merged in on the next query.
+
+
+def _epoch(ts):
+    return int(pd.Timestamp(ts).value // 10**9)
+
+
+class _Events:
+    # Sorted event times with prefix sums, plus unsorted pending inserts
+    def __init__(self):
+        self.times = np.empty(0, dtype=np.int64)
+        self.csum = np.zeros(1, dtype=np.int64)
+        self.pending = []
+
+    def add(self, times):
+        self.pending.append(np.asarray(times, dtype=np.int64))
+
+    def sorted(self):
+        if self.pending:
+            self.times = np.sort(np.concatenate([self.times] + self.pending), kind="stable")
+            self.csum = np.concatenate([[0], np.cumsum(self.times)])
+            self.pending = []
+        return self.times
+
+    def count(self, t):
+        return np.searchsorted(self.sorted(), t, side="right")
+
+    def integral(self, start, end):
+        # Integral over [start, end] of #events <= t, in seconds
+        times = self.sorted()
+        lo, hi = np.searchsorted(times, [start, end], side="right")
+        inside = (hi - lo) * end - (self.csum[hi] - self.csum[lo])
+        return int(lo * (end - start) + inside)
+
+
+class CensusTimeline:
+    def __init__(self, departments):
+        self.departments = departments
+        self._admits = {dept: _Events() for dept in departments}
+        self._ends = {dept: _Events() for dept in departments}
+
+    def _dept(self, dept):
+        if dept not in self._admits:
+            self._admits[dept], self._ends[dept] = _Events(), _Events()
+        return self._admits[dept], self._ends[dept]
+
+    # --- Updates ---
+    def add(self, depts, admits, discharges):
+        # Bulk load: admits int epoch seconds, discharges float (NaN = active)
+        f = pd.DataFrame({"d": depts, "a": np.asarray(admits, dtype=np.int64),
+                          "x": np.asarray(discharges, dtype=np.float64)})
+        for dept, grp in f.groupby("d"):
+            adm, ends = self._dept(dept)
+            adm.add(grp["a"].to_numpy())
+            ends.add(grp["x"].dropna().to_numpy(dtype=np.int64))
+
+    def admit(self, dept, admit):
+        self._dept(dept)[0].add([admit])
+
+    def discharge(self, dept, when):
+        self._dept(dept)[1].add([when])
+
+    # --- Queries ---
+    def census_at(self, times):
+        # Department x time occupied-bed counts (+ Hospital row)
+        times = pd.DatetimeIndex(np.atleast_1d(pd.to_datetime(times)))
+        secs = times.as_unit("s").asi8
+        counts = {dept: self._admits[dept].count(secs) - self._ends[dept].count(secs) for dept in self._admits}
+        out = pd.DataFrame(counts, index=times).T
+        out.loc["Hospital"] = out.sum()
+        return out
+
+    def curve(self, start, end, freq="h"):
+        # Census per department (+ Hospital) sampled every `freq`, indexed by time
+        return self.census_at(pd.date_range(start, end, freq=freq)).T
+
+    def _peak(self, depts, start, end):
+        # One sweep over the events inside [start, end] of the given departments
+        s, e = _epoch(start), _epoch(end)
+        level0, times, steps = 0, [np.array([s])], []
+        for dept in depts:
+            adm, ends = self._dept(dept)
+            level0 += int(adm.count(s) - ends.count(s))
+            for events, step in ((adm, 1), (ends, -1)):
+                t = events.sorted()
+                t = t[np.searchsorted(t, s, side="right"):np.searchsorted(t, e, side="right")]
+                times.append(t)
+                steps.append(np.full(len(t), step, dtype=np.int64))
+        times = np.concatenate(times)
+        steps = np.concatenate([[level0]] + steps)
+        # Discharges sort before admissions at the same second (the bed is turned over)
+        order = np.lexsort((steps, times))
+        level = np.cumsum(steps[order])
+        i = int(np.argmax(level))
+        return int(level[i]), pd.Timestamp(times[order][i], unit="s")
+
+    def peak(self, dept, start, end):
+        # (max census, first time it was reached) over [start, end]
+        return self._peak([dept], start, end)
+
+    def patient_days(self, dept, start, end):
+        s, e = _epoch(start), _epoch(end)
+        adm, ends = self._dept(dept)
+        return (adm.integral(s, e) - ends.integral(s, e)) / DAY
+
+    def period_stats(self, start, end):
+        # Midnight census (mean), peak census and time, patient-days and BOR
+        # per department and for the Hospital over [start, end]
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        days = max((end - start).total_seconds() / DAY, 1 / 24)
+        midnights = pd.date_range(start.ceil("D"), end, freq="D")
+        midnight = self.census_at(midnights).mean(axis=1) if len(midnights) else None
+        rows = []
+        for dept, info in self.departments.items():
+            peak, peak_at = self.peak(dept, start, end)
+            pdays = self.patient_days(dept, start, end)
+            rows.append({"Department": dept, "Capacity": info['cap'],
+                         "Midnight_Census": midnight[dept] if midnight is not None else np.nan,
+                         "Peak": peak, "Peak_Time": peak_at, "Patient_Days": pdays,
+                         "BOR": pdays / (info['cap'] * days) * 100 if info['cap'] else 0})
+        table = pd.DataFrame(rows)
+        cap = int(table["Capacity"].sum())
+        hosp_peak, hosp_peak_at = self._peak(list(self.departments), start, end)
+        pdays = float(table["Patient_Days"].sum())
+        table.loc[len(table)] = {
+            "Department": "Hospital", "Capacity": cap,
+            "Midnight_Census": midnight["Hospital"] if midnight is not None else np.nan,
+            "Peak": hosp_peak, "Peak_Time": hosp_peak_at, "Patient_Days": pdays,
+            "BOR": pdays / (cap * days) * 100 if cap else 0}
+        return table